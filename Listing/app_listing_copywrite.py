@@ -1,14 +1,20 @@
 # listing/app_listing_copywrite.py
 # UI de Copywriting con generación por ETAPA: Titles, Bullets, Description, Backend.
 # - Cada botón genera SOLO su bloque y lo guarda en session_state["draft_listing"] sin tocar los demás.
+# - "Generate All" lanza las 4 etapas en paralelo y fusiona cada una al terminar.
+# - Streaming (Titles/Bullets): cada título/bullet se muestra en cuanto su clave JSON se completa.
 # - Muestra conteos exactos (chars / bytes sin espacios para backend).
 # - Soporta 'rules' en session, pero NO impone reglas extras (el prompt ya contiene SOP/Brief).
 
 import json
+from contextlib import nullcontext
+
 import streamlit as st
 import pandas as pd
 
-from listing.funcional_listing_copywrite import run_listing_stage
+from listing.funcional_listing_copywrite import STAGES_IMPLEMENTADAS, generar_listing, run_listing_stage
+from utils.cache_llm_utils import estadisticas_cache, sin_cache
+from utils.telemetria_llm_utils import contexto_llm, resumen_costos
 
 # ---- Auto-load copy rules from code (opcional; no obligatorio para títulos) ----
 try:
@@ -55,6 +61,24 @@ def _export_buttons(draft: dict):
         )
 
 
+def _panel_costos():
+    """Costo y latencia de las llamadas IA de este listing (libro de telemetría)."""
+    resumen = resumen_costos(st.session_state.get("excel_hash"))
+    with st.expander("Costo y latencia IA (este listing)", expanded=False):
+        if resumen.empty:
+            st.caption("Sin llamadas registradas para este archivo.")
+            return
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Costo estimado", f"${resumen['costo_usd'].sum():.4f}")
+        c2.metric("Tokens (prompt + completion)",
+                  f"{int(resumen['prompt_tokens'].sum() + resumen['completion_tokens'].sum()):,}")
+        c3.metric("Llamadas desde caché",
+                  f"{int(resumen['aciertos_cache'].sum())} / {int(resumen['llamadas'].sum())}")
+        st.dataframe(
+            resumen.round({"costo_usd": 4, "espera_ms": 0, "p50_ms": 0, "p95_ms": 0}),
+            use_container_width=True, hide_index=True)
+
+
 def mostrar_listing_copywrite(excel_data=None):
     st.subheader("Copywriting")
     st.caption(
@@ -90,17 +114,97 @@ def mostrar_listing_copywrite(excel_data=None):
     st.divider()
 
     # Controles globales
-    c1, c2 = st.columns([1, 2])
+    c1, c2, c3, c4 = st.columns([1, 1, 1, 1])
     with c1:
         use_ai = st.toggle("Use AI (cheap)", value=True,
                            help="IA económica (gpt-4o-mini) si hay OPENAI_API_KEY.")
     with c2:
         cost_saver = st.toggle(
             "Cost saver", value=True, help="Recorta filas por tipo para abaratar pruebas (no cambia semántica).")
+    with c3:
+        regenerar = st.toggle(
+            "Regenerar (sin caché)", value=False,
+            help="Ignora las respuestas IA guardadas para estos mismos inputs.")
+    with c4:
+        streaming = st.toggle(
+            "Streaming", value=True,
+            help="Muestra títulos y bullets mientras la IA los escribe (Titles / Bullets).")
+
+    stats = estadisticas_cache()
+    st.caption(
+        f"Caché IA: {stats['aciertos']} aciertos / {stats['fallos']} fallos "
+        f"({stats['tasa_aciertos']:.0%}) · {stats['entradas']} respuestas, "
+        f"{stats['bytes'] / 1024:.0f} KB")
+
+    def _vista_parcial():
+        """Placeholder que se reescribe con cada título / bullet completado."""
+        zona = st.empty()
+        vistos = {}
+
+        def _al_parcial(ruta: tuple, valor):
+            if not isinstance(valor, str) or len(ruta) != 3:
+                return
+            if ruta[0] == "title":
+                vistos[ruta] = f"- **{ruta[1]} · {ruta[2]}** ({len(valor)} chars): {valor}"
+            elif ruta[0] == "bullets" and isinstance(ruta[2], int):
+                vistos[ruta] = f"- **{ruta[1]} · b{ruta[2] + 1}** ({len(valor)} chars): {valor}"
+            else:
+                return
+            zona.markdown("\n".join(vistos.values()))
+        return zona, _al_parcial
+
+    def _generar(stage: str) -> dict:
+        zona, al_parcial = _vista_parcial() if streaming and stage in ("title", "bullets") \
+            else (None, None)
+        try:
+            with (sin_cache() if regenerar else nullcontext()), contexto_llm(
+                    listing=st.session_state.get("excel_hash"), etapa=stage):
+                return run_listing_stage(
+                    df_inputs, stage, cost_saver=cost_saver, rules=st.session_state.get("copy_rules"),
+                    al_parcial=al_parcial)
+        finally:
+            if zona is not None:
+                zona.empty()
 
     if "draft_listing" not in st.session_state:
         st.session_state["draft_listing"] = {}
 
+    _ETIQUETAS = {"title": "Titles", "bullets": "Bullets",
+                  "description": "Description", "backend": "Backend"}
+
+    # ------------------ Todas las etapas (paralelo) ------------------
+    # Solo las etapas con prompt implementado (Titles + Bullets)
+    gcol1, _ = st.columns([1, 2])
+    with gcol1:
+        generar_todo = st.button(
+            "Generate All", type="primary", use_container_width=True,
+            help=" + ".join(_ETIQUETAS[s] for s in STAGES_IMPLEMENTADAS) + " en paralelo.")
+
+    if generar_todo:
+        progreso = st.progress(0.0, text="Generando etapas…")
+        hechas = []
+
+        def _al_terminar(stage: str, parte: dict):
+            st.session_state["draft_listing"].update(parte)
+            hechas.append(stage)
+            progreso.progress(len(hechas) / len(STAGES_IMPLEMENTADAS),
+                              text=f"{_ETIQUETAS[stage]} listo ({len(hechas)}/{len(STAGES_IMPLEMENTADAS)})")
+
+        try:
+            with (sin_cache() if regenerar else nullcontext()), contexto_llm(
+                    listing=st.session_state.get("excel_hash")):
+                _, errores = generar_listing(
+                    df_inputs, STAGES_IMPLEMENTADAS, cost_saver=cost_saver,
+                    rules=st.session_state.get("copy_rules"), al_terminar=_al_terminar)
+            progreso.empty()
+            for stage, e in errores.items():
+                st.error(f"Error en {_ETIQUETAS[stage]}: {e}")
+            if hechas:
+                st.success("Generado: " + ", ".join(_ETIQUETAS[s] for s in hechas) + ".")
+        except Exception as e:
+            progreso.empty()
+            st.error(f"Error al generar: {e}")
+
     # ------------------ Botones por ETAPA ------------------
     st.markdown("### Generación por etapa")
 
@@ -108,8 +212,7 @@ def mostrar_listing_copywrite(excel_data=None):
     with bcol1:
         if st.button("Generate Titles", use_container_width=True):
             try:
-                part = run_listing_stage(
-                    df_inputs, "title", cost_saver=cost_saver, rules=st.session_state.get("copy_rules"))
+                part = _generar("title")
                 st.session_state["draft_listing"].update(part)
                 st.success("Titles generados.")
             except Exception as e:
@@ -118,8 +221,7 @@ def mostrar_listing_copywrite(excel_data=None):
     with bcol2:
         if st.button("Generate Bullets", use_container_width=True):
             try:
-                part = run_listing_stage(
-                    df_inputs, "bullets", cost_saver=cost_saver, rules=st.session_state.get("copy_rules"))
+                part = _generar("bullets")
                 st.session_state["draft_listing"].update(part)
                 st.success("Bullets generados.")
             except Exception as e:
@@ -128,8 +230,7 @@ def mostrar_listing_copywrite(excel_data=None):
     with bcol3:
         if st.button("Generate Description", use_container_width=True):
             try:
-                part = run_listing_stage(
-                    df_inputs, "description", cost_saver=cost_saver, rules=st.session_state.get("copy_rules"))
+                part = _generar("description")
                 st.session_state["draft_listing"].update(part)
                 st.success("Description generada.")
             except Exception as e:
@@ -138,13 +239,14 @@ def mostrar_listing_copywrite(excel_data=None):
     with bcol4:
         if st.button("Generate Backend", use_container_width=True):
             try:
-                part = run_listing_stage(
-                    df_inputs, "backend", cost_saver=cost_saver, rules=st.session_state.get("copy_rules"))
+                part = _generar("backend")
                 st.session_state["draft_listing"].update(part)
                 st.success("Backend generado.")
             except Exception as e:
                 st.error(f"Error en Backend: {e}")
 
+    _panel_costos()
+
     draft = st.session_state.get("draft_listing", {})
     if not draft:
         st.info("Aún no hay borrador. Genera al menos una etapa.")
@@ -3,8 +3,6 @@
 import streamlit as st
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from sklearn.decomposition import PCA
 
 from listing.funcional_listing_tokenizacion import (
     tokenizar_keywords,
@@ -13,6 +11,12 @@ from listing.funcional_listing_tokenizacion import (
     generar_embeddings,
     agrupar_embeddings_kmeans,
 )
+from listing.funcional_listing_clusters import (
+    RANGO_K,
+    curva_k,
+    iniciar_curva_k,
+    proyectar_pca,
+)
 
 # ------------------------------------------------------------
 # 1) Tokenización base
@@ -150,6 +154,8 @@ def mostrar_tokens_lematizados(excel_data=None):
 # ------------------------------------------------------------
 def mostrar_embeddings_visualizacion(excel_data=None):
     st.subheader("Embeddings y Visualización Semántica")
+
+    import matplotlib.pyplot as plt
     st.info(
         "Este gráfico muestra la agrupación semántica de los tokens lematizados "
         "en 2D usando PCA."
@@ -166,14 +172,12 @@ def mostrar_embeddings_visualizacion(excel_data=None):
         return
 
     df_lemas = lemmatizar_tokens_priorizados(df_tokens)
-    df_embed = generar_embeddings(df_lemas)
-    if df_embed.empty or "vector" not in df_embed.columns:
+    df_embed, X = generar_embeddings(df_lemas)
+    if df_embed.empty or X is None:
         st.warning("No se pudieron generar embeddings para los tokens.")
         return
 
-    vectores = df_embed["vector"].tolist()
-    pca = PCA(n_components=2)
-    puntos_2d = pca.fit_transform(vectores)
+    puntos_2d = proyectar_pca(X)  # cacheado por matriz de embeddings
 
     df_embed["pca_x"] = puntos_2d[:, 0]
     df_embed["pca_y"] = puntos_2d[:, 1]
@@ -215,8 +219,11 @@ def mostrar_embeddings_visualizacion(excel_data=None):
 def mostrar_clusters_semanticos(excel_data=None):
     st.subheader("Clusterización Semántica de Tokens")
 
+    import matplotlib.pyplot as plt
+
     n_clusters = st.slider(
-        "Número de clusters K para agrupación semántica", min_value=2, max_value=15, value=6, step=1
+        "Número de clusters K para agrupación semántica",
+        min_value=min(RANGO_K), max_value=max(RANGO_K), value=6, step=1
     )
 
     df_tokens = priorizar_tokens(["Top 25%", "Top 50%"], ["Top 25%"], [])
@@ -225,9 +232,12 @@ def mostrar_clusters_semanticos(excel_data=None):
         return
 
     df_lemas = lemmatizar_tokens_priorizados(df_tokens)
-    df_embed = generar_embeddings(df_lemas)
+    df_embed, X = generar_embeddings(df_lemas)
 
-    df_cluster = agrupar_embeddings_kmeans(df_embed, n_clusters=n_clusters)
+    # Curva codo/silhouette de todos los k en segundo plano (ajustes propios, solo métricas)
+    huella = iniciar_curva_k(X) if X is not None and len(X) > 2 else None
+
+    df_cluster = agrupar_embeddings_kmeans(df_embed, X, n_clusters=n_clusters)
     if df_cluster.empty:
         st.warning("No se pudo clusterizar.")
         return
@@ -254,6 +264,16 @@ def mostrar_clusters_semanticos(excel_data=None):
     ax.set_ylabel("PCA 2")
     st.pyplot(fig)
 
+    with st.expander("Curva codo / silhouette por K"):
+        curva = curva_k(huella) if huella else None
+        if curva is None:
+            st.caption("Calculando la curva en segundo plano; se mostrará en el próximo rerun.")
+        elif curva.empty:
+            st.caption("No se pudo calcular la curva para este vocabulario.")
+        else:
+            st.line_chart(curva.set_index("k")[["inercia"]])
+            st.line_chart(curva.set_index("k")[["silhouette"]])
+
     st.session_state["listing_clusters"] = df_cluster
     _df = st.session_state.get("listing_clusters", pd.DataFrame())
     if isinstance(_df, pd.DataFrame) and not _df.empty:
@@ -0,0 +1,384 @@
+# listing/funcional_listing_batch.py
+# Generación headless de listings para muchos workbooks (un ASIN por workbook).
+# - Mismo pipeline que la UI, con parámetros explícitos (sin st.session_state):
+#   dedup → estadística (imputado, filtros por defecto) → tiers → tokens
+#   priorizados → lemas → embeddings + KMeans → reviews IA → contraste →
+#   inputs_para_listing → etapas de copy (generar_listing).
+# - Workbooks en un pool de hilos; las llamadas LLM comparten el límite global
+#   (utils/limite_llm_utils.py). Con procesos > 1 los workbooks se reparten en
+#   procesos y cada uno recibe rpm / procesos.
+# - Checkpoint por ASIN en <salida>/<asin>/: cada paso deja su artefacto
+#   (Parquet si hay pyarrow; si no JSON) y estado.json. Si la huella del Excel
+#   no cambió, una nueva corrida retoma desde el primer paso pendiente y solo
+#   repite las etapas de copy que faltan o fallaron.
+
+import os
+import re
+import json
+import time
+import contextvars
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional
+
+from datos.loader_datos_excel import preparar_libro
+from listing.funcional_listing_copywrite import STAGES, generar_listing
+from utils.limite_llm_utils import configurar_limite
+from utils.telemetria_llm_utils import contexto_llm
+
+VERSION_BATCH = 1
+PASOS = ("tiers", "clusters", "reviews", "inputs", "listing")
+
+# Mismos valores por defecto que la vista de clusters semánticos
+CUARTILES_DIRECTA = ["Top 25%", "Top 50%"]
+CUARTILES_ESPECIALIZACION = ["Top 25%"]
+CUARTILES_DIFERENCIACION: List[str] = []
+N_CLUSTERS = 6
+
+ESTADO_NAME = "estado.json"
+RESUMEN_NAME = "resumen_batch.csv"
+
+
+# ----------------------------
+# Manifest
+# ----------------------------
+
+
+def leer_manifest(ruta: str) -> List[dict]:
+    """
+    Trabajos [{"excel": ruta, "asin": opcional}] desde:
+    - un directorio (todos los .xlsx, sin temporales ~$),
+    - un CSV con columnas excel[,asin],
+    - un JSON (lista) o JSONL con esos campos.
+    Las rutas relativas del manifest se resuelven contra su carpeta.
+    """
+    if os.path.isdir(ruta):
+        return [{"excel": os.path.join(ruta, f)} for f in sorted(os.listdir(ruta))
+                if f.lower().endswith(".xlsx") and not f.startswith("~$")]
+
+    base = os.path.dirname(os.path.abspath(ruta))
+    if ruta.lower().endswith(".csv"):
+        filas = pd.read_csv(ruta, dtype=str).fillna("").to_dict(orient="records")
+    else:
+        with open(ruta, encoding="utf-8") as f:
+            texto = f.read().strip()
+        if texto.startswith("["):
+            filas = json.loads(texto)
+        else:
+            filas = [json.loads(linea) for linea in texto.splitlines() if linea.strip()]
+
+    trabajos = []
+    for fila in filas:
+        excel = str(fila.get("excel") or "").strip()
+        if not excel:
+            continue
+        trabajo = {"excel": excel if os.path.isabs(excel) else os.path.join(base, excel)}
+        if str(fila.get("asin") or "").strip():
+            trabajo["asin"] = str(fila["asin"]).strip()
+        trabajos.append(trabajo)
+    return trabajos
+
+
+# ----------------------------
+# Artefactos
+# ----------------------------
+
+
+def _nombre_asin(asin: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_\-]", "_", asin) or "sin_asin"
+
+
+def _guardar_json(obj, ruta: str) -> None:
+    tmp = f"{ruta}.tmp{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=1, default=str)
+    os.replace(tmp, ruta)
+
+
+def _guardar_df(df: pd.DataFrame, base: str) -> str:
+    """Parquet (pyarrow) o, si falla, JSON por registros. Devuelve el archivo escrito."""
+    try:
+        ruta = f"{base}.parquet"
+        df.to_parquet(ruta, index=False)
+        return os.path.basename(ruta)
+    except Exception:
+        ruta = f"{base}.json"
+        df.to_json(ruta, orient="records", force_ascii=False)
+        return os.path.basename(ruta)
+
+
+def _leer_df(ruta: str) -> pd.DataFrame:
+    if ruta.endswith(".parquet"):
+        return pd.read_parquet(ruta)
+    return pd.read_json(ruta, orient="records")
+
+
+def _filas_draft(asin: str, draft: dict) -> pd.DataFrame:
+    """Borrador plano: una fila por texto (asin, etapa, scope, campo, texto, chars)."""
+    filas = []
+    for scope, par in (draft.get("title") or {}).items():
+        for campo, texto in (par or {}).items():
+            filas.append((asin, "title", scope, campo, texto))
+    for scope, items in (draft.get("bullets") or {}).items():
+        for i, texto in enumerate(items or [], 1):
+            filas.append((asin, "bullets", scope, f"b{i}", texto))
+    for etapa, clave in (("description", "description"), ("backend", "search_terms")):
+        if clave in draft:
+            filas.append((asin, etapa, "parent", clave, draft[clave]))
+    df = pd.DataFrame(filas, columns=["asin", "etapa", "scope", "campo", "texto"])
+    df["chars"] = df["texto"].astype(str).str.len()
+    return df
+
+
+# ----------------------------
+# Pasos del pipeline (explícitos, sin sesión)
+# ----------------------------
+
+
+def _paso_tiers(excel_data: pd.ExcelFile) -> pd.DataFrame:
+    from keywords.funcional_keywords_deduplicado import build_master_deduplicated
+    from keywords.funcional_keywords_estadistica import generar_matriz_tiers, obtener_imputado
+
+    df_dedup = build_master_deduplicated(excel_data)
+    if df_dedup.empty:
+        raise ValueError("El Excel no tiene keywords para deduplicar.")
+    # Vista descriptiva con los sliders en su rango completo = imputado con -1 → 0
+    df_filtrado = obtener_imputado(df_dedup, None, faltantes_como_cero=True).reset_index(drop=True)
+    return generar_matriz_tiers(df_filtrado)
+
+
+def _paso_clusters(excel_data: pd.ExcelFile, df_tiers: pd.DataFrame) -> pd.DataFrame:
+    from listing.funcional_listing_tokenizacion import (
+        agrupar_embeddings_kmeans,
+        generar_embeddings,
+        lemmatizar_tokens_priorizados,
+        priorizar_tokens,
+    )
+
+    df_tokens = priorizar_tokens(CUARTILES_DIRECTA, CUARTILES_ESPECIALIZACION,
+                                 CUARTILES_DIFERENCIACION,
+                                 df_tiers=df_tiers, excel_data=excel_data)
+    if df_tokens.empty:
+        raise ValueError("No hay tokens priorizados (revisa tiers / volumen).")
+    df_embed, X = generar_embeddings(lemmatizar_tokens_priorizados(df_tokens))
+    df_cluster = agrupar_embeddings_kmeans(df_embed, X, n_clusters=N_CLUSTERS)
+    if df_cluster.empty:
+        raise ValueError("No se pudo clusterizar (modelo de vectores no disponible).")
+    return df_cluster
+
+
+def _paso_reviews(excel_data: pd.ExcelFile) -> dict:
+    from mercado.funcional_mercado_reviews import analizar_reviews, claves_con_error
+    from mercado.loader_data_cliente import cargar_data_cliente
+
+    preguntas = cargar_data_cliente(excel_data).get("preguntas_rufus", [])
+    with contexto_llm(etapa="reviews"):
+        resultados = analizar_reviews(excel_data, preguntas)
+    # analizar_reviews no lanza: devuelve {} o textos "[ERROR …]". Se lanza aquí
+    # para que el paso quede pendiente y una nueva corrida lo reintente.
+    if not resultados:
+        raise ValueError("El Excel no tiene reviews válidas para analizar.")
+    errores = claves_con_error(resultados)
+    if errores:
+        raise RuntimeError(f"Análisis de reviews incompleto: {', '.join(errores)}")
+    return resultados
+
+
+def _paso_inputs(excel_data: pd.ExcelFile, resultados: dict, df_lemas: pd.DataFrame) -> pd.DataFrame:
+    from mercado.funcional_mercado_contraste import tabla_contraste_desde_excel
+    from mercado.loader_inputs_listing import construir_inputs_listing
+
+    atributos_raw = resultados.get("atributos_valorados", "") if isinstance(resultados, dict) else ""
+    atributos_ia = [x.strip("-• ").lower() for x in str(atributos_raw or "").split("\n") if x.strip()]
+    df_edit = tabla_contraste_desde_excel(excel_data, atributos_ia)
+    df = construir_inputs_listing(resultados, df_edit, excel_data=excel_data,
+                                  df_semantic=df_lemas, en_sesion=False)
+    if df.empty:
+        raise ValueError("inputs_para_listing vacío.")
+    return df
+
+
+# ----------------------------
+# Un workbook
+# ----------------------------
+
+
+def procesar_workbook(trabajo: dict, salida: str, etapas=("title", "bullets"),
+                      cost_saver: bool = True, backend_tras_copy: bool = False,
+                      forzar: bool = False) -> dict:
+    """
+    Corre el pipeline completo de un workbook con checkpoints en <salida>/<asin>/.
+    Devuelve la fila de resumen {asin, excel, estado, paso, etapas_ok, errores, segundos}.
+    Nunca lanza: el error queda en estado.json y en el resumen.
+    """
+    from mercado.loader_data_cliente import cargar_data_cliente
+
+    inicio = time.perf_counter()
+    ruta_excel = trabajo["excel"]
+    fila = {"asin": trabajo.get("asin", ""), "excel": ruta_excel, "estado": "error",
+            "paso": "", "etapas_ok": "", "errores": "", "segundos": 0.0}
+    paso, estado, ruta_estado = "excel", {}, None
+    try:
+        huella = preparar_libro(ruta_excel)
+        excel_data = pd.ExcelFile(ruta_excel)
+        asin = trabajo.get("asin") or str(cargar_data_cliente(excel_data).get("asin_cliente") or "")
+        if not asin or asin.lower() == "nan":
+            asin = os.path.splitext(os.path.basename(ruta_excel))[0]
+        fila["asin"] = asin
+
+        carpeta = os.path.join(salida, _nombre_asin(asin))
+        os.makedirs(carpeta, exist_ok=True)
+        ruta_estado = os.path.join(carpeta, ESTADO_NAME)
+        estado = {}
+        if not forzar and os.path.exists(ruta_estado):
+            with open(ruta_estado, encoding="utf-8") as f:
+                estado = json.load(f)
+        if estado.get("huella") != huella or estado.get("version") != VERSION_BATCH:
+            estado = {}  # otro contenido / formato: se recalcula todo
+        estado.update({"asin": asin, "excel": ruta_excel, "huella": huella,
+                       "version": VERSION_BATCH})
+        pasos = estado.setdefault("pasos", {})
+
+        def _checkpoint(nombre: str, calcular: Callable, es_df: bool = True):
+            """Devuelve el artefacto del paso (desde disco si ya estaba hecho)."""
+            nonlocal paso
+            paso = nombre
+            previo = pasos.get(nombre) or {}
+            archivo = os.path.join(carpeta, previo.get("archivo", ""))
+            if previo.get("ok") and os.path.isfile(archivo):
+                if es_df:
+                    return _leer_df(archivo)
+                with open(archivo, encoding="utf-8") as f:
+                    return json.load(f)
+            t0 = time.perf_counter()
+            valor = calcular()
+            if es_df:
+                nombre_archivo = _guardar_df(valor, os.path.join(carpeta, nombre))
+            else:
+                nombre_archivo = f"{nombre}.json"
+                _guardar_json(valor, os.path.join(carpeta, nombre_archivo))
+            pasos[nombre] = {"ok": True, "archivo": nombre_archivo,
+                             "segundos": round(time.perf_counter() - t0, 2)}
+            _guardar_json(estado, ruta_estado)
+            return valor
+
+        with contexto_llm(listing=huella):
+            df_tiers = _checkpoint("tiers", lambda: _paso_tiers(excel_data))
+            df_lemas = _checkpoint("clusters", lambda: _paso_clusters(excel_data, df_tiers))
+            resultados = _checkpoint("reviews", lambda: _paso_reviews(excel_data), es_df=False)
+            df_inputs = _checkpoint("inputs", lambda: _paso_inputs(excel_data, resultados, df_lemas))
+
+            # Copy: solo las etapas que faltan (el borrador se guarda al terminar cada una)
+            paso = "listing"
+            ruta_draft = os.path.join(carpeta, "draft.json")
+            draft = {}
+            if os.path.exists(ruta_draft) and (pasos.get("listing") or {}).get("huella") == huella:
+                with open(ruta_draft, encoding="utf-8") as f:
+                    draft = json.load(f)
+            hechas = set((pasos.get("listing") or {}).get("etapas_ok", []))
+            pendientes = [stg for stg in STAGES if stg in etapas and stg not in hechas]
+
+            def _al_terminar(stage: str, parte: dict):
+                draft.update(parte)
+                hechas.add(stage)
+                pasos["listing"] = {"huella": huella, "etapas_ok": sorted(hechas)}
+                _guardar_json(draft, ruta_draft)
+                _guardar_json(estado, ruta_estado)
+
+            errores = {}
+            if pendientes:
+                _, errores = generar_listing(df_inputs, pendientes, cost_saver=cost_saver,
+                                             backend_tras_copy=backend_tras_copy,
+                                             al_terminar=_al_terminar)
+            if draft:
+                _guardar_df(_filas_draft(asin, draft), os.path.join(carpeta, "draft"))
+
+        estado["errores"] = {stg: f"{type(e).__name__}: {e}" for stg, e in errores.items()}
+        estado["actualizado"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        _guardar_json(estado, ruta_estado)
+
+        fila["etapas_ok"] = ",".join(stg for stg in STAGES if stg in hechas)
+        fila["errores"] = "; ".join(f"{k}: {v}" for k, v in estado["errores"].items())
+        fila["estado"] = "ok" if not errores else "parcial"
+        fila["paso"] = "listing"
+    except Exception as e:
+        fila["paso"] = paso
+        fila["errores"] = f"{type(e).__name__}: {e}"
+        if ruta_estado is not None:
+            estado["errores"] = {paso: fila["errores"]}
+            try:
+                _guardar_json(estado, ruta_estado)
+            except OSError:
+                pass
+    fila["segundos"] = round(time.perf_counter() - inicio, 2)
+    return fila
+
+
+# ----------------------------
+# Pool
+# ----------------------------
+
+
+def ejecutar_batch(trabajos: List[dict], salida: str, workers: int = 4,
+                   rpm: Optional[float] = None, rafaga: int = 1,
+                   al_terminar: Optional[Callable[[dict], None]] = None,
+                   **opciones) -> pd.DataFrame:
+    """
+    Procesa los workbooks en un pool de 'workers' hilos con el límite global
+    de rpm llamadas LLM por minuto. opciones → procesar_workbook (etapas,
+    cost_saver, backend_tras_copy, forzar). Devuelve una fila por workbook.
+    """
+    os.makedirs(salida, exist_ok=True)
+    if rpm:
+        configurar_limite(rpm, rafaga)
+
+    filas = []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="batch") as pool:
+        futuros = [pool.submit(contextvars.copy_context().run, procesar_workbook,
+                               trabajo, salida, **opciones) for trabajo in trabajos]
+        for futuro in as_completed(futuros):
+            fila = futuro.result()
+            filas.append(fila)
+            if al_terminar is not None:
+                al_terminar(fila)
+
+    return pd.DataFrame(filas, columns=["asin", "excel", "estado", "paso",
+                                        "etapas_ok", "errores", "segundos"])
+
+
+def _ejecutar_lote(trabajos: List[dict], salida: str, workers: int,
+                   rpm: Optional[float], rafaga: int, opciones: dict) -> pd.DataFrame:
+    # Punto de entrada de cada proceso (sin callback: no cruza procesos)
+    return ejecutar_batch(trabajos, salida, workers=workers, rpm=rpm, rafaga=rafaga, **opciones)
+
+
+def ejecutar_batch_procesos(trabajos: List[dict], salida: str, procesos: int = 1,
+                            workers: int = 4, rpm: Optional[float] = None, rafaga: int = 1,
+                            al_terminar: Optional[Callable[[dict], None]] = None,
+                            **opciones) -> pd.DataFrame:
+    """
+    Reparte los workbooks en 'procesos' (round-robin; cada uno con su pool de
+    'workers' hilos y rpm / procesos). procesos=1 → ejecutar_batch directo.
+    Escribe y devuelve el resumen consolidado.
+    """
+    procesos = max(1, min(procesos, len(trabajos) or 1))
+    if procesos == 1:
+        resumen = ejecutar_batch(trabajos, salida, workers=workers, rpm=rpm, rafaga=rafaga,
+                                 al_terminar=al_terminar, **opciones)
+    else:
+        lotes = [trabajos[i::procesos] for i in range(procesos)]
+        rpm_lote = rpm / procesos if rpm else None
+        partes = []
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            futuros = [pool.submit(_ejecutar_lote, lote, salida, workers, rpm_lote,
+                                   max(1, rafaga // procesos), opciones) for lote in lotes]
+            for futuro in as_completed(futuros):
+                parte = futuro.result()
+                partes.append(parte)
+                if al_terminar is not None:
+                    for fila in parte.to_dict(orient="records"):
+                        al_terminar(fila)
+        resumen = pd.concat(partes, ignore_index=True)
+
+    resumen.to_csv(os.path.join(salida, RESUMEN_NAME), index=False)
+    return resumen
@@ -0,0 +1,182 @@
+# listing/funcional_listing_clusters.py
+# Motor de clusterización de embeddings (vista de clusters semánticos).
+# - PCA 2D cacheado por huella de la matriz de embeddings.
+# - El k elegido se ajusta siempre igual que antes (KMeans, random_state=42,
+#   n_init="auto") y se cachea por (huella, k): mismas etiquetas en cada corrida,
+#   sesión o batch.
+# - La curva codo/silhouette para RANGO_K se calcula en un hilo de fondo con
+#   ajustes propios más baratos: MiniBatchKMeans por encima de UMBRAL_MINIBATCH
+#   y cada k parte de los centroides de k-1 (warm start). Esos ajustes solo dan
+#   inercia/silhouette; nunca se usan como etiquetas.
+#
+# Las cachés son del proceso (compartidas entre sesiones) y guardan como máximo
+# _MAX_MATRICES matrices distintas.
+
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+UMBRAL_MINIBATCH = 5000
+BATCH_MINIBATCH = 1024
+RANGO_K = range(2, 16)
+MUESTRA_SILHOUETTE = 2000
+_MAX_MATRICES = 4
+
+_LOCK = threading.Lock()
+_HUELLAS: List[str] = []
+_PCA: Dict[str, np.ndarray] = {}
+_KMEANS: Dict[Tuple[str, int], dict] = {}
+_KMEANS_CURVA: Dict[Tuple[str, int], dict] = {}
+_CURVAS: Dict[str, Future] = {}
+_EJECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="curva_k")
+
+
+def huella_matriz(X: np.ndarray) -> str:
+    """Hash del contenido de la matriz (forma + bytes)."""
+    X = np.ascontiguousarray(X)
+    h = hashlib.sha1(f"{X.shape}|{X.dtype}".encode("utf-8"))
+    h.update(X.view(np.uint8))
+    return h.hexdigest()
+
+
+def _registrar_huella(huella: str) -> None:
+    """Marca la huella como usada y descarta las cachés de las más antiguas."""
+    with _LOCK:
+        if huella in _HUELLAS:
+            _HUELLAS.remove(huella)
+        _HUELLAS.append(huella)
+        while len(_HUELLAS) > _MAX_MATRICES:
+            vieja = _HUELLAS.pop(0)
+            _PCA.pop(vieja, None)
+            _CURVAS.pop(vieja, None)
+            for cache in (_KMEANS, _KMEANS_CURVA):
+                for clave in [c for c in cache if c[0] == vieja]:
+                    cache.pop(clave, None)
+
+
+def proyectar_pca(X: np.ndarray, huella: Optional[str] = None) -> np.ndarray:
+    """Proyección PCA 2D de X (n × 2), calculada una vez por matriz."""
+    huella = huella or huella_matriz(X)
+    _registrar_huella(huella)
+    if huella in _PCA:
+        return _PCA[huella]
+
+    from sklearn.decomposition import PCA
+
+    puntos = PCA(n_components=2).fit_transform(X)
+    with _LOCK:
+        _PCA[huella] = puntos
+    return puntos
+
+
+def _centroides_iniciales(X: np.ndarray, previo: dict, k: int) -> Optional[np.ndarray]:
+    """
+    Centroides de partida (curva) a partir del ajuste con k-1: se agrega el
+    punto más lejano a su centroide.
+    """
+    centros, etiquetas = previo["centros"], previo["etiquetas"]
+    if k != len(centros) + 1:
+        return None
+    distancias = ((np.asarray(X) - centros[etiquetas]) ** 2).sum(axis=1)
+    return np.vstack([centros, np.asarray(X)[np.argmax(distancias)]])
+
+
+def _resultado(modelo, etiquetas: np.ndarray) -> dict:
+    return {"etiquetas": etiquetas, "centros": modelo.cluster_centers_,
+            "inercia": float(modelo.inertia_)}
+
+
+def _ajustar_curva(X: np.ndarray, k: int, init: Optional[np.ndarray]) -> dict:
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+
+    parametros = {"init": init, "n_init": 1} if init is not None else {"n_init": "auto"}
+    if len(X) > UMBRAL_MINIBATCH:
+        modelo = MiniBatchKMeans(n_clusters=k, random_state=42,
+                                 batch_size=BATCH_MINIBATCH, **parametros)
+    else:
+        modelo = KMeans(n_clusters=k, random_state=42, **parametros)
+    return _resultado(modelo, modelo.fit_predict(X))
+
+
+def clusters_kmeans(X: np.ndarray, k: int, huella: Optional[str] = None) -> dict:
+    """
+    Ajuste (etiquetas, centros, inercia) para k, cacheado por (huella, k).
+    Determinista: KMeans(random_state=42, n_init="auto"), sin warm start.
+    """
+    from sklearn.cluster import KMeans
+
+    huella = huella or huella_matriz(X)
+    _registrar_huella(huella)
+    k = max(1, min(k, len(X)))
+    with _LOCK:
+        resultado = _KMEANS.get((huella, k))
+    if resultado is not None:
+        return resultado
+
+    modelo = KMeans(n_clusters=k, random_state=42, n_init="auto")
+    resultado = _resultado(modelo, modelo.fit_predict(X))
+    with _LOCK:
+        _KMEANS[(huella, k)] = resultado
+    return resultado
+
+
+def _ajuste_curva(X: np.ndarray, k: int, huella: str) -> dict:
+    """Ajuste barato para la curva; parte de los centroides de k-1 si ya están."""
+    with _LOCK:
+        resultado = _KMEANS_CURVA.get((huella, k))
+        previo = _KMEANS_CURVA.get((huella, k - 1))
+    if resultado is not None:
+        return resultado
+
+    init = _centroides_iniciales(X, previo, k) if previo is not None else None
+    resultado = _ajustar_curva(X, k, init)
+    with _LOCK:
+        _KMEANS_CURVA[(huella, k)] = resultado
+    return resultado
+
+
+def _calcular_curva(X: np.ndarray, huella: str, ks: List[int]) -> pd.DataFrame:
+    from sklearn.metrics import silhouette_score
+
+    filas = []
+    for k in ks:
+        if k >= len(X):
+            break
+        resultado = _ajuste_curva(X, k, huella)
+        etiquetas = resultado["etiquetas"]
+        silhouette = (
+            silhouette_score(X, etiquetas,
+                             sample_size=min(len(X), MUESTRA_SILHOUETTE),
+                             random_state=42)
+            if len(np.unique(etiquetas)) > 1 else np.nan
+        )
+        filas.append({"k": k, "inercia": resultado["inercia"],
+                      "silhouette": float(silhouette)})
+    return pd.DataFrame(filas, columns=["k", "inercia", "silhouette"])
+
+
+def iniciar_curva_k(X: np.ndarray, ks=RANGO_K, huella: Optional[str] = None) -> str:
+    """
+    Lanza (una vez por matriz) el cálculo de codo/silhouette para todos los k
+    en segundo plano. Devuelve la huella para consultar con curva_k().
+    """
+    huella = huella or huella_matriz(X)
+    _registrar_huella(huella)
+    with _LOCK:
+        if huella not in _CURVAS:
+            _CURVAS[huella] = _EJECUTOR.submit(_calcular_curva, X, huella, list(ks))
+    return huella
+
+
+def curva_k(huella: str) -> Optional[pd.DataFrame]:
+    """Curva k → inercia/silhouette si ya terminó; None mientras se calcula."""
+    futuro = _CURVAS.get(huella)
+    if futuro is None or not futuro.done():
+        return None
+    try:
+        return futuro.result()
+    except Exception:
+        return pd.DataFrame(columns=["k", "inercia", "silhouette"])
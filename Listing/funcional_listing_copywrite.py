@@ -8,16 +8,25 @@
 import os
 import re
 import json
+import time
+import contextvars
 import pandas as pd
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Optional, Tuple
 
 # Prompts por etapa (títulos estrictos + placeholders para las otras)
 from listing.prompts_listing_copywrite import (
     prompt_titles_json,
     prompt_bullets_json,
+    prompt_bullets_fix_json,
     prompt_description_json,
     prompt_backend_json,
 )
+from utils.cache_llm_utils import respuesta_cacheada
+from utils.recursos_utils import cliente_openai
+from utils.json_stream_utils import eventos_json
+from utils.limite_llm_utils import esperar_turno
+from utils.telemetria_llm_utils import contexto_llm, registrar_llamada
 
 # -------------------------- JSON robusto --------------------------
 
@@ -61,11 +70,7 @@ def _parse_json(txt: str) -> dict:
 
 
 # -------------------------- OpenAI --------------------------
-try:
-    from openai import OpenAI
-    _openai_client = OpenAI()
-except Exception:
-    _openai_client = None
+# El cliente se crea en el primer uso (registro de recursos), no al importar.
 
 _MODEL_DEFAULT = os.getenv("LISTING_COPY_MODEL", "gpt-4o-mini")
 _TEMPERATURE = float(os.getenv("LISTING_COPY_TEMPERATURE", "0.2"))
@@ -73,25 +78,97 @@ _MAXTOK = int(os.getenv("LISTING_COPY_MAXTOK", "1800"))
 
 
 def _require_openai():
-    if _openai_client is None:
+    try:
+        return cliente_openai()
+    except Exception:
         raise RuntimeError(
             "OpenAI SDK no disponible. Instala `openai>=1.0.0` y exporta OPENAI_API_KEY.")
-    return _openai_client
 
 
-def _chat_json(user_prompt: str) -> dict:
+_SYSTEM_JSON = "Return ONLY raw JSON. No prose, no markdown, no code fences."
+
+
+def _chat_json(user_prompt: str, al_parcial: Optional[Callable[[tuple, object], None]] = None) -> dict:
+    """
+    JSON de una llamada. Con al_parcial(ruta, valor) la respuesta llega en
+    streaming y cada valor se notifica en cuanto se completa (utils/json_stream_utils);
+    en un acierto de caché los mismos eventos se reproducen desde el texto guardado.
+    """
     client = _require_openai()
-    resp = client.chat.completions.create(
+    transmitido = []
+
+    def _generar() -> str:
+        # La latencia del ledger no incluye la espera del limitador (va en espera_s)
+        espera = esperar_turno()
+        inicio = time.perf_counter()
+        try:
+            if al_parcial is not None:
+                content, uso = _stream_json(client, user_prompt, al_parcial)
+                transmitido.append(True)
+            else:
+                resp = client.chat.completions.create(
+                    model=_MODEL_DEFAULT,
+                    temperature=_TEMPERATURE,
+                    max_tokens=_MAXTOK,
+                    messages=[
+                        {"role": "system", "content": _SYSTEM_JSON},
+                        {"role": "user",   "content": user_prompt},
+                    ],
+                )
+                content, uso = resp.choices[0].message.content or "", getattr(resp, "usage", None)
+        except Exception:
+            registrar_llamada(_MODEL_DEFAULT, None, time.perf_counter() - inicio,
+                              ok=False, espera_s=espera)
+            raise
+        registrar_llamada(_MODEL_DEFAULT, uso, time.perf_counter() - inicio, espera_s=espera)
+        return content.strip()
+
+    # Caché en disco: mismos inputs → 0 tokens. Solo se guarda JSON parseable.
+    content = respuesta_cacheada(
+        _MODEL_DEFAULT, _TEMPERATURE, _SYSTEM_JSON, user_prompt,
+        generar=_generar,
+        valida=lambda c: bool(_extract_first_json(c)),
+        max_tokens=_MAXTOK,
+    )
+    if al_parcial is not None and not transmitido:
+        for ruta, valor in eventos_json([content]):
+            al_parcial(ruta, valor)
+    return _parse_json(content)
+
+
+def _stream_json(client, user_prompt: str, al_parcial: Callable[[tuple, object], None]):
+    """stream=True: va pasando los deltas al parser incremental. Devuelve (texto, usage)."""
+    stream = iter(client.chat.completions.create(
         model=_MODEL_DEFAULT,
         temperature=_TEMPERATURE,
         max_tokens=_MAXTOK,
         messages=[
-            {"role": "system", "content": "Return ONLY raw JSON. No prose, no markdown, no code fences."},
+            {"role": "system", "content": _SYSTEM_JSON},
             {"role": "user",   "content": user_prompt},
         ],
-    )
-    content = (resp.choices[0].message.content or "").strip()
-    return _parse_json(content)
+        stream=True,
+        stream_options={"include_usage": True},
+    ))
+    partes, uso = [], [None]
+
+    def _deltas():
+        for chunk in stream:
+            uso[0] = getattr(chunk, "usage", None) or uso[0]
+            if getattr(chunk, "choices", None):
+                delta = chunk.choices[0].delta.content or ""
+                partes.append(delta)
+                yield delta
+
+    try:
+        for ruta, valor in eventos_json(_deltas()):
+            al_parcial(ruta, valor)
+    except ValueError:
+        # Token no estricto (True, comillas simples…): se dejan de emitir eventos
+        # y _parse_json decide con el texto completo, como sin streaming
+        pass
+    for _ in _deltas():
+        pass  # resto del stream (el chunk final trae usage)
+    return "".join(partes), uso[0]
 
 
 # -------------------------- Helpers de datos --------------------------
@@ -418,132 +495,324 @@ def _enforce_bullets_length(bmap: dict, rows: list, core_tokens: list,
 
 # -------------------------- Bullets: validadores duros (SOP) --------------------------
 
+BULLET_MIN_CHARS = 150
+BULLET_MAX_CHARS = 180
+# Reglas que se corrigen sin LLM (si hay header esperado / tokens disponibles)
+REGLAS_LOCALES = {"longitud", "header_variacion", "sin_header", "sin_tokens"}
 
-def _validate_bullets_payload(bmap: dict, variations_raw: list, rows: list, core_tokens: list) -> (bool, str):
+
+def _headers_esperados(rows: list, variations_raw: list) -> dict:
+    """ scope -> header obligatorio del bullet 1 ('parent' = primera dimensión; hijo = su etiqueta) """
+    var_value_to_label = _get_variation_label_map(rows)
+    dims = _get_variation_dimensions(rows)
+    out = {}
+    if dims:
+        out["parent"] = _clean_header(dims[0])
+    for raw in variations_raw:
+        label = (var_value_to_label.get(raw, "") or "").strip()
+        if label:
+            out[_slugify_variation_value(raw)] = _clean_header(label)
+    return out
+
+
+def _contexto_validacion(rows: list, variations_raw: list, core_tokens: list) -> dict:
+    """Mapas de la tabla que usan validación y reparación (se calculan una vez por payload)."""
+    return {
+        # 'MATERIAL' -> {'Plastic',...}
+        "attr_headers": {_clean_header(k): vs for k, vs in _get_attribute_label_to_values(rows).items()},
+        "esperados": _headers_esperados(rows, variations_raw),
+        "slug_to_value": {_slugify_variation_value(raw): raw for raw in variations_raw},
+        "sem_tokens": list(dict.fromkeys((_get_cluster_tokens(rows) or []) + (core_tokens or []))),
+    }
+
+
+def _violaciones_bullet(ctx: dict, scope: str, i: int, b: str) -> list:
     """
+    Violaciones de UN bullet (posición i, 1..5) → [{"scope", "indice", "regla", "mensaje"}].
     Reglas:
-      - Debe existir "parent" y cada variación (slug) con 5 bullets.
       - Encabezado: IDEA en MAYÚSCULA + ':' + desarrollo.
       - Bullet 1: por variación (header = etiqueta de la variación, p.ej. 'COLOR'), y el cuerpo NO es sólo el valor; debe desarrollar concepto.
       - Bullets 2–5: headers deben ser etiquetas de Atributo (Material/Includes/Dimensions/Weight/Shape/...) y
         el cuerpo NO puede ser sólo repetir el contenido del atributo; debe desarrollar en estilo fascination.
-      - Longitud: 180–240 chars (cada bullet).
+      - Longitud: 150–180 chars (cada bullet).
       - Deben incluir tokens de cluster siempre que no rompan la legibilidad (al menos 1 token cluster o core en cada bullet).
     """
-    # Mapas desde la tabla
-    var_value_to_label = _get_variation_label_map(
-        rows)               # 'Green' -> 'Color'
-    attr_label_to_values = _get_attribute_label_to_values(
-        rows)       # 'Material' -> {'Plastic',...}
-    # ['classroom','student',...]
-    dims = _get_variation_dimensions(rows)
-    first_dim = _clean_header(dims[0]) if dims else ""
-    cluster_tokens = _get_cluster_tokens(rows)
-    sem_tokens = list(dict.fromkeys(
-        (cluster_tokens or []) + (core_tokens or [])))
+    out = []
+    b = b or ""
+
+    def _falla(regla, mensaje):
+        out.append({"scope": scope, "indice": i, "regla": regla, "mensaje": mensaje})
 
-    # Helpers locales
-    def _split_header_body(b: str):
-        if ":" not in b:
-            return "", b.strip()
+    # Longitud
+    if not BULLET_MIN_CHARS <= len(b) <= BULLET_MAX_CHARS:
+        _falla("longitud", f"{scope}: bullet {i} fuera de {BULLET_MIN_CHARS}–{BULLET_MAX_CHARS} chars ({len(b)})")
+
+    # Header y cuerpo
+    if ":" not in b:
+        H, body = "", b.strip()
+    else:
         idx = b.find(":")
-        return _clean_header(b[:idx]), b[idx+1:].strip()
+        H, body = _clean_header(b[:idx]), b[idx+1:].strip()
+    if not H or not body:
+        _falla("sin_header", f"{scope}: bullet {i} sin encabezado en MAYÚSCULA o sin cuerpo")
+    # Desarrollo mínimo: no permitir texto demasiado corto o trivial
+    if len(body.split()) < 14:
+        _falla("muy_corto", f"{scope}: bullet {i} muy corto; desarrolla el concepto (fascination + clusters)")
+
+    # Debe incluir algún token semántico (cluster/core) para enriquecer
+    if not _has_any_token(b, ctx["sem_tokens"]):
+        _falla("sin_tokens", f"{scope}: bullet {i} sin tokens de cluster/core")
+
+    # Reglas específicas
+    if i == 1 and (scope == "parent" or scope in ctx["slug_to_value"]):
+        esperado = ctx["esperados"].get(scope, "")
+        if scope != "parent" and not esperado:
+            _falla("etiqueta_variacion", f"{scope}: no encuentro etiqueta de variación para bullet 1")
+        elif esperado and H and H != esperado:
+            _falla("header_variacion", f"{scope}: bullet 1 header debe ser la etiqueta de variación '{esperado}'")
+
+        # Cuerpo no puede ser sólo el valor literal ni frase trivial
+        var_value = ctx["slug_to_value"].get(scope)
+        if var_value and var_value.lower() in body.lower() and len(body.split()) < 10:
+            _falla("literal", f"{scope}: bullet 1 muy literal, desarrolla el concepto (fascination)")
+
+    if i >= 2 and H:
+        # Bullets 2–5: deben corresponder a etiquetas de Atributo
+        if H not in ctx["attr_headers"]:
+            _falla("header_atributo", f"{scope}: bullet {i} header '{H}' no es una etiqueta de Atributo válida")
+
+        # Evitar que el cuerpo sea solo repetir el contenido del atributo
+        elif any(v and v.lower() == body.lower() for v in ctx["attr_headers"][H]):
+            _falla("repite_atributo", f"{scope}: bullet {i} cuerpo repite exactamente el contenido del atributo")
+
+    return out
 
-    def _in_len_range(b: str) -> bool:
-        n = len(b or "")
-        return 150 <= n <= 180
+
+def _violaciones_bullets(bmap: dict, variations_raw: list, rows: list, core_tokens: list) -> list:
+    """
+    Valida TODO el payload en una pasada y devuelve la lista de violaciones
+    (scope/indice None = estructura): "parent" y cada variación (slug) con
+    5 bullets, y las reglas de _violaciones_bullet en cada uno.
+    """
+    ctx = _contexto_validacion(rows, variations_raw, core_tokens)
+    out = []
 
     # Estructura base
     if "parent" not in bmap or not isinstance(bmap.get("parent"), list):
-        return False, "Bullets: falta 'parent' o no es lista"
+        out.append({"scope": None, "indice": None, "regla": "estructura",
+                    "mensaje": "Bullets: falta 'parent' o no es lista"})
     for vk in variations_raw:
         slug = _slugify_variation_value(vk)
         if slug not in bmap or not isinstance(bmap.get(slug), list):
-            return False, f"Bullets: falta variación '{slug}' o no es lista"
+            out.append({"scope": None, "indice": None, "regla": "estructura",
+                        "mensaje": f"Bullets: falta variación '{slug}' o no es lista"})
 
     # Chequear cada scope
     for scope, items in bmap.items():
         if not isinstance(items, list) or len(items) != 5:
-            return False, f"{scope}: deben ser 5 bullets"
-
+            out.append({"scope": scope, "indice": None, "regla": "estructura",
+                        "mensaje": f"{scope}: deben ser 5 bullets"})
+            continue
         for i, b in enumerate(items, 1):
-            # Longitud
-            if not _in_len_range(b):
-                return False, f"{scope}: bullet {i} fuera de 150–180 chars"
-
-            # Header y cuerpo
-            H, body = _split_header_body(b)
-            if scope == "parent" and i == 1 and first_dim:
-                if H != first_dim:
-                    return False, f"{scope}: bullet 1 header debe ser la etiqueta de variación '{first_dim}'"
-                    # Desarrollo mínimo: no permitir texto demasiado corto o trivial
-            if len(body.split()) < 14:
-                return False, "parent: bullet 1 muy corto; desarrolla el concepto de la dimensión (fascination + clusters)"
-
-            if not H or not body:
-                return False, f"{scope}: bullet {i} sin encabezado en MAYÚSCULA o sin cuerpo"
-
-            # Debe incluir algún token semántico (cluster/core) para enriquecer
-            if not _has_any_token(b, sem_tokens):
-                return False, f"{scope}: bullet {i} sin tokens de cluster/core"
-
-            # Reglas específicas
-            if scope != "parent" and i == 1:
-                # Bullet 1 por variación
-                # Recuperar valor de variación real desde el slug
-                # Buscamos cuál raw produce ese slug
-                var_value = None
-                for raw in variations_raw:
-                    if _slugify_variation_value(raw) == scope:
-                        var_value = raw
-                        break
-                var_label = (var_value_to_label.get(
-                    var_value, "") or "").strip()
-                if not var_label:
-                    return False, f"{scope}: no encuentro etiqueta de variación para bullet 1"
-
-                if H != _clean_header(var_label):
-                    return False, f"{scope}: bullet 1 header debe ser etiqueta de variación '{var_label.upper()}'"
-
-                # Cuerpo no puede ser sólo el valor literal ni frase trivial
-                if (var_value or "").lower() in body.lower() and len(body.split()) < 10:
-                    return False, f"{scope}: bullet 1 muy literal, desarrolla el concepto (fascination)"
-
-            if i >= 2:
-                # Bullets 2–5: deben corresponder a etiquetas de Atributo
-                if H not in [_clean_header(k) for k in attr_label_to_values.keys()]:
-                    return False, f"{scope}: bullet {i} header '{H}' no es una etiqueta de Atributo válida"
-
-                # Evitar que el cuerpo sea solo repetir el contenido del atributo
-                vals = set()
-                for lab, vs in attr_label_to_values.items():
-                    if _clean_header(lab) == H:
-                        vals |= vs
-                for v in vals:
-                    if v and v.lower() == body.lower():
-                        return False, f"{scope}: bullet {i} cuerpo repite exactamente el contenido del atributo"
-
-    return True, ""
-
-
-def _retry_bullets(sys_user_prompt: str, base_prompt: str, rows: list, core_tokens: list, variations_raw: list, max_tries=3):
-    last_err = ""
-    last_bmap = None
+            out += _violaciones_bullet(ctx, scope, i, b)
+
+    return out
+
+
+def _validate_bullets_payload(bmap: dict, variations_raw: list, rows: list, core_tokens: list) -> (bool, str):
+    """ Compat: (ok, primer mensaje) sobre _violaciones_bullets. """
+    fallas = _violaciones_bullets(bmap, variations_raw, rows, core_tokens)
+    return (not fallas), (fallas[0]["mensaje"] if fallas else "")
+
+
+# -------------------------- Bullets: reparación (local → sub-prompt → completo) --------------------------
+
+
+def _agregar_token(b: str, sem_tokens: list, max_len: int) -> str:
+    """Agrega al final el primer token semántico (recortando el cuerpo si no cabe)."""
+    if not sem_tokens:
+        return b
+    sep, token = " — ", sem_tokens[0]
+    header, body = _split_header_body_text(b)
+    base = f"{header}: " if header else ""
+    room = max_len - len(base) - len(sep) - len(token)
+    if room <= 0:
+        return b
+    if len(body) > room:
+        # mismo corte que _trim_to_max: sin partir palabras
+        cut = body[:room].rfind(" ")
+        body = re.sub(r"[\s,;:\-–—]+$", "", body[:cut if cut > 0 else room])
+    return _rebuild_bullet(header, (body + sep if body else "") + token)
+
+
+def _reparar_bullet(b: str, reglas: set, esperado: Optional[str], rows: list, core_tokens: list,
+                    sem_tokens: list) -> str:
+    """
+    Correcciones deterministas de UN bullet: header esperado del bullet 1,
+    token semántico ausente y longitud (_trim_to_max / _pad_to_min vía
+    _enforce_bullets_length). Un bullet vacío se devuelve tal cual.
+    """
+    b = (b or "").strip()
+    if not b or not reglas & REGLAS_LOCALES:
+        return b
+    if esperado and reglas & {"header_variacion", "sin_header"}:
+        header, body = _split_header_body_text(b)
+        if body:
+            b = _rebuild_bullet(esperado, body)
+    if "sin_tokens" in reglas:
+        b = _agregar_token(b, sem_tokens, BULLET_MAX_CHARS)
+    return _enforce_bullets_length({"_": [b]}, rows, core_tokens,
+                                   BULLET_MIN_CHARS, BULLET_MAX_CHARS)["_"][0]
+
+
+def _reparar_bullets_local(bmap: dict, fallas: list, rows: list, core_tokens: list,
+                           variations_raw: list) -> dict:
+    """Aplica _reparar_bullet SOLO a los bullets con violaciones."""
+    ctx = _contexto_validacion(rows, variations_raw, core_tokens)
+    reglas = {}
+    for f in fallas:
+        if f["indice"] is not None:
+            reglas.setdefault((f["scope"], f["indice"]), set()).add(f["regla"])
+
+    out = {scope: list(items) if isinstance(items, list) else items for scope, items in bmap.items()}
+    for (scope, i), rs in reglas.items():
+        esperado = ctx["esperados"].get(scope) if i == 1 else None
+        out[scope][i - 1] = _reparar_bullet(out[scope][i - 1], rs, esperado, rows, core_tokens,
+                                            ctx["sem_tokens"])
+    return out
+
+
+def _pendientes_bullets(bmap: dict, fallas: list, esperados: dict) -> dict:
+    """ (scope, i) -> {"scope", "index", "bullet", "required_header", "errors"} para el sub-prompt """
+    pendientes = {}
+    for f in fallas:
+        if f["indice"] is None:
+            continue
+        clave = (f["scope"], f["indice"])
+        if clave not in pendientes:
+            pendientes[clave] = {
+                "scope": f["scope"], "index": f["indice"],
+                "bullet": bmap[f["scope"]][f["indice"] - 1],
+                "required_header": esperados.get(f["scope"], "") if f["indice"] == 1 else "",
+                "errors": [],
+            }
+        pendientes[clave]["errors"].append(f["mensaje"])
+    return pendientes
+
+
+def _reprompt_bullets(pendientes: dict, rows: list, core_tokens: list) -> dict:
+    """Un sub-prompt con SOLO los bullets pendientes → {(scope, i): bullet corregido}."""
+    attrs_kv, _ = _collect_kv_for_prompts(rows)
+    sem_tokens = list(dict.fromkeys((_get_cluster_tokens(rows) or []) + (core_tokens or [])))
+
+    j = _chat_json(prompt_bullets_fix_json(
+        list(pendientes.values()), sem_tokens, attrs_kv,
+        min_chars=BULLET_MIN_CHARS, max_chars=BULLET_MAX_CHARS))
+    fixes = {}
+    for fix in (j.get("fixes") if isinstance(j, dict) else None) or []:
+        if not isinstance(fix, dict):
+            continue
+        try:
+            clave = (str(fix.get("scope")), int(fix.get("index")))
+        except (TypeError, ValueError):
+            continue
+        if clave in pendientes and fix.get("bullet"):
+            fixes[clave] = str(fix["bullet"]).strip()
+    return fixes
+
+
+def _aplicar_fixes(bmap: dict, fixes: dict) -> dict:
+    out = {scope: list(items) if isinstance(items, list) else items for scope, items in bmap.items()}
+    for (scope, i), texto in fixes.items():
+        if isinstance(out.get(scope), list) and 1 <= i <= len(out[scope]):
+            out[scope][i - 1] = texto
+    return out
+
+
+def _bullets_en_streaming(base_prompt: str, rows: list, core_tokens: list, variations_raw: list,
+                          al_parcial: Callable[[tuple, object], None]) -> dict:
+    """
+    Primer intento en streaming: cada bullet se valida al completarse; si falla
+    se repara localmente y, si aún falla, su sub-prompt sale en paralelo mientras
+    el resto del JSON sigue llegando. Devuelve el bmap con esas reparaciones.
+    """
+    ctx = _contexto_validacion(rows, variations_raw, core_tokens)
+    scopes = {"parent"} | set(ctx["slug_to_value"])
+    locales, futuros = {}, {}
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="bullets_fix")
+
+    def _al_evento(ruta: tuple, valor):
+        if (len(ruta) == 3 and ruta[0] == "bullets" and ruta[1] in scopes
+                and isinstance(ruta[2], int) and ruta[2] < 5 and isinstance(valor, str)):
+            scope, i = ruta[1], ruta[2] + 1
+            fallas = _violaciones_bullet(ctx, scope, i, valor)
+            if fallas:
+                esperado = ctx["esperados"].get(scope) if i == 1 else None
+                valor = _reparar_bullet(valor, {f["regla"] for f in fallas}, esperado,
+                                        rows, core_tokens, ctx["sem_tokens"])
+                locales[(scope, i)] = valor
+                fallas = _violaciones_bullet(ctx, scope, i, valor)
+            if fallas and valor:
+                pendientes = _pendientes_bullets({scope: [""] * (i - 1) + [valor]}, fallas, ctx["esperados"])
+                futuros[(scope, i)] = pool.submit(
+                    contextvars.copy_context().run, _reprompt_bullets, pendientes, rows, core_tokens)
+        al_parcial(ruta, valor)
+
+    try:
+        j = _chat_json(base_prompt, al_parcial=_al_evento)
+        bmap = _aplicar_fixes(_coerce_bullets_shape(j, variations_raw), locales)
+        for (scope, i), futuro in futuros.items():
+            try:
+                fixes = futuro.result()
+            except Exception:
+                continue  # queda pendiente para la validación completa
+            bmap = _aplicar_fixes(bmap, fixes)
+            for (fs, fi), texto in fixes.items():
+                al_parcial(("bullets", fs, fi - 1), texto)
+    finally:
+        pool.shutdown(wait=False)
+    return bmap
+
+
+def _retry_bullets(sys_user_prompt: str, base_prompt: str, rows: list, core_tokens: list, variations_raw: list,
+                   max_tries=3, al_parcial: Optional[Callable[[tuple, object], None]] = None):
+    """
+    Intento 1: prompt completo (en streaming si hay al_parcial). Después de cada respuesta:
+      1) validación completa (todas las violaciones),
+      2) reparación local determinista,
+      3) si aún fallan bullets, el siguiente intento re-pide SOLO esos bullets
+         (sub-prompt). Si falla más de la mitad (p.ej. JSON roto) se repite el
+         prompt completo con la nota HARD FIX.
+    """
+    esperados = _headers_esperados(rows, variations_raw)
+    bmap, fallas = None, []
     for attempt in range(1, max_tries + 1):
-        note = "" if attempt == 1 else f"\n\nHARD FIX: Previous output failed because: {last_err}. " \
-                                       f"Repair ONLY the violated rules and return JSON again."
-        j = _chat_json(base_prompt + note)
-        bmap = _coerce_bullets_shape(j, variations_raw)
-        ok, msg = _validate_bullets_payload(
-            bmap, variations_raw, rows, core_tokens)
-        if ok:
+        total = sum(len(v) for v in (bmap or {}).values() if isinstance(v, list)) or 1
+        pendientes = _pendientes_bullets(bmap, fallas, esperados) if bmap else {}
+        estructura = any(f["indice"] is None for f in fallas)
+        with contexto_llm(intento=attempt):
+            if bmap is None and al_parcial is not None:
+                bmap = _bullets_en_streaming(base_prompt, rows, core_tokens, variations_raw, al_parcial)
+            elif bmap is None or estructura or len(pendientes) * 2 > total:
+                motivos = "; ".join(f["mensaje"] for f in fallas[:8])
+                note = "" if not fallas else f"\n\nHARD FIX: Previous output failed because: {motivos}. " \
+                                             f"Repair ONLY the violated rules and return JSON again."
+                j = _chat_json(base_prompt + note)
+                bmap = _coerce_bullets_shape(j, variations_raw)
+            else:
+                bmap = _aplicar_fixes(bmap, _reprompt_bullets(pendientes, rows, core_tokens))
+
+        fallas = _violaciones_bullets(bmap, variations_raw, rows, core_tokens)
+        if fallas:
+            bmap = _reparar_bullets_local(bmap, fallas, rows, core_tokens, variations_raw)
+            fallas = _violaciones_bullets(bmap, variations_raw, rows, core_tokens)
+        if not fallas:
             return bmap
-        last_err = msg or "invalid"
-        last_bmap = bmap
 
     # 👇 en vez de devolver lo inválido
     raise ValueError(
-        f"Bullets inválidos tras {max_tries} intentos: {last_err}")
+        f"Bullets inválidos tras {max_tries} intentos ({len(fallas)} violaciones): "
+        f"{fallas[0]['mensaje']}")
 
     # -------------------------- NUEVO helper para prompt de Bullets --------------------------
 
@@ -571,34 +840,47 @@ def _collect_kv_for_prompts(rows: list):
 
 # -------------------------- Ejecución por ETAPA --------------------------
 
+STAGES = ("title", "bullets", "description", "backend")
+# Etapas que forman el copy visible (el backend puede esperar a que terminen)
+STAGES_SUPERFICIE = ("title", "bullets", "description")
+# Etapas con prompt disponible (description/backend siguen en NotImplementedError)
+STAGES_IMPLEMENTADAS = ("title", "bullets")
+MAX_STAGES_PARALELO = 4
 
-def run_listing_stage(inputs_df: pd.DataFrame, stage: str, cost_saver: bool = True, rules: Optional[dict] = None):
+
+def proyectar_inputs(inputs_df: pd.DataFrame, cost_saver: bool = True) -> dict:
     """
-    Genera SOLO una etapa: 'title' | 'bullets' | 'description' | 'backend'
-    No agrega reglas propias. Usa el prompt de esa etapa tal cual esté definido.
+    Proyección de inputs_para_listing que comparten todas las etapas
+    (_to_records + _collect + pares label/value), calculada una sola vez.
     """
     if not isinstance(inputs_df, pd.DataFrame) or inputs_df.empty:
         raise ValueError(
             "inputs_df vacío; construye inputs_para_listing primero.")
 
     rows = _to_records(inputs_df, budgeted=cost_saver)
-    proj = _collect(rows)
+    attrs_kv, vars_kv = _collect_kv_for_prompts(rows)
+    return {"rows": rows, "proj": _collect(rows),
+            "attrs_kv": attrs_kv, "vars_kv": vars_kv}
+
+
+def _generar_stage(proyeccion: dict, stage: str, surface_copy: Optional[dict] = None,
+                   al_parcial: Optional[Callable[[tuple, object], None]] = None) -> dict:
+    rows, proj = proyeccion["rows"], proyeccion["proj"]
+    base = (
+        proj["head_phrases"], proj["core_tokens"], proj["attributes"], proj["variations"],
+        proj["benefits"], proj["emotions"], proj["buyer_persona"], proj["lexico"]
+    )
 
     if stage == "title":
-        up = prompt_titles_json(
-            proj["head_phrases"], proj["core_tokens"], proj["attributes"], proj["variations"],
-            proj["benefits"], proj["emotions"], proj["buyer_persona"], proj["lexico"]
-        )
-        j = _chat_json(up)
+        up = prompt_titles_json(*base)
+        j = _chat_json(up, al_parcial=al_parcial)
         titles = _coerce_titles_shape(j, proj["variations"])
         return {"title": titles}
 
     elif stage == "bullets":
-        attrs_kv, vars_kv = _collect_kv_for_prompts(rows)
         up = prompt_bullets_json(
-            proj["head_phrases"], proj["core_tokens"], proj["attributes"], proj["variations"],
-            proj["benefits"], proj["emotions"], proj["buyer_persona"], proj["lexico"],
-            attributes_kv=attrs_kv, variations_kv=vars_kv,
+            *base,
+            attributes_kv=proyeccion["attrs_kv"], variations_kv=proyeccion["vars_kv"],
         )
         bmap = _retry_bullets(
             sys_user_prompt="",
@@ -607,14 +889,12 @@ def run_listing_stage(inputs_df: pd.DataFrame, stage: str, cost_saver: bool = Tr
             core_tokens=proj["core_tokens"],
             variations_raw=proj["variations"],
             max_tries=3,
+            al_parcial=al_parcial,
         )
         return {"bullets": bmap}
 
     elif stage == "description":
-        up = prompt_description_json(
-            proj["head_phrases"], proj["core_tokens"], proj["attributes"], proj["variations"],
-            proj["benefits"], proj["emotions"], proj["buyer_persona"], proj["lexico"]
-        )
+        up = prompt_description_json(*base)
         j = _chat_json(up)
         desc = j.get("description") if isinstance(j, dict) else ""
         if desc is None:
@@ -622,10 +902,8 @@ def run_listing_stage(inputs_df: pd.DataFrame, stage: str, cost_saver: bool = Tr
         return {"description": str(desc)}
 
     elif stage == "backend":
-        up = prompt_backend_json(
-            proj["head_phrases"], proj["core_tokens"], proj["attributes"], proj["variations"],
-            proj["benefits"], proj["emotions"], proj["buyer_persona"], proj["lexico"]
-        )
+        extra = {"surface_copy": surface_copy} if surface_copy else {}
+        up = prompt_backend_json(*base, **extra)
         j = _chat_json(up)
         search = j.get("search_terms") if isinstance(j, dict) else ""
         if search is None:
@@ -635,20 +913,91 @@ def run_listing_stage(inputs_df: pd.DataFrame, stage: str, cost_saver: bool = Tr
     else:
         raise ValueError(f"stage desconocido: {stage}")
 
+
+def run_listing_stage(inputs_df: pd.DataFrame, stage: str, cost_saver: bool = True,
+                      rules: Optional[dict] = None, surface_copy: Optional[dict] = None,
+                      al_parcial: Optional[Callable[[tuple, object], None]] = None):
+    """
+    Genera SOLO una etapa: 'title' | 'bullets' | 'description' | 'backend'
+    No agrega reglas propias. Usa el prompt de esa etapa tal cual esté definido.
+    surface_copy (solo backend): títulos/bullets/descripción ya generados.
+    al_parcial(ruta, valor): streaming; se llama en este hilo con cada título /
+    bullet en cuanto su clave JSON se completa (bullets ya validados/reparados).
+    """
+    if stage not in STAGES:
+        raise ValueError(f"stage desconocido: {stage}")
+    return _generar_stage(proyectar_inputs(inputs_df, cost_saver), stage, surface_copy, al_parcial)
+
+
+def _en_contexto(stage: str, fn, *args):
+    with contexto_llm(etapa=stage):
+        return fn(*args)
+
+
+def generar_listing(inputs_df: pd.DataFrame,
+                    stages=STAGES_IMPLEMENTADAS,
+                    cost_saver: bool = True,
+                    rules: Optional[dict] = None,
+                    backend_tras_copy: bool = False,
+                    al_terminar: Optional[Callable[[str, dict], None]] = None,
+                    concurrencia: int = MAX_STAGES_PARALELO) -> Tuple[dict, Dict[str, Exception]]:
+    """
+    Genera varias etapas en paralelo sobre UNA proyección de inputs.
+    - al_terminar(stage, parte) se llama desde el hilo que invoca (Streamlit)
+      a medida que termina cada etapa, para ir fusionando en draft_listing.
+    - backend_tras_copy: el backend se lanza cuando terminan las etapas de
+      superficie pedidas y recibe ese copy (surface_copy).
+    Devuelve (draft, errores por etapa); una etapa que falla no frena al resto.
+    """
+    stages = [stg for stg in STAGES if stg in stages]
+    proyeccion = proyectar_inputs(inputs_df, cost_saver)
+    esperar = backend_tras_copy and "backend" in stages and any(
+        stg in STAGES_SUPERFICIE for stg in stages)
+    pendientes_superficie = {stg for stg in stages if stg in STAGES_SUPERFICIE}
+
+    draft, errores = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrencia, len(stages))),
+                            thread_name_prefix="listing_stages") as pool:
+        def _lanzar(stage: str, surface_copy: Optional[dict] = None):
+            # copy_context: cada etapa hereda sin_cache()/contexto_llm del llamador
+            return pool.submit(contextvars.copy_context().run, _en_contexto, stage,
+                               _generar_stage, proyeccion, stage, surface_copy)
+
+        futuros = {_lanzar(stg): stg for stg in stages if not (esperar and stg == "backend")}
+        while futuros:
+            listo = next(as_completed(futuros))
+            stage = futuros.pop(listo)
+            try:
+                parte = listo.result()
+                draft.update(parte)
+                if al_terminar is not None:
+                    al_terminar(stage, parte)
+            except Exception as e:
+                errores[stage] = e
+            pendientes_superficie.discard(stage)
+            if esperar and not pendientes_superficie:
+                esperar = False
+                copy = {k: draft[k] for k in ("title", "bullets", "description") if k in draft}
+                futuros[_lanzar("backend", copy)] = "backend"
+    return draft, errores
+
 # -------------------------- Batch opcional (compatibilidad) --------------------------
 
 
-def run_listing_copywrite(inputs_df, use_ai=True, cost_saver=True, rules=None):
+def run_listing_copywrite(inputs_df, use_ai=True, cost_saver=True, rules=None,
+                          backend_tras_copy=False):
     """
-    Compat: genera las 4 etapas en secuencia (solo si lo necesitas).
+    Compat: genera las 4 etapas (en paralelo, ver generar_listing).
+    Si alguna etapa falla se relanza su error, como la versión secuencial.
     """
     if not use_ai:
         raise ValueError("use_ai=False no soportado aquí. Activa 'Use AI'.")
-    draft = {}
-    for stg in ("title", "bullets", "description", "backend"):
-        part = run_listing_stage(
-            inputs_df, stg, cost_saver=cost_saver, rules=rules)
-        draft.update(part)
+    draft, errores = generar_listing(
+        inputs_df, STAGES, cost_saver=cost_saver, rules=rules,
+        backend_tras_copy=backend_tras_copy)
+    for stg in STAGES:
+        if stg in errores:
+            raise errores[stg]
     return draft
 
 # Alias compat
@@ -3,31 +3,33 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import spacy
-from sklearn.cluster import KMeans
-from sklearn.decomposition import PCA
 import re
-
-try:
-    nlp_embed = spacy.load("en_core_web_md")
-    _EMBEDD_OK = True
-except Exception as e:
-    _EMBEDD_OK = False
-    _EMBEDD_ERR = str(e)
+from typing import Optional, Tuple
 
 from listing.loader_listing_keywords import get_tiers_table
+from listing.loader_listing_embeddings import matriz_embeddings
+from listing.funcional_listing_clusters import (
+    clusters_kmeans,
+    huella_matriz,
+    proyectar_pca,
+)
+from listing.loader_listing_lemas import MODELO_LEMAS, lematizar
+from datos.loader_datos_excel import leer_hoja
 
 
-def get_stopwords_from_excel() -> set:
+def get_stopwords_from_excel(excel_data=None) -> set:
     """
-    Carga la columna B de la hoja Avoids como set de stopwords. Requiere que excel_data esté en sesión.
+    Carga la columna B de la hoja Avoids como set de stopwords.
+    excel_data explícito (batch) o, si no se pasa, el de la sesión.
     """
-    if "excel_data" not in st.session_state:
+    if excel_data is None:
+        excel_data = st.session_state.get("excel_data")
+    if excel_data is None:
         st.warning("No se encontró el archivo Excel en sesión.")
         return set()
 
     try:
-        df_avoids = st.session_state["excel_data"].parse("Avoids", skiprows=2)
+        df_avoids = leer_hoja(excel_data, "Avoids", skiprows=2)
         palabras = (
             df_avoids.iloc[:, 1]
             .dropna()
@@ -53,15 +55,16 @@ def limpiar_texto(texto: str, stopwords: set) -> list:
     return tokens
 
 
-def tokenizar_keywords() -> pd.DataFrame:
+def tokenizar_keywords(df_tiers: Optional[pd.DataFrame] = None, excel_data=None) -> pd.DataFrame:
     """
     Carga la tabla estratégica (tiers), aplica tokenización y devuelve nueva tabla con columna 'tokens'.
+    df_tiers / excel_data explícitos (batch) o, si no se pasan, los de la sesión.
     """
-    df = get_tiers_table()
+    df = get_tiers_table() if df_tiers is None else df_tiers
     if df.empty:
         return pd.DataFrame()
 
-    stopwords = get_stopwords_from_excel()
+    stopwords = get_stopwords_from_excel(excel_data)
     df = df.copy()
 
     # Asegurar columnas necesarias (sin tocar el módulo de keywords)
@@ -96,7 +99,9 @@ def tokenizar_keywords() -> pd.DataFrame:
 def priorizar_tokens(
     cuartiles_directa: list,
     cuartiles_especial: list,
-    cuartiles_diferenciacion: list
+    cuartiles_diferenciacion: list,
+    df_tiers: Optional[pd.DataFrame] = None,
+    excel_data=None,
 ) -> pd.DataFrame:
     """
     Construye listado de tokens únicos priorizados por tier estratégico, volumen y cuartiles seleccionados.
@@ -108,7 +113,7 @@ def priorizar_tokens(
       - Diferenciación entra sólo si se selecciona y según cuartiles.
       - Si un token aparece en varios tiers, prevalece el de mayor prioridad y se acumula frecuencia.
     """
-    df = tokenizar_keywords()
+    df = tokenizar_keywords(df_tiers, excel_data)
     if df.empty or "tier" not in df.columns:
         st.warning(
             "La tabla de keywords tokenizadas no está disponible o no tiene columna 'tier'.")
@@ -223,20 +228,18 @@ def lemmatizar_tokens_priorizados(df_tokens: pd.DataFrame) -> pd.DataFrame:
     Conserva la frecuencia total y el tier de mayor prioridad.
     Devuelve un nuevo dataframe con columnas: token_original, token_lema, frecuencia, tier_origen.
     """
-    import spacy
-
-    # Cargar modelo en inglés
-    try:
-        nlp = spacy.load("en_core_web_sm")
-    except OSError:
-        st.error("No se pudo cargar el modelo 'en_core_web_sm'. Ejecuta en terminal:\npython -m spacy download en_core_web_sm")
-        return pd.DataFrame()
-
     # Validación
     if df_tokens.empty or "token" not in df_tokens.columns:
         st.warning("No hay tokens para lematizar.")
         return pd.DataFrame()
 
+    # Lemas en lote (modelo cargado una vez + caché token → lema en disco)
+    try:
+        lemas = lematizar(df_tokens["token"])
+    except (OSError, ImportError):
+        st.error(f"No se pudo cargar el modelo '{MODELO_LEMAS}'. Ejecuta en terminal:\npython -m spacy download {MODELO_LEMAS}")
+        return pd.DataFrame()
+
     # Mapear prioridad para conservar la más alta
     prioridad = {
         "Core": 1,
@@ -250,8 +253,8 @@ def lemmatizar_tokens_priorizados(df_tokens: pd.DataFrame) -> pd.DataFrame:
     }
 
     # Lemmatizar cada token
-    df_tokens["token_lema"] = df_tokens["token"].apply(
-        lambda x: nlp(x)[0].lemma_ if isinstance(x, str) and len(x) > 0 else x
+    df_tokens["token_lema"] = df_tokens["token"].map(
+        lambda x: lemas.get(x, x) if isinstance(x, str) else x
     )
 
     # Guardar token original para visual
@@ -288,44 +291,45 @@ def lemmatizar_tokens_priorizados(df_tokens: pd.DataFrame) -> pd.DataFrame:
     return df_grouped[["token_original", "token_lema", "frecuencia", "tier_origen"]]
 
 
-def generar_embeddings(df_lemas: pd.DataFrame) -> pd.DataFrame:
+def generar_embeddings(df_lemas: pd.DataFrame) -> Tuple[pd.DataFrame, Optional[np.ndarray]]:
     """
-    Genera vectores embeddings para cada token_lema usando spaCy (en_core_web_md).
-    Agrega columna 'vector' con numpy arrays.
+    Genera los embeddings de cada token_lema desde la tabla de vectores de
+    spaCy (en_core_web_md), sin ejecutar el pipeline.
+    Devuelve (df, X): df con las mismas filas y X matriz float32 (n × dim)
+    alineada por posición (memmap cacheado en disco por conjunto de lemas).
     """
-    if not _EMBEDD_OK:
-        st.error(f"No se pudo cargar el modelo de embeddings: {_EMBEDD_ERR}")
-        return pd.DataFrame()
+    if df_lemas is None or df_lemas.empty or "token_lema" not in df_lemas.columns:
+        return pd.DataFrame(), None
 
-    df = df_lemas.copy()
-    vectores = []
-    for lema in df["token_lema"]:
-        doc = nlp_embed(lema)
-        vectores.append(doc.vector)
+    try:
+        X = matriz_embeddings(df_lemas["token_lema"].tolist())
+    except (OSError, ImportError) as e:
+        st.error(f"No se pudo cargar el modelo de embeddings: {e}")
+        return pd.DataFrame(), None
 
-    df["vector"] = vectores
-    return df
+    return df_lemas.reset_index(drop=True), X
 
 
-def agrupar_embeddings_kmeans(df_embeddings: pd.DataFrame, n_clusters: int = 8) -> pd.DataFrame:
+def agrupar_embeddings_kmeans(df_embeddings: pd.DataFrame, X: Optional[np.ndarray],
+                              n_clusters: int = 8) -> pd.DataFrame:
     """
-    Aplica KMeans sobre los vectores para asignar clústeres semánticos.
+    Aplica KMeans sobre la matriz de embeddings para asignar clústeres semánticos.
     Agrega columna 'cluster' y columnas PCA (x, y) para visualización.
+    PCA y ajustes por k quedan cacheados por huella de la matriz
+    (ver listing/funcional_listing_clusters.py).
     """
-    if df_embeddings.empty or "vector" not in df_embeddings.columns:
+    if df_embeddings.empty or X is None or len(X) != len(df_embeddings):
         st.error("No se encontraron vectores para clusterizar.")
         return pd.DataFrame()
 
-    X = np.stack(df_embeddings["vector"].values)
+    huella = huella_matriz(X)
+    df_embeddings = df_embeddings.copy()
 
     # Clusterización
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init="auto")
-    clusters = kmeans.fit_predict(X)
-    df_embeddings["cluster"] = clusters
+    df_embeddings["cluster"] = clusters_kmeans(X, n_clusters, huella)["etiquetas"]
 
     # Reducción PCA a 2D
-    pca = PCA(n_components=2)
-    X_pca = pca.fit_transform(X)
+    X_pca = proyectar_pca(X, huella)
     df_embeddings["x"] = X_pca[:, 0]
     df_embeddings["y"] = X_pca[:, 1]
 
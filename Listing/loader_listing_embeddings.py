@@ -0,0 +1,100 @@
+# listing/loader_listing_embeddings.py
+# Embeddings estáticos de lemas leídos directo de la tabla vocab.vectors de spaCy.
+# - No se ejecuta el pipeline: solo se buscan las filas de cada lema (Vectors.find)
+#   y se copian en bloque con un fancy-index → matriz float32 contigua (n × dim).
+# - OOV: se intenta en minúsculas y capitalizado; si tampoco existe, vector en
+#   ceros (igual que Token.vector para palabras sin vector).
+# - La matriz se guarda como .npy en data/cache/embeddings/ (clave = modelo + lemas)
+#   y se devuelve como memmap de solo lectura. Con persistir=False (vocabularios
+#   de un solo uso, p. ej. reviews) se arma en memoria y no se escribe nada.
+
+import os
+import hashlib
+import numpy as np
+from typing import List, Sequence
+
+from utils.recursos_utils import obtener_recurso
+
+MODELO_EMBEDDINGS = "en_core_web_md"
+EMB_DIR = os.path.join("data", "cache", "embeddings")
+
+
+def _crear_vectores(modelo: str):
+    import spacy
+
+    nlp = spacy.load(modelo, exclude=[
+        "tok2vec", "tagger", "parser", "senter", "attribute_ruler",
+        "lemmatizer", "ner"])
+    return nlp.vocab.vectors
+
+
+def cargar_vectores(modelo: str = MODELO_EMBEDDINGS):
+    """
+    Tabla de vectores (spacy.vectors.Vectors) del modelo, cargada una vez por
+    proceso (registro de recursos) y sin componentes del pipeline.
+    Lanza OSError si el modelo no está instalado.
+    """
+    return obtener_recurso(f"spacy_vectores:{modelo}",
+                           lambda: _crear_vectores(modelo))
+
+
+def huella_lemas(lemas: Sequence[str], modelo: str = MODELO_EMBEDDINGS) -> str:
+    """Clave del conjunto (ordenado) de lemas para el modelo dado."""
+    h = hashlib.sha1(modelo.encode("utf-8"))
+    for lema in lemas:
+        h.update(b"\x00")
+        h.update(str(lema).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _filas(vectores, lemas: List[str]) -> np.ndarray:
+    """Fila de cada lema en la tabla (-1 si no hay vector en ninguna variante)."""
+    filas = np.asarray(vectores.find(keys=lemas), dtype="int64")
+    for variante in (str.lower, str.capitalize):
+        oov = np.flatnonzero(filas < 0)
+        if not len(oov):
+            break
+        filas[oov] = np.asarray(
+            vectores.find(keys=[variante(lemas[i]) for i in oov]), dtype="int64")
+    return filas
+
+
+def _calcular_matriz(lemas: List[str], modelo: str) -> np.ndarray:
+    vectores = cargar_vectores(modelo)
+    tabla = np.asarray(vectores.data)
+    if len(lemas) == 0:
+        return np.zeros((0, tabla.shape[1]), dtype="float32")
+
+    filas = _filas(vectores, lemas)
+    encontrados = filas >= 0
+    matriz = np.zeros((len(lemas), tabla.shape[1]), dtype="float32")
+    matriz[encontrados] = tabla[filas[encontrados]]
+    return matriz
+
+
+def matriz_embeddings(lemas: Sequence[str], modelo: str = MODELO_EMBEDDINGS,
+                      persistir: bool = True) -> np.ndarray:
+    """
+    Matriz (len(lemas) × dim) float32 con el vector de cada lema, en el mismo
+    orden. Se persiste como .npy por huella de lemas y se abre con mmap;
+    persistir=False la calcula en memoria sin leer ni escribir la caché.
+    """
+    lemas = ["" if l is None else str(l) for l in lemas]
+    if not persistir:
+        return _calcular_matriz(lemas, modelo)
+    ruta = os.path.join(EMB_DIR, f"emb_{huella_lemas(lemas, modelo)[:20]}.npy")
+    if os.path.exists(ruta):
+        try:
+            return np.load(ruta, mmap_mode="r")
+        except (OSError, ValueError):
+            pass  # archivo corrupto: se recalcula
+
+    matriz = _calcular_matriz(lemas, modelo)
+    try:
+        os.makedirs(EMB_DIR, exist_ok=True)
+        tmp = f"{ruta}.tmp{os.getpid()}.npy"
+        np.save(tmp, matriz)
+        os.replace(tmp, ruta)
+        return np.load(ruta, mmap_mode="r")
+    except OSError:
+        return matriz  # sin disco: la matriz en memoria
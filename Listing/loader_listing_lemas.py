@@ -0,0 +1,112 @@
+# listing/loader_listing_lemas.py
+# Lematización de tokens con spaCy + caché persistente token → lema.
+# - El modelo se carga UNA vez por proceso, sin los pipes que no usa el lematizador.
+# - Los tokens nuevos se procesan en lote con nlp.pipe(...).
+# - Los lemas se guardan en SQLite (data/cache/lemas.sqlite), compartido entre
+#   sesiones y archivos subidos: un token ya visto no vuelve a pasar por spaCy.
+
+import os
+import sqlite3
+from contextlib import closing
+from typing import Dict, Iterable, List
+
+from utils.recursos_utils import obtener_recurso
+
+MODELO_LEMAS = "en_core_web_sm"
+# El lematizador por reglas solo necesita tok2vec + tagger + attribute_ruler
+PIPES_INNECESARIOS = ["parser", "ner", "senter"]
+
+CACHE_DIR = os.path.join("data", "cache")
+CACHE_LEMAS = os.path.join(CACHE_DIR, "lemas.sqlite")
+
+BATCH_SIZE = 1000
+# n_process > 1 solo compensa con vocabularios muy grandes (arranca procesos)
+N_PROCESOS = 1
+# Tamaño de los bloques "IN (...)" al consultar SQLite
+_BLOQUE_SQL = 500
+
+_MEMO: Dict[str, Dict[str, str]] = {}
+
+
+def _crear_modelo_lemas(modelo: str):
+    import spacy
+
+    nlp = spacy.load(modelo)
+    sobrantes = [p for p in PIPES_INNECESARIOS if p in nlp.pipe_names]
+    if sobrantes:
+        nlp.select_pipes(disable=sobrantes)
+    return nlp
+
+
+def cargar_modelo_lemas(modelo: str = MODELO_LEMAS):
+    """
+    Modelo spaCy para lematizar, cargado una sola vez por proceso (registro
+    de recursos). Lanza OSError si el modelo no está instalado.
+    """
+    return obtener_recurso(f"spacy_lemas:{modelo}",
+                           lambda: _crear_modelo_lemas(modelo))
+
+
+def _conexion() -> sqlite3.Connection:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    con = sqlite3.connect(CACHE_LEMAS, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS lemas ("
+        " modelo TEXT NOT NULL, token TEXT NOT NULL, lema TEXT NOT NULL,"
+        " PRIMARY KEY (modelo, token)) WITHOUT ROWID")
+    return con
+
+
+def _leer_cache(modelo: str, tokens: List[str]) -> Dict[str, str]:
+    encontrados = {}
+    try:
+        with closing(_conexion()) as con, con:
+            for i in range(0, len(tokens), _BLOQUE_SQL):
+                bloque = tokens[i:i + _BLOQUE_SQL]
+                marcas = ",".join("?" * len(bloque))
+                filas = con.execute(
+                    f"SELECT token, lema FROM lemas WHERE modelo = ? AND token IN ({marcas})",
+                    [modelo, *bloque])
+                encontrados.update(filas)
+    except sqlite3.Error:
+        pass  # sin caché en disco: se lematiza todo
+    return encontrados
+
+
+def _guardar_cache(modelo: str, lemas: Dict[str, str]) -> None:
+    try:
+        with closing(_conexion()) as con, con:
+            con.executemany(
+                "INSERT OR IGNORE INTO lemas (modelo, token, lema) VALUES (?, ?, ?)",
+                [(modelo, t, l) for t, l in lemas.items()])
+    except sqlite3.Error:
+        pass  # solo se pierde la persistencia
+
+
+def lematizar(tokens: Iterable[str],
+              modelo: str = MODELO_LEMAS,
+              batch_size: int = BATCH_SIZE,
+              n_process: int = N_PROCESOS) -> Dict[str, str]:
+    """
+    Devuelve {token: lema} para los tokens únicos (strings no vacíos).
+    Orden de búsqueda: memoria del proceso → SQLite → spaCy (nlp.pipe en lote).
+    """
+    memo = _MEMO.setdefault(modelo, {})
+    unicos = {t for t in tokens if isinstance(t, str) and t}
+    faltantes = [t for t in unicos if t not in memo]
+
+    if faltantes:
+        memo.update(_leer_cache(modelo, faltantes))
+        faltantes = [t for t in faltantes if t not in memo]
+
+    if faltantes:
+        nlp = cargar_modelo_lemas(modelo)
+        nuevos = {}
+        for token, doc in zip(faltantes, nlp.pipe(faltantes, batch_size=batch_size,
+                                                  n_process=n_process)):
+            nuevos[token] = doc[0].lemma_ if len(doc) else token
+        memo.update(nuevos)
+        _guardar_cache(modelo, nuevos)
+
+    return {t: memo[t] for t in unicos}
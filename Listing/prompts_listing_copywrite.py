@@ -3,7 +3,8 @@
 # No hidden fallbacks; no placeholders that pretend to work.
 # In case of conflict, the local SOP (ReneDiaz.com) PREVAILS.
 
-from typing import List
+import json
+from typing import List, Optional
 
 # ================================
 # GENERAL GUIDELINES (integrated)
@@ -330,6 +331,40 @@ OUTPUT SHAPE (JSON ONLY):
 """
 
 
+def prompt_bullets_fix_json(
+    failing: List[dict],
+    core_tokens: List[str],
+    attributes_kv: List[dict],
+    *,
+    min_chars: int = 150,
+    max_chars: int = 180,
+) -> str:
+    """
+    Sub-prompt de reparación: SOLO los bullets que fallaron la validación.
+    failing: [{"scope", "index", "bullet", "required_header", "errors": [...]}]
+    Devuelve SOLO JSON con:
+    { "fixes": [ {"scope": "...", "index": n, "bullet": "..."} ] }
+    """
+    return f"""You are repairing individual Amazon bullets that failed a binding SOP check.
+Rewrite ONLY the bullets listed below. Keep each bullet's idea and wording where it is valid.
+
+RULES (non-negotiable):
+- Format: "HEADER: development". HEADER in uppercase.
+- If "required_header" is set, the HEADER must be exactly that value.
+- Otherwise (bullets 2–5) the HEADER must be one of the attribute labels: {sorted({kv["label"].upper() for kv in attributes_kv})}
+- Development: attribute/variation content + compatible SEO tokens; never just repeat the attribute value; at least 14 words.
+- Include at least one SEO semantic token: {core_tokens}
+- Length {min_chars}–{max_chars} characters; no final period; English; no invented tokens.
+- Attribute pairs (label=Etiqueta, value=Contenido): {attributes_kv}
+
+BULLETS TO FIX (with the violated rules):
+{json.dumps(failing, ensure_ascii=False, indent=1)}
+
+OUTPUT SHAPE (JSON ONLY):
+{{"fixes": [{{"scope": "<scope>", "index": <n>, "bullet": "<fixed bullet>"}}]}}
+"""
+
+
 def prompt_description_json(
     head_phrases: List[str],
     core_tokens: List[str],
@@ -353,6 +388,8 @@ def prompt_backend_json(
     emotions: List[str],
     buyer_persona: str,
     lexico: str,
+    surface_copy: Optional[dict] = None,
 ) -> str:
+    # surface_copy: title/bullets/description finales (para no repetir términos)
     raise NotImplementedError(
         "Backend SOP is not integrated yet. This function is intentionally not implemented to avoid hidden fallbacks.")
@@ -0,0 +1,79 @@
+# batch_listing.py
+# Generación de listings sin UI para muchos workbooks (ver listing/funcional_listing_batch.py).
+#
+#   python batch_listing.py data/raw/lote_semana/ --salida data/batch --workers 4 --rpm 300
+#   python batch_listing.py manifest.csv --etapas title,bullets --procesos 2
+#
+# Entrada: carpeta con .xlsx o manifest (CSV / JSON / JSONL con columnas excel[,asin]).
+# Salida: <salida>/<asin>/ con estado.json, artefactos por paso, draft.json y
+# draft.parquet, más <salida>/resumen_batch.csv. Volver a correr retoma los pendientes.
+
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+
+def _argumentos(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Batch de listings (dedup → tiers → clusters → reviews → copy).")
+    p.add_argument("entrada", help="Carpeta con workbooks .xlsx o manifest CSV/JSON/JSONL")
+    p.add_argument("--salida", default=os.path.join("data", "batch"), help="Carpeta de salida (checkpoints y drafts)")
+    p.add_argument("--etapas", default="title,bullets",
+                   help="Etapas de copy separadas por coma (title,bullets,description,backend)")
+    p.add_argument("--workers", type=int, default=4, help="Workbooks en paralelo por proceso (hilos)")
+    p.add_argument("--procesos", type=int, default=1, help="Procesos (reparte workbooks y rpm)")
+    p.add_argument("--rpm", type=float, default=float(os.getenv("LLM_RPM", "0") or 0),
+                   help="Límite global de llamadas LLM por minuto (0 = sin límite)")
+    p.add_argument("--rafaga", type=int, default=1, help="Llamadas seguidas permitidas antes de espaciar")
+    p.add_argument("--sin-cost-saver", action="store_true", help="Usa todas las filas de inputs en los prompts")
+    p.add_argument("--backend-tras-copy", action="store_true",
+                   help="Backend espera a title/bullets/description y recibe ese copy")
+    p.add_argument("--forzar", action="store_true", help="Ignora checkpoints y recalcula todo")
+    return p.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    load_dotenv()
+    args = _argumentos(argv)
+
+    # Sin `streamlit run` cada st.warning / session_state avisa por log: se silencia
+    from streamlit import logger as st_logger
+    st_logger.set_log_level("error")
+
+    from listing.funcional_listing_batch import ejecutar_batch_procesos, leer_manifest
+    from listing.funcional_listing_copywrite import STAGES
+
+    etapas = tuple(e.strip() for e in args.etapas.split(",") if e.strip())
+    desconocidas = [e for e in etapas if e not in STAGES]
+    if desconocidas:
+        print(f"Etapas desconocidas: {desconocidas} (válidas: {', '.join(STAGES)})", file=sys.stderr)
+        return 2
+
+    if not os.path.exists(args.entrada):
+        print(f"No existe: {args.entrada}", file=sys.stderr)
+        return 2
+    trabajos = leer_manifest(args.entrada)
+    if not trabajos:
+        print(f"No hay workbooks en {args.entrada}", file=sys.stderr)
+        return 2
+    print(f"{len(trabajos)} workbooks → {args.salida} "
+          f"(procesos={args.procesos}, workers={args.workers}, rpm={args.rpm or 'sin límite'})")
+
+    def _al_terminar(fila: dict):
+        print(f"[{fila['estado']:>7}] {fila['asin']:<14} {fila['segundos']:>7.1f}s "
+              f"etapas={fila['etapas_ok'] or '-'} {fila['errores']}".rstrip(), flush=True)
+
+    resumen = ejecutar_batch_procesos(
+        trabajos, args.salida, procesos=args.procesos, workers=args.workers,
+        rpm=args.rpm or None, rafaga=args.rafaga, al_terminar=_al_terminar,
+        etapas=etapas, cost_saver=not args.sin_cost_saver,
+        backend_tras_copy=args.backend_tras_copy, forzar=args.forzar)
+
+    conteo = resumen["estado"].value_counts().to_dict()
+    print(f"Listo: {conteo} · resumen en {os.path.join(args.salida, 'resumen_batch.csv')}")
+    return 0 if conteo.get("error", 0) == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
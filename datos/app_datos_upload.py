@@ -6,11 +6,33 @@ import shutil
 import zipfile
 import datetime
 
+from datos.loader_datos_excel import (
+    preparar_libro,
+    limpiar_hojas_antiguas,
+)
+
 EXCEL_DIR = "data/raw"
 EXCEL_NAME = "optimizacion_listing.xlsx"
 EXCEL_PATH = os.path.join(EXCEL_DIR, EXCEL_NAME)
 
 
+def _cargar_libro_en_sesion():
+    """
+    Parsea todas las hojas UNA vez (almacén columnar por hash de contenido)
+    y deja el ExcelFile en sesión. Si el contenido no cambió, no reabre nada.
+    """
+    with st.spinner("Indexando hojas del Excel..."):
+        huella = preparar_libro(EXCEL_PATH)
+
+    if (st.session_state.get("excel_hash") == huella
+            and st.session_state.get("excel_data") is not None):
+        return
+
+    limpiar_hojas_antiguas(conservar=huella)
+    st.session_state.excel_data = pd.ExcelFile(EXCEL_PATH)
+    st.session_state.excel_hash = huella
+
+
 def mostrar_carga_excel():
     st.title("Carga de archivo Excel")
 
@@ -25,13 +47,13 @@ def mostrar_carga_excel():
         with open(EXCEL_PATH, "wb") as f:
             f.write(uploaded_file.read())
         st.success(f"Archivo guardado como: {EXCEL_PATH}")
-        st.session_state.excel_data = pd.ExcelFile(EXCEL_PATH)
+        _cargar_libro_en_sesion()
 
     # Verificar si ya existe uno cargado
     elif os.path.exists(EXCEL_PATH):
         st.info(f"Ya existe un archivo cargado: {EXCEL_PATH}")
         try:
-            st.session_state.excel_data = pd.ExcelFile(EXCEL_PATH)
+            _cargar_libro_en_sesion()
             st.success("Archivo cargado desde disco correctamente.")
         except Exception as e:
             st.error(f"Error al cargar archivo existente: {e}")
@@ -0,0 +1,299 @@
+# datos/loader_datos_excel.py
+# Almacén columnar de hojas del Excel (un solo parseo por archivo).
+# - El Excel se parsea UNA vez (todas las hojas) y se indexa por hash del contenido.
+# - Cada hoja se guarda como Parquet junto al Excel: data/raw/hojas_<hash>/<hoja>.parquet
+# - Los loaders leen con leer_hoja(...) en vez de excel_data.parse(...).
+#
+# Cada hoja se guarda "descompuesta" por columna posicional i:
+#   n<i> → valores numéricos (float64)
+#   t<i> → valores de texto (todo lo que no es número)
+# Así las columnas numéricas quedan tipadas en disco y el texto no se mezcla.
+
+import os
+import json
+import shutil
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Union
+
+EXCEL_DIR = "data/raw"
+STORE_PREFIX = "hojas_"
+INDICE_NAME = "hojas.json"
+
+_LOCK = threading.Lock()
+_HASH_MEMO: Dict[tuple, str] = {}
+_HOJAS_MEMO: Dict[str, Dict[str, pd.DataFrame]] = {}
+_MAX_LIBROS_MEMO = 4
+
+
+# ----------------------------
+# Hash del archivo
+# ----------------------------
+
+
+def hash_archivo(path: str) -> str:
+    """
+    SHA-256 del contenido del archivo. Se memoiza por (ruta, mtime, tamaño)
+    para no releer el Excel en cada rerun.
+    """
+    st_ = os.stat(path)
+    clave = (os.path.abspath(path), st_.st_mtime_ns, st_.st_size)
+    if clave in _HASH_MEMO:
+        return _HASH_MEMO[clave]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    huella = h.hexdigest()
+    _HASH_MEMO[clave] = huella
+    return huella
+
+
+def _ruta_excel(excel_data: Union[pd.ExcelFile, str, None]) -> Optional[str]:
+    if isinstance(excel_data, str):
+        return excel_data if os.path.exists(excel_data) else None
+    if isinstance(excel_data, pd.ExcelFile):
+        io = getattr(excel_data, "io", None)
+        if isinstance(io, (str, os.PathLike)) and os.path.exists(io):
+            return str(io)
+    return None
+
+
+def huella_excel(excel_data: Union[pd.ExcelFile, str, None]) -> Optional[str]:
+    """
+    Devuelve el hash de contenido del Excel (o None si no hay archivo en disco).
+    """
+    path = _ruta_excel(excel_data)
+    if path is None:
+        return None
+    return hash_archivo(path)
+
+
+def _dir_hojas(huella: str) -> str:
+    return os.path.join(EXCEL_DIR, f"{STORE_PREFIX}{huella[:16]}")
+
+
+# ----------------------------
+# Descomposición tipada
+# ----------------------------
+
+
+def _es_numero(x) -> bool:
+    return isinstance(x, (int, float, np.integer, np.floating)) and not isinstance(x, (bool, np.bool_))
+
+
+def _descomponer(grid: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convierte la hoja cruda (header=None) en columnas tipadas n<i> / t<i>.
+    Se omiten las columnas totalmente vacías.
+    """
+    partes = {}
+    for i in range(grid.shape[1]):
+        col = grid.iloc[:, i]
+        if pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col):
+            num = col.astype("float64")
+            txt = None
+        else:
+            valores = col.to_numpy(dtype=object)
+            es_num = np.fromiter((_es_numero(v) for v in valores),
+                                 dtype=bool, count=len(valores))
+            nulos = col.isna().to_numpy()
+            num = pd.Series(np.where(es_num, valores, np.nan),
+                            index=col.index).astype("float64")
+            txt_vals = np.where(es_num | nulos, None, valores)
+            txt = pd.Series([None if v is None else str(v) for v in txt_vals],
+                            index=col.index, dtype=object)
+            if txt.isna().all():
+                txt = None
+        if num.notna().any():
+            partes[f"n{i}"] = num
+        if txt is not None:
+            partes[f"t{i}"] = txt
+    out = pd.DataFrame(partes, index=grid.index).reset_index(drop=True)
+    out.attrs["n_cols"] = grid.shape[1]
+    return out
+
+
+def _entero_si_integral(x):
+    if isinstance(x, float) and x.is_integer():
+        return int(x)
+    return x
+
+
+def _columna(hoja: pd.DataFrame, i: int, filas: slice) -> pd.Series:
+    """
+    Reconstruye la columna posicional i en el rango de filas pedido, con la
+    misma inferencia de tipos que pandas: numérica si no hay texto, object si mezcla.
+    """
+    num = hoja[f"n{i}"].iloc[filas] if f"n{i}" in hoja.columns else None
+    txt = hoja[f"t{i}"].iloc[filas] if f"t{i}" in hoja.columns else None
+    n_filas = len(hoja.iloc[filas])
+
+    if txt is None or txt.isna().all():
+        if num is None:
+            return pd.Series(np.full(n_filas, np.nan))
+        num = num.reset_index(drop=True)
+        if num.notna().all() and np.all(np.mod(num.to_numpy(), 1) == 0):
+            return num.astype("int64")
+        return num
+
+    txt = txt.reset_index(drop=True)
+    if num is None:
+        mezcla = txt
+    else:
+        num = num.reset_index(drop=True)
+        mezcla = txt.where(txt.notna(), num.map(_entero_si_integral))
+    # Celdas vacías como NaN (igual que pandas), no None
+    return mezcla.astype(object).where(mezcla.notna(), np.nan)
+
+
+def _nombres_header(valores: List) -> List:
+    nombres, vistos = [], {}
+    for i, v in enumerate(valores):
+        if v is None or (isinstance(v, float) and np.isnan(v)):
+            nombre = f"Unnamed: {i}"
+        else:
+            nombre = _entero_si_integral(v)
+        if nombre in vistos:
+            vistos[nombre] += 1
+            nombre = f"{nombre}.{vistos[nombre]}"
+        else:
+            vistos[nombre] = 0
+        nombres.append(nombre)
+    return nombres
+
+
+# ----------------------------
+# Persistencia
+# ----------------------------
+
+
+def _nombre_archivo(hoja: str, i: int) -> str:
+    limpio = "".join(ch if ch.isalnum() else "_" for ch in hoja)
+    return f"{i:02d}_{limpio}.parquet"
+
+
+def preparar_libro(path: str) -> str:
+    """
+    Parsea TODAS las hojas del Excel una sola vez y las persiste como Parquet.
+    Si ya existe el almacén para ese contenido, no hace nada.
+
+    Returns:
+        str: hash de contenido del Excel
+    """
+    huella = hash_archivo(path)
+    with _LOCK:
+        if huella in _HOJAS_MEMO:
+            return huella
+        carpeta = _dir_hojas(huella)
+        if os.path.exists(os.path.join(carpeta, INDICE_NAME)):
+            _HOJAS_MEMO[huella] = {}
+            return huella
+
+        crudas = pd.read_excel(path, sheet_name=None, header=None)
+        hojas = {nombre: _descomponer(df) for nombre, df in crudas.items()}
+        _HOJAS_MEMO[huella] = hojas
+        while len(_HOJAS_MEMO) > _MAX_LIBROS_MEMO:
+            _HOJAS_MEMO.pop(next(iter(_HOJAS_MEMO)))
+
+        # Escritura atómica: carpeta temporal + rename (varios procesos pueden competir)
+        tmp = f"{carpeta}.tmp{os.getpid()}"
+        try:
+            os.makedirs(tmp, exist_ok=True)
+            indice = {}
+            for i, (nombre, df) in enumerate(hojas.items()):
+                archivo = _nombre_archivo(nombre, i)
+                df.to_parquet(os.path.join(tmp, archivo), index=False)
+                indice[nombre] = {"archivo": archivo,
+                                  "n_cols": df.attrs.get("n_cols", 0)}
+            with open(os.path.join(tmp, INDICE_NAME), "w", encoding="utf-8") as f:
+                json.dump(indice, f, ensure_ascii=False)
+            if not os.path.exists(carpeta):
+                os.replace(tmp, carpeta)
+        except Exception:
+            # Sin pyarrow o sin permisos: el almacén queda solo en memoria
+            pass
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+    return huella
+
+
+def limpiar_hojas_antiguas(conservar: Optional[str] = None) -> None:
+    """Elimina almacenes de hojas de Excel anteriores (otro contenido)."""
+    if not os.path.isdir(EXCEL_DIR):
+        return
+    actual = f"{STORE_PREFIX}{conservar[:16]}" if conservar else None
+    for nombre in os.listdir(EXCEL_DIR):
+        if nombre.startswith(STORE_PREFIX) and nombre != actual:
+            shutil.rmtree(os.path.join(EXCEL_DIR, nombre), ignore_errors=True)
+
+
+def _hoja_descompuesta(huella: str, hoja: str) -> pd.DataFrame:
+    hojas = _HOJAS_MEMO.setdefault(huella, {})
+    if hoja in hojas:
+        return hojas[hoja]
+
+    ruta_indice = os.path.join(_dir_hojas(huella), INDICE_NAME)
+    if not os.path.exists(ruta_indice):
+        raise ValueError(f"Worksheet named '{hoja}' not found")
+    with open(ruta_indice, encoding="utf-8") as f:
+        indice = json.load(f)
+    if hoja not in indice:
+        raise ValueError(f"Worksheet named '{hoja}' not found")
+    df = pd.read_parquet(os.path.join(
+        _dir_hojas(huella), indice[hoja]["archivo"]))
+    df.attrs["n_cols"] = indice[hoja]["n_cols"]
+    hojas[hoja] = df
+    return df
+
+
+# ----------------------------
+# API de lectura
+# ----------------------------
+
+
+def leer_hoja(excel_data: Union[pd.ExcelFile, str, None],
+              hoja: str,
+              header: Optional[int] = 0,
+              skiprows: Optional[int] = None,
+              usecols: Optional[List[int]] = None) -> pd.DataFrame:
+    """
+    Equivalente a excel_data.parse(hoja, header=..., skiprows=...) pero leyendo
+    del almacén columnar (parsea el Excel solo la primera vez por contenido).
+
+    Args:
+        excel_data: pd.ExcelFile (o ruta) ya cargado en la sección Datos
+        hoja: nombre de la hoja
+        header: fila (tras skiprows) con los encabezados, o None para hoja cruda
+        skiprows: filas iniciales a saltar
+        usecols: posiciones de columnas a devolver (None = todas)
+    """
+    path = _ruta_excel(excel_data)
+    if path is None:
+        # Sin archivo en disco (p.ej. buffer en memoria): parseo directo
+        return excel_data.parse(hoja, header=header, skiprows=skiprows, usecols=usecols)
+
+    huella = preparar_libro(path)
+    df = _hoja_descompuesta(huella, hoja)
+    n_cols = df.attrs.get("n_cols", 0)
+    posiciones = list(usecols) if usecols is not None else list(range(n_cols))
+
+    inicio = skiprows or 0
+    if header is None:
+        filas = slice(inicio, None)
+        nombres = posiciones if usecols is not None else list(range(len(posiciones)))
+    else:
+        fila_header = inicio + header
+        fila = slice(fila_header, fila_header + 1)
+        nombres = _nombres_header(
+            [_columna(df, i, fila).iloc[0] if fila_header < len(df) else None
+             for i in posiciones])
+        filas = slice(fila_header + 1, None)
+
+    datos = {pos: _columna(df, i, filas) for pos, i in enumerate(posiciones)}
+    out = pd.DataFrame(datos)
+    out.columns = nombres
+    return out
@@ -10,6 +10,23 @@ from keywords.funcional_keywords_deduplicado import (
     formatear_columnas_tabla
 )
 
+# Desde este tamaño se sugiere el formato en cliente (sin copia en texto)
+UMBRAL_FORMATO_CLIENTE = 100_000
+
+
+def _mostrar_tabla_formateada(df: pd.DataFrame, key: str):
+    formato_rapido = st.toggle(
+        "Formato rápido (números en el navegador, sin NAF/NaN)",
+        value=len(df) > UMBRAL_FORMATO_CLIENTE,
+        key=key,
+    )
+    if formato_rapido:
+        df_vista, config = formatear_columnas_tabla(df, modo="cliente")
+        st.dataframe(df_vista, column_config=config,
+                     use_container_width=True)
+    else:
+        st.dataframe(formatear_columnas_tabla(df), use_container_width=True)
+
 
 def mostrar_keywords_deduplicado(excel_data: Optional[pd.ExcelFile] = None):
     """
@@ -37,8 +54,7 @@ def mostrar_keywords_deduplicado(excel_data: Optional[pd.ExcelFile] = None):
 
         df_raw = build_master_raw(excel_data)
         st.markdown(f"**Total Registros: {len(df_raw):,}**")
-        st.dataframe(formatear_columnas_tabla(
-            df_raw), use_container_width=True)
+        _mostrar_tabla_formateada(df_raw, key="formato_rapido_raw")
 
     elif subvista == "deduplicado":
         st.markdown("#### Maestra Deduplicada")
@@ -51,5 +67,4 @@ def mostrar_keywords_deduplicado(excel_data: Optional[pd.ExcelFile] = None):
             return
 
         st.markdown(f"**Total Registros: {len(df_dedup):,}**")
-        st.dataframe(formatear_columnas_tabla(
-            df_dedup), use_container_width=True)
+        _mostrar_tabla_formateada(df_dedup, key="formato_rapido_dedup")
@@ -1,10 +1,7 @@
 # keywords/app_keywords_estadistica.py
 import streamlit as st
 import pandas as pd
-import seaborn as sns
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.colors import LinearSegmentedColormap
 from typing import Optional
 from utils.nav_utils import render_subnav
 
@@ -41,20 +38,28 @@ def mostrar_keywords_estadistica(excel_data: Optional[pd.ExcelFile] = None):
             filtrar_por_sliders,
             calcular_descriptivos_extendidos,
             sugerir_log_transform_robusto,
-            aplicar_log10_dinamico
+            aplicar_log10_dinamico,
+            huella_estado_filtros
         )
         from keywords.funcional_keywords_deduplicado import formatear_columnas_tabla
 
         # Cargar y filtrar
-        df_original = st.session_state.master_deduped.copy()
-        df_filtrado = filtrar_por_sliders(df_original)
+        # (la tabla imputada se cachea por huella del dataset)
+        df_original = st.session_state.master_deduped
+        df_filtrado = filtrar_por_sliders(
+            df_original, huella=st.session_state.get("master_deduped_huella"))
 
         # Guardar para otras vistas
         st.session_state.df_filtrado = df_filtrado
 
+        # Huella de la tabla filtrada (antes de log10)
+        huella_filtrado = huella_estado_filtros(
+            st.session_state.get("master_deduped_huella"), df_filtrado.columns,
+            incluir_log=False)
+
         # Recomendación de log10
         st.subheader("Sugerencia de Transformación Logarítmica")
-        sugerencias = sugerir_log_transform_robusto(df_filtrado)
+        sugerencias = sugerir_log_transform_robusto(df_filtrado, clave=huella_filtrado)
         for col, valor_skew in sugerencias.items():
             if valor_skew is not None:
                 st.radio(
@@ -65,18 +70,23 @@ def mostrar_keywords_estadistica(excel_data: Optional[pd.ExcelFile] = None):
                 )
 
         # Aplicar log10 si corresponde
-        df_transformado = aplicar_log10_dinamico(df_filtrado)
+        df_transformado = aplicar_log10_dinamico(df_filtrado, clave=huella_filtrado)
 
         # Guardar transformado también
         st.session_state.df_transformado = df_transformado
 
+        # Clave del estado de filtros (memoiza los cálculos de las otras vistas)
+        st.session_state.huella_filtros = huella_estado_filtros(
+            st.session_state.get("master_deduped_huella"), df_filtrado.columns)
+
         # Mostrar tabla preview
         st.markdown(f"**Total Registros: {len(df_transformado):,}**")
         st.dataframe(df_transformado, use_container_width=True)
 
         # Estadística descriptiva
         st.subheader("Estadística descriptiva")
-        df_descriptivos = calcular_descriptivos_extendidos(df_transformado)
+        df_descriptivos = calcular_descriptivos_extendidos(
+            df_transformado, clave=st.session_state.huella_filtros)
         st.dataframe(df_descriptivos, use_container_width=True)
 
         if "Shapiro Normality" in df_descriptivos.columns:
@@ -92,6 +102,10 @@ def mostrar_keywords_estadistica(excel_data: Optional[pd.ExcelFile] = None):
 
     elif active == "graficos":
         st.subheader("Distribución de Métricas")
+
+        # Librerías de gráficos solo cuando se abre esta vista
+        import seaborn as sns
+        import matplotlib.pyplot as plt
         df_transformado = st.session_state.get("df_transformado")
         df_filtrado = st.session_state.get("df_filtrado")
 
@@ -155,6 +169,10 @@ def mostrar_keywords_estadistica(excel_data: Optional[pd.ExcelFile] = None):
     elif active == "correlaciones":
         st.subheader("Correlaciones entre métricas")
 
+        import seaborn as sns
+        import matplotlib.pyplot as plt
+        from matplotlib.colors import LinearSegmentedColormap
+
         from keywords.funcional_keywords_estadistica import (
             calcular_correlaciones,
             interpretar_correlaciones
@@ -172,7 +190,8 @@ def mostrar_keywords_estadistica(excel_data: Optional[pd.ExcelFile] = None):
                 "No se ha generado la tabla transformada ni filtrada. Ve primero a la vista descriptiva.")
             return
 
-        pearson, spearman = calcular_correlaciones(df_transformado)
+        pearson, spearman = calcular_correlaciones(
+            df_transformado, clave=st.session_state.get("huella_filtros"))
 
         if pearson is None or spearman is None:
             st.warning(
@@ -233,15 +252,26 @@ def mostrar_keywords_estadistica(excel_data: Optional[pd.ExcelFile] = None):
             "Compara el cuartil inferior vs superior para detectar si existen diferencias estadísticamente significativas.")
 
         with st.spinner("Ejecutando pruebas inferenciales..."):
-            resultados = realizar_tests_inferenciales(df_transformado)
+            resultados = realizar_tests_inferenciales(
+                df_transformado, clave=st.session_state.get("huella_filtros"))
 
-        if resultados:
+        significativos = resultados[resultados["Significativo"]]
+        if not significativos.empty:
             st.success("Se encontraron diferencias significativas:")
-            for linea in resultados:
-                st.markdown(f"- {linea}")
+            for _, fila in significativos.iterrows():
+                levene_ok = pd.notna(fila["Levene p"]) and fila["Levene p"] > 0.05
+                st.markdown(
+                    f"- Diferencia significativa en **{fila['Columna']}** "
+                    f"({fila['Test']}, p = {fila['p']:.4f}, "
+                    f"Levene p = {fila['Levene p'] if pd.notna(fila['Levene p']) else float('nan'):.4f} "
+                    f"{'✅' if levene_ok else '⚠️'})")
         else:
             st.info("No se detectaron diferencias estadísticamente significativas.")
 
+        if not resultados.empty:
+            with st.expander("Detalle de pruebas (estadístico, p, tamaño de efecto, n)"):
+                st.dataframe(resultados, use_container_width=True)
+
     elif active == "ia":
         st.subheader("Análisis con IA")
         st.info("Aquí se generarán insights con IA. [Placeholder]")
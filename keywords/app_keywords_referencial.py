@@ -6,6 +6,8 @@ import pandas as pd
 import streamlit as st
 from typing import Optional
 
+from keywords.loader_keywords_fuentes import cargar_fuente
+
 
 EXCEL_DISK_PATH = os.path.join("data", "raw", "optimizacion_listing.xlsx")
 
@@ -39,11 +41,9 @@ def mostrar_tabla_referencial(excel_data: Optional[pd.ExcelFile] = None, sheet_n
         return
 
     try:
-        base = xl.parse(sheet_name, header=None)
-        df = base.iloc[2:, [0, 15, 1, 14]].copy()
-        df.columns = ["Search Terms", "Search Volume",
-                      "ASIN Click Share", "ABA Rank"]
-        df_total = df.copy()
+        # Columnas según el registro de fuentes (solo se leen las necesarias)
+        df = cargar_fuente(xl, sheet_name, vista=True)
+        df_total = df
     except Exception as e:
         st.error(f"No se pudo leer la hoja '{sheet_name}': {e}")
         return
@@ -1,138 +1,210 @@
 # keywords/funcional_keywords_deduplicado.py
 
+import os
 import pandas as pd
 import numpy as np
 import streamlit as st
 
+from datos.loader_datos_excel import huella_excel
+from keywords.loader_keywords_fuentes import (
+    ESQUEMAS_FUENTES,
+    VERSION_MAPEO,
+    cargar_fuente_maestra,
+)
+
+CACHE_DIR = os.path.join("data", "cache")
+
+# Bit por fuente, en orden alfabético: decodificar la suma da la lista ya ordenada
+BITS_FUENTE = {"CompKW": 1, "CustKW": 2, "MiningKW": 4}
+
 
 def build_master_raw(excel_data: pd.ExcelFile) -> pd.DataFrame:
+    """
+    Unión de CustKW / CompKW / MiningKW con las columnas de la maestra.
+    El mapeo de columnas vive en keywords/loader_keywords_fuentes.py.
+    """
     try:
-        df_cust = excel_data.parse("CustKW", skiprows=2)
-        df_comp = excel_data.parse("CompKW", skiprows=2)
-        df_mining = excel_data.parse("MiningKW", skiprows=2)
+        partes = [cargar_fuente_maestra(excel_data, hoja)
+                  for hoja in ESQUEMAS_FUENTES]
     except Exception as e:
         st.error(f"Error al leer hojas del Excel: {e}")
         return pd.DataFrame()
 
-    def naf(col, df, index):
-        try:
-            return df.iloc[:, index]
-        except Exception:
-            return pd.Series([None] * len(df), index=df.index)
-
-    cust_df = pd.DataFrame()
-    cust_df["Search Terms"] = df_cust.iloc[:, 0]
-    cust_df["Search Volume"] = df_cust.iloc[:, 15]
-    cust_df["ASIN Click Share"] = df_cust.iloc[:, 1]
-    cust_df["Comp Click Share"] = pd.Series(
-        [np.nan] * len(df_cust), index=df_cust.index)
-    cust_df["Niche Click Share"] = pd.Series(
-        [np.nan] * len(df_cust), index=df_cust.index)
-    cust_df["Comp Depth"] = pd.Series(
-        [np.nan] * len(df_cust), index=df_cust.index)
-    cust_df["Niche Depth"] = pd.Series(
-        [np.nan] * len(df_cust), index=df_cust.index)
-    cust_df["Relevancy"] = pd.Series(
-        [np.nan] * len(df_cust), index=df_cust.index)
-    cust_df["ABA Rank"] = df_cust.iloc[:, 14]
-    cust_df["Fuente"] = "CustKW"
-
-    comp_df = pd.DataFrame()
-    comp_df["Search Terms"] = df_comp.iloc[:, 0]
-    comp_df["Search Volume"] = df_comp.iloc[:, 8]
-    comp_df["ASIN Click Share"] = pd.Series(
-        [np.nan] * len(df_comp), index=df_comp.index)
-    comp_df["Comp Click Share"] = df_comp.iloc[:, 2]
-    comp_df["Niche Click Share"] = pd.Series(
-        [np.nan] * len(df_comp), index=df_comp.index)
-    comp_df["Comp Depth"] = df_comp.iloc[:, 5]
-    comp_df["Niche Depth"] = pd.Series(
-        [np.nan] * len(df_comp), index=df_comp.index)
-    comp_df["Relevancy"] = pd.Series(
-        [np.nan] * len(df_comp), index=df_comp.index)
-    comp_df["ABA Rank"] = pd.Series(
-        [np.nan] * len(df_comp), index=df_comp.index)
-    comp_df["Fuente"] = "CompKW"
-
-    mining_df = pd.DataFrame()
-    mining_df["Search Terms"] = df_mining.iloc[:, 0]
-    mining_df["Search Volume"] = df_mining.iloc[:, 5]
-    mining_df["ASIN Click Share"] = pd.Series(
-        [np.nan] * len(df_mining), index=df_mining.index)
-    mining_df["Comp Click Share"] = pd.Series(
-        [np.nan] * len(df_mining), index=df_mining.index)
-    mining_df["Niche Click Share"] = df_mining.iloc[:, 15]
-    mining_df["Comp Depth"] = pd.Series(
-        [np.nan] * len(df_mining), index=df_mining.index)
-    mining_df["Niche Depth"] = df_mining.iloc[:, 12]
-    mining_df["Relevancy"] = df_mining.iloc[:, 2]
-    mining_df["ABA Rank"] = pd.Series(
-        [np.nan] * len(df_mining), index=df_mining.index)
-    mining_df["Fuente"] = "MiningKW"
-
-    master_raw = pd.concat([cust_df, comp_df, mining_df],
-                           axis=0, ignore_index=True)
+    master_raw = pd.concat(partes, axis=0, ignore_index=True)
 
     return master_raw
 
 
-def build_master_deduplicated(excel_data: pd.ExcelFile) -> pd.DataFrame:
+def _etiquetas_fuente() -> np.ndarray:
+    """Tabla 0..7 → "CompKW, CustKW"... (combinaciones de bits ya ordenadas)."""
+    etiquetas = []
+    for codigo in range(1 << len(BITS_FUENTE)):
+        etiquetas.append(", ".join(
+            f for f, bit in BITS_FUENTE.items() if codigo & bit))
+    return np.array(etiquetas, dtype=object)
+
+
+def _factorizar_ordenado(serie: pd.Series):
+    """
+    pd.factorize(sort=True) pero ordenando solo los únicos con NumPy cuando
+    todos son texto (el sort de objetos Python es el cuello de botella).
+    """
+    codigos, unicos = pd.factorize(serie, sort=False)
+    if pd.api.types.infer_dtype(unicos, skipna=False) != "string":
+        return pd.factorize(serie, sort=True)
+    orden = np.argsort(np.asarray(unicos, dtype=str), kind="stable")
+    rango = np.empty_like(orden)
+    rango[orden] = np.arange(len(orden))
+    return rango[codigos], np.asarray(unicos, dtype=object)[orden]
+
+
+def deduplicar_master(df_raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    Agrupa por 'Search Terms': métricas con max y 'Fuente' como unión ordenada
+    de fuentes. La unión se calcula con bits por fuente (sin lambdas Python).
+    """
+    metricas = [c for c in df_raw.columns if c not in ("Search Terms", "Fuente")]
+
+    terminos = df_raw["Search Terms"]
+    validos = terminos.notna().to_numpy()
+    codigos, unicos = _factorizar_ordenado(terminos[validos])
+
+    # max por término (cython) sobre las métricas
+    df_dedup = (
+        df_raw.loc[validos, metricas]
+        .groupby(codigos, sort=True)
+        .max()
+    )
+
+    # OR de bits por término: cada (término, fuente) cuenta una sola vez → suma
+    bits = df_raw.loc[validos, "Fuente"].map(BITS_FUENTE).fillna(0).to_numpy(dtype="int64")
+    pares = pd.DataFrame({"t": codigos, "b": bits}).drop_duplicates()
+    mascara = np.bincount(pares["t"].to_numpy(),
+                          weights=pares["b"].to_numpy(),
+                          minlength=len(unicos)).astype("int64")
+
+    df_dedup.insert(0, "Search Terms", np.asarray(unicos, dtype=object))
+    df_dedup["Fuente"] = pd.Categorical(_etiquetas_fuente()[mascara])
+    return df_dedup.reset_index(drop=True)
+
+
+def _ruta_cache_dedup(huella: str) -> str:
+    return os.path.join(CACHE_DIR, f"dedup_{huella[:16]}_v{VERSION_MAPEO}.parquet")
+
+
+def build_master_deduplicated(excel_data: pd.ExcelFile, usar_cache: bool = True) -> pd.DataFrame:
+    """
+    Maestra deduplicada. Se persiste en disco por (hash del Excel, VERSION_MAPEO),
+    así que se comparte entre sesiones/procesos y se invalida sola al subir
+    otro archivo o cambiar el mapeo de columnas.
+    """
+    huella = huella_excel(excel_data) if usar_cache else None
+    ruta = _ruta_cache_dedup(huella) if huella else None
+    if ruta and os.path.exists(ruta):
+        try:
+            return pd.read_parquet(ruta)
+        except Exception:
+            pass  # caché corrupta: se reconstruye
+
     df_raw = build_master_raw(excel_data)
     if df_raw is None or df_raw.empty:
         return pd.DataFrame()
 
-    agg_dict = {
-        "Search Volume": "max",
-        "ASIN Click Share": "max",
-        "Comp Click Share": "max",
-        "Niche Click Share": "max",
-        "Comp Depth": "max",
-        "Niche Depth": "max",
-        "Relevancy": "max",
-        "ABA Rank": "max",
-        "Fuente": lambda x: ", ".join(sorted(set(x.dropna())))
-    }
+    df_dedup = deduplicar_master(df_raw)
 
-    df_dedup = df_raw.groupby("Search Terms", as_index=False).agg(agg_dict)
+    if ruta:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp = f"{ruta}.tmp{os.getpid()}"
+            df_dedup.to_parquet(tmp, index=False)
+            os.replace(tmp, ruta)
+        except Exception:
+            pass  # sin pyarrow/permisos: solo se pierde la caché
 
     return df_dedup
 
 
-def formatear_columnas_tabla(df: pd.DataFrame) -> pd.DataFrame:
+# Columnas que NO aplican a cada fuente (vacío → "NAF" en vez de "NaN")
+COLUMNAS_NAF = {
+    "CustKW": ["Comp Click Share", "Niche Click Share", "Comp Depth", "Niche Depth", "Relevancy"],
+    "CompKW": ["ASIN Click Share", "Niche Click Share", "Niche Depth", "Relevancy", "ABA Rank"],
+    "MiningKW": ["ASIN Click Share", "Comp Click Share", "Comp Depth", "ABA Rank"],
+}
+COLUMNAS_ENTERAS = ["Search Volume", "ABA Rank",
+                    "Comp Depth", "Niche Depth", "Relevancy"]
+
+
+def _formatear_unicos(valores: np.ndarray, fmt) -> np.ndarray:
+    """
+    Formatea solo los valores únicos y los reparte con un gather (factorize).
+    Evita una llamada Python por fila cuando hay valores repetidos.
+    """
+    codigos, unicos = pd.factorize(valores, sort=False)
+    textos = np.array([fmt(u) for u in unicos], dtype=object)
+    return textos[codigos]
+
+
+def formatear_columnas_tabla(df: pd.DataFrame, modo: str = "texto"):
+    """
+    Formatea la tabla maestra para visualización.
+
+    modo="texto"   → devuelve copia con strings: miles con coma, Click Share en %,
+                     vacíos como "NAF" (columna no aplica a la fuente) o "NaN".
+    modo="cliente" → devuelve (df, column_config): los números quedan numéricos y
+                     Streamlit los formatea en el navegador (no se construye copia
+                     en texto). Los vacíos se muestran en blanco (sin NAF/NaN).
+    """
+    columnas = [c for c in df.columns if c not in ["Search Terms", "Fuente"]]
+
+    if modo == "cliente":
+        return _formatear_columnas_cliente(df, columnas)
+
     df_format = df.copy()
+    fuente = df_format["Fuente"].to_numpy() if "Fuente" in df_format.columns else None
+    mascaras_fuente = {
+        f: (fuente == f) if fuente is not None else np.zeros(len(df_format), dtype=bool)
+        for f in COLUMNAS_NAF
+    }
 
-    for col in df_format.columns:
-        if col in ["Search Terms", "Fuente"]:
-            continue  # no tocar estas columnas
-
-        def format_val(x, fuente, col):
-            if x is None or pd.isna(x):
-
-                if fuente == "CustKW" and col in [
-                    "Comp Click Share", "Niche Click Share", "Comp Depth", "Niche Depth", "Relevancy"
-                ]:
-                    return "NAF"
-                elif fuente == "CompKW" and col in [
-                    "ASIN Click Share", "Niche Click Share", "Niche Depth", "Relevancy", "ABA Rank"
-                ]:
-                    return "NAF"
-                elif fuente == "MiningKW" and col in [
-                    "ASIN Click Share", "Comp Click Share", "Comp Depth", "ABA Rank"
-                ]:
-                    return "NAF"
-                else:
-                    return "NaN"
-
-            else:
-                if col in ["Search Volume", "ABA Rank", "Comp Depth", "Niche Depth", "Relevancy"]:
-                    return f"{int(x):,}"
-                elif "Click Share" in col:
-                    return f"{float(x) * 100:.2f}%"
-                else:
-                    return x
-
-        df_format[col] = df_format.apply(
-            lambda row: format_val(row[col], row["Fuente"], col), axis=1
-        )
+    for col in columnas:
+        valores = pd.to_numeric(df_format[col], errors="coerce").to_numpy(dtype="float64")
+        nulos = np.isnan(valores)
+
+        # Vacíos: NAF si la columna no aplica a la fuente de esa fila, si no NaN
+        naf = np.zeros(len(valores), dtype=bool)
+        for f, cols_naf in COLUMNAS_NAF.items():
+            if col in cols_naf:
+                naf |= mascaras_fuente[f]
+        salida = np.where(nulos & naf, "NAF", "NaN").astype(object)
+
+        validos = ~nulos
+        if col in COLUMNAS_ENTERAS:
+            enteros = np.trunc(valores[validos]).astype("int64")
+            salida[validos] = _formatear_unicos(enteros, "{:,}".format)
+        elif "Click Share" in col:
+            salida[validos] = _formatear_unicos(
+                valores[validos] * 100, "{:.2f}%".format)
+        else:
+            salida[validos] = df_format[col].to_numpy(dtype=object)[validos]
+
+        df_format[col] = salida
 
     return df_format
+
+
+def _formatear_columnas_cliente(df: pd.DataFrame, columnas: list):
+    """
+    Variante sin strings: Click Share se escala a % (operación numérica) y el
+    formato se delega a st.column_config.NumberColumn.
+    """
+    shares = [c for c in columnas if "Click Share" in c]
+    df_vista = df.assign(**{c: pd.to_numeric(df[c], errors="coerce") * 100
+                            for c in shares}) if shares else df
+
+    config = {}
+    for col in columnas:
+        if col in COLUMNAS_ENTERAS:
+            config[col] = st.column_config.NumberColumn(col, format="%d")
+        elif col in shares:
+            config[col] = st.column_config.NumberColumn(col, format="%.2f%%")
+    return df_vista, config
@@ -1,9 +1,50 @@
 # keywords/funcional_keywords_estadistica.py
-from scipy.stats import ttest_ind
-from scipy.stats import skew, kurtosis, shapiro, ttest_ind, mannwhitneyu, levene
+from scipy.stats import shapiro, ttest_ind, mannwhitneyu, levene
+import os
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 import streamlit as st
 import pandas as pd
 import numpy as np
+from typing import Optional
+
+from keywords.funcional_keywords_deduplicado import BITS_FUENTE
+from keywords.loader_keywords_fuentes import convertir_metrica
+
+
+# Columnas relevantes por fuente: vacío → -1 (falta real); resto → -2 (no aplica)
+COLUMNAS_POR_FUENTE = {
+    "CustKW": ["ASIN Click Share", "Search Volume", "ABA Rank"],
+    "CompKW": ["Comp Click Share", "Search Volume", "Comp Depth", "ABA Rank"],
+    "MiningKW": ["Niche Click Share", "Search Volume", "Niche Depth", "Relevancy"]
+}
+
+
+def _bits_fuente_por_fila(fuente: pd.Series) -> np.ndarray:
+    """
+    Máscara de bits de fuentes por fila (BITS_FUENTE). Se resuelve una vez por
+    categoría de 'Fuente' y se reparte con los códigos (sin regex por fila).
+    """
+    categorica = fuente.astype("category")
+    bits_categoria = np.array(
+        [sum(bit for f, bit in BITS_FUENTE.items() if f in str(etiqueta))
+         for etiqueta in categorica.cat.categories] + [0],  # código -1 (NaN) → 0
+        dtype="int64")
+    return bits_categoria[categorica.cat.codes.to_numpy()]
+
+
+def _tabla_sentinelas(col: str) -> np.ndarray:
+    """
+    Valor a imputar en 'col' para cada combinación de bits (0..7): decide la
+    primera fuente presente en el orden de COLUMNAS_POR_FUENTE. Sin fuente → NaN.
+    """
+    tabla = np.full(1 << len(BITS_FUENTE), np.nan, dtype="float32")
+    for codigo in range(len(tabla)):
+        for fuente, columnas_relevantes in COLUMNAS_POR_FUENTE.items():
+            if codigo & BITS_FUENTE[fuente]:
+                tabla[codigo] = -1 if col in columnas_relevantes else -2
+                break
+    return tabla
 
 
 def imputar_valores_vacios(df: pd.DataFrame) -> pd.DataFrame:
@@ -11,81 +52,148 @@ def imputar_valores_vacios(df: pd.DataFrame) -> pd.DataFrame:
     Reemplaza valores vacíos con:
     -1 si la columna sí corresponde a la fuente (es relevante)
     -2 si la columna no corresponde a la fuente (es irrelevante)
+
+    Las métricas se pasan a float32 (el texto con %/comas ya viene convertido
+    desde la ingesta) y cada columna se imputa con un solo np.where.
     """
     df = df.copy()
 
-    mapeo_columnas = {
-        "CustKW": ["ASIN Click Share", "Search Volume", "ABA Rank"],
-        "CompKW": ["Comp Click Share", "Search Volume", "Comp Depth", "ABA Rank"],
-        "MiningKW": ["Niche Click Share", "Search Volume", "Niche Depth", "Relevancy"]
-    }
-
- # 🔧 Forzar conversión de columnas numéricas por seguridad
     todas_columnas = set()
-    for columnas in mapeo_columnas.values():
+    for columnas in COLUMNAS_POR_FUENTE.values():
         todas_columnas.update(columnas)
 
     for col in todas_columnas:
         if col in df.columns:
-            # Elimina %, comas y convierte a número
-            df[col] = (
-                df[col]
-                .astype(str)
-                .str.replace("%", "", regex=False)
-                .str.replace(",", "", regex=False)
-                .replace("NAF", pd.NA)
-                .replace("None", pd.NA)
-            )
-            df[col] = pd.to_numeric(df[col], errors="coerce")
+            df[col] = convertir_metrica(df[col], "float32")
 
     columnas_numericas = df.select_dtypes(include=["number"]).columns
+    if "Fuente" not in df.columns or len(columnas_numericas) == 0:
+        return df
+
+    bits = _bits_fuente_por_fila(df["Fuente"])
 
     for col in columnas_numericas:
-        for fuente, columnas_relevantes in mapeo_columnas.items():
-            mask = df["Fuente"].str.contains(fuente) & (df[col].isna())
-            if col in columnas_relevantes:
-                df.loc[mask, col] = -1  # falta real
-            else:
-                df.loc[mask, col] = -2  # no aplica
+        valores = df[col].to_numpy(dtype="float32")
+        df[col] = np.where(np.isnan(valores), _tabla_sentinelas(col)[bits], valores)
 
     return df
 
 
-def filtrar_por_sliders(df: pd.DataFrame) -> pd.DataFrame:
+def obtener_imputado(df: pd.DataFrame, huella: Optional[str] = None,
+                     faltantes_como_cero: bool = False) -> pd.DataFrame:
+    """
+    imputar_valores_vacios con caché en session_state por huella del dataset
+    (st.session_state.master_deduped_huella). Sin huella no se cachea.
+    Con faltantes_como_cero=True devuelve además -1 → 0 (base de los filtros).
+
+    El DataFrame devuelto es compartido: no modificarlo en sitio.
+    """
+    clave = (huella, faltantes_como_cero)
+    if huella is not None and st.session_state.get("df_imputado_clave") == clave:
+        return st.session_state["df_imputado"]
+
+    df_imp = imputar_valores_vacios(df)
+    if faltantes_como_cero:
+        numericas = df_imp.select_dtypes(include=["number"]).columns
+        for col in numericas:
+            valores = df_imp[col].to_numpy()
+            df_imp[col] = np.where(valores == -1, 0, valores).astype(valores.dtype)
+
+    if huella is not None:
+        st.session_state["df_imputado"] = df_imp
+        st.session_state["df_imputado_clave"] = clave
+    return df_imp
+
+
+def construir_indice_filtros(df: pd.DataFrame) -> dict:
+    """
+    Índice de filtros sobre la tabla imputada: por cada métrica, los valores
+    válidos (>= 0) ordenados una vez (argsort) y las máscaras de -1/-2 como
+    bitsets (np.packbits). Un rango de slider se resuelve con searchsorted.
+    """
+    n = len(df)
+    columnas = {}
+    for col in df.columns:
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            continue
+        valores = df[col].to_numpy(dtype="float64")
+        filas_validas = np.flatnonzero(valores >= 0)
+        orden = filas_validas[np.argsort(valores[filas_validas], kind="stable")]
+        ordenados = valores[orden]
+        columnas[col] = {
+            "orden": orden,
+            "ordenados": ordenados,
+            "menos1": np.packbits(valores == -1),
+            "menos2": np.packbits(valores == -2),
+            "min": float(ordenados[0]) if len(ordenados) else None,
+            "max": float(ordenados[-1]) if len(ordenados) else None,
+        }
+    return {"df": df, "n": n, "columnas": columnas, "mascaras": {}, "resultado": None}
+
+
+def _bitset_rango(indice: dict, col: str, rango, excluir_faltantes: bool) -> np.ndarray:
+    """
+    Bitset de filas que pasan el filtro de una columna. Se memoiza por
+    (rango, excluir): en un rerun solo se recalcula la columna que cambió.
+    """
+    estado = (tuple(rango) if rango is not None else None, excluir_faltantes)
+    previo = indice["mascaras"].get(col)
+    if previo is not None and previo[0] == estado:
+        return previo[1]
+
+    datos = indice["columnas"][col]
+    if rango is None:
+        # Columna sin valores >= 0: solo quedan -1 / -2
+        bitset = datos["menos1"] | datos["menos2"]
+    else:
+        inicio = np.searchsorted(datos["ordenados"], rango[0], side="left")
+        fin = np.searchsorted(datos["ordenados"], rango[1], side="right")
+        dentro = np.zeros(indice["n"], dtype=bool)
+        dentro[datos["orden"][inicio:fin]] = True
+        bitset = np.packbits(dentro) | datos["menos2"]
+        if not excluir_faltantes:
+            bitset |= datos["menos1"]
+
+    indice["mascaras"][col] = (estado, bitset)
+    return bitset
+
+
+def filtrar_por_sliders(df: pd.DataFrame, huella: Optional[str] = None) -> pd.DataFrame:
     """
     Aplica filtros tipo slider para columnas numéricas.
     - -2 siempre se mantiene visible.
     - -1 se mantiene salvo que el usuario decida excluirlo.
     El rango del slider solo aplica a valores >= 0.
     Devuelve df filtrado, ya imputado.
+
+    huella: clave del dataset para reutilizar la tabla imputada y el índice de
+    filtros entre reruns (mover un slider solo recalcula esa columna y luego
+    intersecta bitsets).
     """
-    from keywords.funcional_keywords_estadistica import imputar_valores_vacios
+    df = obtener_imputado(df, huella, faltantes_como_cero=True)
 
-    df = imputar_valores_vacios(df)
-    df = df.replace(-1, 0)
-    df_filtrado = df.copy()
+    indice = st.session_state.get("indice_filtros") if huella is not None else None
+    if indice is None or indice["df"] is not df:
+        indice = construir_indice_filtros(df)
+        if huella is not None:
+            st.session_state["indice_filtros"] = indice
 
-    columnas_numericas = [
-        c for c in df_filtrado.columns if pd.api.types.is_numeric_dtype(df_filtrado[c])]
+    columnas_numericas = list(indice["columnas"])
     if not columnas_numericas:
         st.info("No hay columnas numéricas para filtrar.")
-        st.session_state["df_filtrado"] = df_filtrado.reset_index(drop=True)
+        st.session_state["df_filtrado"] = df.reset_index(drop=True)
         return st.session_state["df_filtrado"]
 
     st.markdown("### Filtros dinámicos")
 
-    filtros = []
-
+    estados = []
     for col in columnas_numericas:
-        col_data = df_filtrado[col]
-
-        col_validos = col_data[col_data >= 0]
-        if col_validos.empty:
-            filtros.append((col_data == -1) | (col_data == -2))
+        datos = indice["columnas"][col]
+        if datos["min"] is None:
+            estados.append((col, None, False))
             continue
 
-        min_val = float(col_validos.min())
-        max_val = float(col_validos.max())
+        min_val, max_val = datos["min"], datos["max"]
         step = 0.001 if "Click Share" in col else 1.0
 
         excluir_faltantes = st.checkbox(
@@ -106,78 +214,193 @@ def filtrar_por_sliders(df: pd.DataFrame) -> pd.DataFrame:
                 key=f"slider_{col}"
             )
 
-        filtro_col = (col_data == -2) | col_data.between(rango[0], rango[1])
-
-        if not excluir_faltantes:
-            filtro_col |= (col_data == -1)
+        estados.append((col, rango, excluir_faltantes))
+
+    # Misma combinación de filtros que el rerun anterior: misma tabla
+    clave = tuple((col, tuple(r) if r is not None else None, e) for col, r, e in estados)
+    if indice["resultado"] is not None and indice["resultado"][0] == clave:
+        df_filtrado = indice["resultado"][1]
+    else:
+        total = None
+        for col, rango, excluir in estados:
+            bitset = _bitset_rango(indice, col, rango, excluir)
+            total = bitset.copy() if total is None else np.bitwise_and(total, bitset, out=total)
+        filas = np.flatnonzero(np.unpackbits(total, count=indice["n"]))
+        df_filtrado = df.take(filas).reset_index(drop=True)
+        indice["resultado"] = (clave, df_filtrado)
 
-        filtros.append(filtro_col)
-
-    if filtros:
-        filtro_total = filtros[0]
-        for f in filtros[1:]:
-            filtro_total &= f
-        df_filtrado = df_filtrado[filtro_total]
-
-    df_filtrado = df_filtrado.reset_index(drop=True)
     st.session_state["df_filtrado"] = df_filtrado  # ✅ Ya imputado
     return df_filtrado
 
 
-def calcular_descriptivos_extendidos(df: pd.DataFrame) -> pd.DataFrame:
+# Shapiro-Wilk pierde precisión sobre 5000 datos (SciPy lo advierte): se submuestrea
+MAX_SHAPIRO = 5000
+# Modas mostradas como máximo (si todo es único, la moda son todos los valores)
+MAX_MODAS = 10
+# Resultados memorizados por sesión (por tipo de cálculo)
+MAX_MEMO = 8
+
+
+def huella_estado_filtros(huella: Optional[str], columnas, incluir_log: bool = True) -> Optional[str]:
     """
-    Calcula estadísticas descriptivas extendidas para columnas numéricas,
-    excluyendo valores -1 y -2.
+    Clave del estado de filtros: dataset + sliders, checkboxes de faltantes y
+    radios de log10 de cada columna. Dos reruns con la misma clave producen la
+    misma tabla filtrada/transformada. Con incluir_log=False la clave identifica
+    solo la tabla filtrada (antes de aplicar log10).
     """
-    df_numeric = df.select_dtypes(include="number").copy()
+    if huella is None:
+        return None
+    prefijos = ("slider_", "check_", "log_radio_") if incluir_log else ("slider_", "check_")
+    partes = [huella]
+    for col in columnas:
+        for prefijo in prefijos:
+            partes.append(repr(st.session_state.get(f"{prefijo}{col}")))
+    return hashlib.sha1("|".join(partes).encode("utf-8")).hexdigest()
+
 
-    # Excluir valores -1 (faltantes) y -2 (irrelevantes)
-    df_clean = df_numeric[(df_numeric > -1).all(axis=1)]
+def _memo_sesion(nombre: str, clave: Optional[str], calcular):
+    """
+    Memoiza calcular() en st.session_state[nombre] por clave (pocas entradas,
+    se descarta la más antigua). Sin clave no se memoiza.
+    """
+    if clave is None:
+        return calcular()
+    memo = st.session_state.setdefault(nombre, {})
+    if clave in memo:
+        return memo[clave]
+    resultado = calcular()
+    memo[clave] = resultado
+    while len(memo) > MAX_MEMO:
+        memo.pop(next(iter(memo)))
+    return resultado
+
+
+def _modas(valores: np.ndarray) -> str:
+    """Moda(s) por conteo hash (factorize + bincount), sin ordenar toda la serie."""
+    codigos, unicos = pd.factorize(valores, sort=False)
+    conteos = np.bincount(codigos)
+    modas = np.sort(unicos[conteos == conteos.max()])
+    texto = ", ".join(map(str, modas[:MAX_MODAS]))
+    if len(modas) > MAX_MODAS:
+        texto += f" (+{len(modas) - MAX_MODAS})"
+    return texto
+
+
+def _shapiro_normal(valores: np.ndarray) -> str:
+    if len(valores) < 3:
+        return "N/A"
+    if len(valores) > MAX_SHAPIRO:
+        rng = np.random.default_rng(0)
+        valores = rng.choice(valores, MAX_SHAPIRO, replace=False)
+    return "Normal" if shapiro(valores).pvalue > 0.05 else "No normal"
+
+
+def _descriptivos(df: pd.DataFrame) -> pd.DataFrame:
+    columnas = df.select_dtypes(include="number").columns
+    # Una fila por métrica (contigua) para reducir sobre axis=1
+    originales = np.ascontiguousarray(df[columnas].to_numpy().T)
+
+    # Excluir valores -1 (faltantes) y -2 (irrelevantes): una sola máscara
+    X = originales.astype("float64")
+    validos = ~(np.isnan(X) | (X == -1) | (X == -2))
+    n = validos.sum(axis=1)
+    activas = n > 0
+    if not activas.any():
+        return pd.DataFrame(columns=["Columna"])
+
+    columnas = columnas[activas]
+    originales, X, validos, n = originales[activas], X[activas], validos[activas], n[activas]
+    X[~validos] = np.nan
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        suma = np.where(validos, X, 0.0).sum(axis=1)
+        media = suma / n
+        minimo = np.nanmin(X, axis=1)
+        maximo = np.nanmax(X, axis=1)
+        q1, q2, q3 = np.nanquantile(X, [0.25, 0.50, 0.75], axis=1)
+
+        # Momentos centrales (2º a 4º) sobre la matriz, sin potencias generales
+        desv = np.where(validos, X - media[:, None], 0.0)
+        d2 = desv * desv
+        m2 = d2.sum(axis=1) / n
+        m3 = (d2 * desv).sum(axis=1) / n
+        m4 = (d2 * d2).sum(axis=1) / n
+        var = np.where(n > 1, m2 * n / np.maximum(n - 1, 1), np.nan)
+        std = np.sqrt(var)
+        asimetria = np.where(m2 > 0, m3 / m2 ** 1.5, np.nan)
+        curtosis = np.where(m2 > 0, m4 / m2 ** 2 - 3, np.nan)
 
     descriptivos = {}
+    for k, col in enumerate(columnas):
+        valores = originales[k, validos[k]]
+        hay_std = std[k] != 0 and not np.isnan(std[k])
+        descriptivos[col] = {
+            "Count": int(n[k]),
+            "Mean": media[k],
+            "Median": q2[k],
+            "Mode": _modas(valores),
+            "Std": std[k],
+            "Variance": var[k],
+            "Min": minimo[k],
+            "Max": maximo[k],
+            "Range": maximo[k] - minimo[k],
+            "Q1 (25%)": q1[k],
+            "Q2 (50%)": q2[k],
+            "Q3 (75%)": q3[k],
+            "IQR": q3[k] - q1[k],
+            "Sum": suma[k],
+            "Skewness": asimetria[k] if n[k] >= 3 else None,
+            "Kurtosis": curtosis[k] if n[k] >= 3 else None,
+            "Z-Score Min": round((minimo[k] - media[k]) / std[k], 2) if hay_std else None,
+            "Z-Score Max": round((maximo[k] - media[k]) / std[k], 2) if hay_std else None,
+            "Coef. de Variación (%)": round(std[k] / media[k] * 100, 2) if media[k] != 0 else None,
+            "Shapiro Normality": _shapiro_normal(valores),
+        }
 
-    for col in df_numeric.columns:
-        serie = df_numeric[col]
-        serie_valida = serie[(serie != -1) & (serie != -2)]
+    return pd.DataFrame(descriptivos).T.reset_index().rename(columns={"index": "Columna"})
 
-        if serie_valida.empty:
-            continue
 
-        q1 = serie_valida.quantile(0.25)
-        q2 = serie_valida.quantile(0.50)
-        q3 = serie_valida.quantile(0.75)
-        moda = serie_valida.mode()
+def calcular_descriptivos_extendidos(df: pd.DataFrame, clave: Optional[str] = None) -> pd.DataFrame:
+    """
+    Calcula estadísticas descriptivas extendidas para columnas numéricas,
+    excluyendo valores -1 y -2.
 
-        descriptivos[col] = {
-            "Count": serie_valida.count(),
-            "Mean": serie_valida.mean(),
-            "Median": serie_valida.median(),
-            "Mode": ", ".join(map(str, moda.tolist())) if not moda.empty else "N/A",
-            "Std": serie_valida.std(),
-            "Variance": serie_valida.var(),
-            "Min": serie_valida.min(),
-            "Max": serie_valida.max(),
-            "Range": serie_valida.max() - serie_valida.min(),
-            "Q1 (25%)": q1,
-            "Q2 (50%)": q2,
-            "Q3 (75%)": q3,
-            "IQR": q3 - q1,
-            "Sum": serie_valida.sum(),
-            "Skewness": skew(serie_valida) if len(serie_valida) >= 3 else None,
-            "Kurtosis": kurtosis(serie_valida) if len(serie_valida) >= 3 else None,
-            "Z-Score Min": round(((serie_valida.min() - serie_valida.mean()) / serie_valida.std()), 2) if serie_valida.std() != 0 else None,
-            "Z-Score Max": round(((serie_valida.max() - serie_valida.mean()) / serie_valida.std()), 2) if serie_valida.std() != 0 else None,
-            "Coef. de Variación (%)": round((serie_valida.std() / serie_valida.mean()) * 100, 2) if serie_valida.mean() != 0 else None,
-            "Shapiro Normality": (
-                "Normal" if (len(serie_valida) >= 3 and shapiro(serie_valida).pvalue > 0.05)
-                else "No normal"
-            ) if len(serie_valida) >= 3 else "N/A",
-        }
+    Todas las columnas se procesan juntas como matriz 2-D (nanmean, nanquantile,
+    momentos). clave: huella del estado de filtros (huella_estado_filtros);
+    si se pasa, el resultado se reutiliza mientras no cambien los filtros.
+    """
+    return _memo_sesion("memo_descriptivos", clave, lambda: _descriptivos(df))
 
-    return pd.DataFrame(descriptivos).T.reset_index().rename(columns={"index": "Columna"})
 
+def _diagnostico_log(df: pd.DataFrame) -> dict:
+    columnas = df.select_dtypes(include=["number"]).columns
+    X = np.ascontiguousarray(df[columnas].to_numpy(dtype="float64").T)
+    validos = X > 0  # log10 solo en positivos (NaN queda fuera)
+    n = validos.sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = np.where(validos, X, 0.0).sum(axis=1) / n
+        desv = np.where(validos, X - media[:, None], 0.0)
+        d2 = desv * desv
+        m2 = d2.sum(axis=1) / n
+        skewness = np.where(m2 > 0, (d2 * desv).sum(axis=1) / n / m2 ** 1.5, np.nan)
+        kurt = np.where(m2 > 0, (d2 * d2).sum(axis=1) / n / m2 ** 2 - 3, np.nan)
+        minimo = np.where(validos, X, np.inf).min(axis=1, initial=np.inf)
+        maximo = np.where(validos, X, -np.inf).max(axis=1, initial=-np.inf)
+        rango = np.where(minimo > 0, maximo / minimo, 0)
+
+    señales = ((np.abs(skewness) > 1).astype(int) + (kurt > 3) + (rango > 1000))
 
-def sugerir_log_transform_robusto(df: pd.DataFrame) -> dict:
+    sugerencias = {}
+    for k, col in enumerate(columnas):
+        if n[k] < 3:
+            sugerencias[col] = None
+        else:
+            sugerencias[col] = round(float(skewness[k]), 2) if señales[k] >= 2 else None
+    return sugerencias
+
+
+def sugerir_log_transform_robusto(df: pd.DataFrame, clave: Optional[str] = None) -> dict:
     """
     Sugiere aplicar log10 si se detecta distribución severamente sesgada.
     Criterios:
@@ -185,82 +408,136 @@ def sugerir_log_transform_robusto(df: pd.DataFrame) -> dict:
     - Kurtosis > 3
     - Rango (max/min) > 1000x
     Se sugiere log10 si se cumplen al menos 2 criterios.
-    """
-    sugerencias = {}
-    columnas_numericas = df.select_dtypes(include=["number"]).columns
-
-    for col in columnas_numericas:
-        datos = df[col].dropna()
-        datos_validos = datos[datos > 0]  # log10 solo en positivos
 
-        if len(datos_validos) < 3:
-            sugerencias[col] = None
-            continue
-
-        skewness = skew(datos_validos)
-        kurt = kurtosis(datos_validos)
-        rango = datos_validos.max() / datos_validos.min() if datos_validos.min() > 0 else 0
-
-        señales = sum([
-            abs(skewness) > 1,
-            kurt > 3,
-            rango > 1000
-        ])
+    Los diagnósticos de todas las columnas salen de una sola pasada matricial.
+    clave: huella de los filtros (sin radios de log10); con clave se memoiza.
+    """
+    return _memo_sesion("memo_sugerencias_log", clave, lambda: _diagnostico_log(df))
 
-        sugerencias[col] = round(skewness, 2) if señales >= 2 else None
 
-    return sugerencias
+def _log10_columna(valores: np.ndarray) -> np.ndarray:
+    """log10 solo donde x > 0 (in situ sobre una copia float); -1/-2/0 quedan igual."""
+    transformada = np.array(valores, dtype=np.result_type(valores.dtype, np.float32))
+    np.log10(transformada, out=transformada, where=transformada > 0)
+    return transformada
 
 
-def aplicar_log10_dinamico(df: pd.DataFrame) -> pd.DataFrame:
+def aplicar_log10_dinamico(df: pd.DataFrame, clave: Optional[str] = None) -> pd.DataFrame:
     """
     Aplica log10 dinámicamente a las columnas marcadas como 'Aplicar log10' por el usuario.
     - Preserva los valores -1 y -2.
     - Renombra la columna visualmente: 'Search Volume (log10)'
-    """
-    from keywords.funcional_keywords_estadistica import imputar_valores_vacios
-    df = imputar_valores_vacios(df)
-    df = df.replace(-1, 0)
-    df = df.copy()
-    nuevas_columnas = {}
-
-    for col in df.select_dtypes(include="number").columns:
-        key = f"log_radio_{col}"
-        if key in st.session_state and st.session_state[key] == "Aplicar log10":
-            serie = df[col]
-            transformada = serie.apply(lambda x: np.log10(x) if x > 0 else x)
-            nuevo_nombre = f"{col} (log10)"
-            nuevas_columnas[col] = nuevo_nombre
-            df[col] = transformada
-
-    df.rename(columns=nuevas_columnas, inplace=True)
-    return df
+    df normalmente ya viene imputado desde filtrar_por_sliders; solo se imputa
+    si todavía quedan vacíos en columnas numéricas.
 
-
-def calcular_correlaciones(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    clave: huella de la tabla filtrada (sin radios de log10). Con clave, cada
+    columna transformada se guarda en session_state y al cambiar un radio solo
+    se calcula esa columna; las columnas originales son las de df.
     """
-    Calcula matrices de correlación (Pearson y Spearman) sobre columnas numéricas,
-    imputando -1 como 0 y excluyendo -2.
+    numericas = df.select_dtypes(include="number").columns
+    if df[numericas].isna().to_numpy().any():
+        df = obtener_imputado(df, faltantes_como_cero=True)
+
+    seleccion = [col for col in numericas
+                 if st.session_state.get(f"log_radio_{col}") == "Aplicar log10"]
+    if not seleccion:
+        return df
+
+    cache = st.session_state.setdefault("memo_log10", {}) if clave is not None else {}
+    if cache.get("__clave__") != clave:
+        cache.clear()
+        cache["__clave__"] = clave
+
+    transformadas = {}
+    for col in seleccion:
+        if col not in cache:
+            cache[col] = _log10_columna(df[col].to_numpy())
+        transformadas[col] = cache[col]
+
+    df = df.assign(**transformadas)
+    return df.rename(columns={col: f"{col} (log10)" for col in seleccion})
+
+
+def _rangos(valores: np.ndarray) -> np.ndarray:
+    """Rangos promedio (empates como pandas/SciPy 'average'), 1-based."""
+    orden = np.argsort(valores, kind="mergesort")
+    ordenados = valores[orden]
+    nuevos = np.empty(len(ordenados), dtype=bool)
+    nuevos[:1] = True
+    nuevos[1:] = ordenados[1:] != ordenados[:-1]
+    inicio = np.flatnonzero(nuevos)
+    fin = np.append(inicio[1:], len(ordenados))
+    promedio = (inicio + fin + 1) / 2.0
+    rangos = np.empty(len(valores), dtype="float64")
+    rangos[orden] = promedio[np.cumsum(nuevos) - 1]
+    return rangos
+
+
+def _correlacion_por_pares(V: np.ndarray, M: np.ndarray) -> np.ndarray:
     """
-    df_corr = df.copy()
-    columnas_numericas = df_corr.select_dtypes(include="number").columns
-
-    # Convertir -1 a 0 (faltantes reales) y eliminar -2 (irrelevante)
-    df_corr = df_corr[columnas_numericas].replace(-1, 0)
-    df_corr = df_corr[(df_corr != -2).all(axis=1)]
-
-    if df_corr.shape[1] < 2:
+    Pearson con observaciones completas por par (filas donde ambas columnas
+    son válidas), todo con productos de matrices.
+    V: valores (n × k) con 0 donde no hay dato; M: máscara 0/1 (n × k).
+    """
+    # Centrar y escalar por columna: estabiliza float32 sin cambiar r
+    n_col = np.maximum(M.sum(axis=0), 1)
+    media = V.sum(axis=0) / n_col
+    escala = np.sqrt(((V - media) ** 2 * M).sum(axis=0) / n_col)
+    escala[escala == 0] = 1
+    Z = (((V - media) / escala) * M).astype("float32")
+    M32 = M.astype("float32")
+
+    n = (M32.T @ M32).astype("float64")          # pares completos
+    suma = (Z.T @ M32).astype("float64")         # Σ x_i donde j es válido
+    cuad = ((Z * Z).T @ M32).astype("float64")   # Σ x_i² donde j es válido
+    cruz = (Z.T @ Z).astype("float64")           # Σ x_i x_j
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = cruz - suma * suma.T / n
+        var_i = cuad - suma ** 2 / n
+        r = cov / np.sqrt(var_i * var_i.T)
+    r[(n < 2) | ~np.isfinite(r)] = np.nan
+    return np.clip(r, -1.0, 1.0)
+
+
+def _correlaciones(df: pd.DataFrame):
+    columnas = df.select_dtypes(include="number").columns
+    if len(columnas) < 2:
         return None, None
 
-    pearson = df_corr.corr(method="pearson")
-    spearman = df_corr.corr(method="spearman")
-
+    # -1 (faltante real) cuenta como 0; -2 (no aplica) queda fuera solo en los
+    # pares donde aparece (no se descarta la fila completa)
+    X = df[columnas].to_numpy(dtype="float64")
+    X[X == -1] = 0
+    validos = ~(np.isnan(X) | (X == -2))
+    M = validos.astype("float64")
+    V = np.where(validos, X, 0.0)
+
+    # Spearman = Pearson sobre rangos; cada columna se rankea una sola vez
+    R = np.zeros_like(V)
+    for k in range(V.shape[1]):
+        if validos[:, k].any():
+            R[validos[:, k], k] = _rangos(V[validos[:, k], k])
+
+    pearson = pd.DataFrame(_correlacion_por_pares(V, M), index=columnas, columns=columnas)
+    spearman = pd.DataFrame(_correlacion_por_pares(R, M), index=columnas, columns=columnas)
     return pearson, spearman
 
 
+def calcular_correlaciones(df: pd.DataFrame, clave: Optional[str] = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Calcula matrices de correlación (Pearson y Spearman) sobre columnas numéricas,
+    imputando -1 como 0 y excluyendo -2 por pares (pairwise-complete).
+    Spearman usa rangos calculados una vez por columna sobre sus valores válidos.
+    clave: huella del estado de filtros; con clave el resultado se memoiza.
+    """
+    return _memo_sesion("memo_correlaciones", clave, lambda: _correlaciones(df))
+
+
 def interpretar_correlaciones(matriz: pd.DataFrame, metodo: str = "Pearson") -> list:
     """
-    Genera interpretación automática de una matriz de correlación.
+    Genera interpretación automática de una matriz de correlación
+    (solo triángulo superior: cada par una vez).
     """
     interpretaciones = []
     umbrales = [
@@ -271,81 +548,147 @@ def interpretar_correlaciones(matriz: pd.DataFrame, metodo: str = "Pearson") ->
         (0.1, "muy débil")
     ]
 
-    ya_analizadas = set()
+    columnas = list(matriz.columns)
+    valores = matriz.to_numpy()
+    filas, cols = np.triu_indices(len(columnas), k=1)
 
-    for col1 in matriz.columns:
-        for col2 in matriz.columns:
-            if col1 == col2 or (col2, col1) in ya_analizadas:
-                continue
+    for i, j in zip(filas, cols):
+        col1, col2 = columnas[i], columnas[j]
+        valor = valores[i, j]
 
-            ya_analizadas.add((col1, col2))
-            valor = matriz.loc[col1, col2]
+        signo = "positiva (directa)" if valor > 0 else "negativa (inversa)"
+        fuerza = "sin correlación"
 
-            signo = "positiva (directa)" if valor > 0 else "negativa (inversa)"
-            fuerza = "sin correlación"
+        for umbral, etiqueta in umbrales:
+            if abs(valor) >= umbral:
+                fuerza = etiqueta
+                break
 
-            for umbral, etiqueta in umbrales:
-                if abs(valor) >= umbral:
-                    fuerza = etiqueta
-                    break
-
-            interpretacion = f"**{col1}** y **{col2}** tienen una correlación {signo} {fuerza} ({metodo}: {valor:.2f})"
-            interpretaciones.append(interpretacion)
+        interpretacion = f"**{col1}** y **{col2}** tienen una correlación {signo} {fuerza} ({metodo}: {valor:.2f})"
+        interpretaciones.append(interpretacion)
 
     return interpretaciones
 
 
-def realizar_tests_inferenciales(df: pd.DataFrame) -> list:
-    """
-    Realiza pruebas inferenciales para comparar métricas entre grupos altos y bajos.
-    - Aplica Shapiro-Wilk para verificar normalidad.
-    - Usa T-Test si ambas muestras son normales, de lo contrario Mann-Whitney U.
-    - Aplica Test de Levene para verificar homogeneidad de varianzas.
-    """
-    resultados = []
-    columnas_numericas = df.select_dtypes(include=["number"]).columns
+# Por encima de este tamaño de grupo Mann-Whitney usa la aproximación normal
+# (method="asymptotic" de scipy) y Shapiro una submuestra de MAX_SHAPIRO
+MAX_MUESTRA_EXACTA = 20_000
+# Con menos filas en total no compensa levantar procesos
+MIN_FILAS_POOL = 200_000
+MAX_PROCESOS = 4
 
-    for col in columnas_numericas:
-        datos = df[col].copy()
-        datos = datos[(datos != -1) & (datos != -2)]
+COLUMNAS_TESTS = ["Columna", "Test", "Estadístico", "p", "Levene p",
+                  "Tamaño efecto", "Medida efecto", "n bajo", "n alto", "Significativo"]
 
-        if len(datos) < 10:
-            continue
 
-        q25 = datos.quantile(0.25)
-        q75 = datos.quantile(0.75)
+def _shapiro_p(valores: np.ndarray) -> float:
+    if len(valores) > MAX_SHAPIRO:
+        rng = np.random.default_rng(0)
+        valores = rng.choice(valores, MAX_SHAPIRO, replace=False)
+    return shapiro(valores).pvalue
 
-        grupo_bajo = datos[datos <= q25]
-        grupo_alto = datos[datos >= q75]
 
-        if len(grupo_bajo) < 5 or len(grupo_alto) < 5:
-            continue
+def _test_columna(col: str, datos: np.ndarray, max_muestra: int) -> Optional[dict]:
+    """
+    Cuartil inferior vs superior de una columna (sin -1/-2). Se ejecuta en
+    un proceso aparte: no usa Streamlit.
+    """
+    datos = datos[(datos != -1) & (datos != -2) & ~np.isnan(datos)]
+    if len(datos) < 10:
+        return None
+
+    q25, q75 = np.quantile(datos, [0.25, 0.75])
+    grupo_bajo = datos[datos <= q25]
+    grupo_alto = datos[datos >= q75]
+    n1, n2 = len(grupo_bajo), len(grupo_alto)
+
+    if n1 < 5 or n2 < 5:
+        return None
+
+    # Shapiro para ambos grupos
+    normal_bajo = _shapiro_p(grupo_bajo) > 0.05
+    normal_alto = _shapiro_p(grupo_alto) > 0.05
+
+    # Levene: igualdad de varianzas
+    try:
+        p_levene = levene(grupo_bajo, grupo_alto).pvalue
+    except Exception:
+        p_levene = None
+
+    # T-Test (d de Cohen) o Mann-Whitney (correlación rank-biserial)
+    if normal_bajo and normal_alto:
+        resultado = ttest_ind(grupo_bajo, grupo_alto, equal_var=True)
+        estadistico, p = resultado.statistic, resultado.pvalue
+        test = "T-Test"
+        var_comb = ((n1 - 1) * grupo_bajo.var(ddof=1) +
+                    (n2 - 1) * grupo_alto.var(ddof=1)) / (n1 + n2 - 2)
+        efecto = ((grupo_alto.mean() - grupo_bajo.mean()) / np.sqrt(var_comb)
+                  if var_comb > 0 else None)
+        medida = "d de Cohen"
+    else:
+        aproximado = max(n1, n2) > max_muestra
+        resultado = mannwhitneyu(grupo_bajo, grupo_alto, alternative="two-sided",
+                                 method="asymptotic" if aproximado else "auto")
+        estadistico, p = resultado.statistic, resultado.pvalue
+        test = "Mann-Whitney U (aprox. normal)" if aproximado else "Mann-Whitney U"
+        efecto = 1 - 2 * estadistico / (n1 * n2)
+        medida = "r rank-biserial"
+
+    return {
+        "Columna": col,
+        "Test": test,
+        "Estadístico": float(estadistico),
+        "p": float(p),
+        "Levene p": p_levene,
+        "Tamaño efecto": efecto,
+        "Medida efecto": medida,
+        "n bajo": n1,
+        "n alto": n2,
+        "Significativo": bool(p < 0.05),
+    }
 
-        # Shapiro para ambos grupos
-        normal_bajo = shapiro(grupo_bajo).pvalue > 0.05
-        normal_alto = shapiro(grupo_alto).pvalue > 0.05
 
-        # Levene: igualdad de varianzas
+def _ejecutar_tests(tareas: dict, max_muestra: int) -> dict:
+    """Corre _test_columna por columna; en paralelo (procesos) si hay volumen."""
+    total = sum(len(v) for v in tareas.values())
+    procesos = min(MAX_PROCESOS, os.cpu_count() or 1, len(tareas))
+    if procesos > 1 and total >= MIN_FILAS_POOL:
         try:
-            p_levene = levene(grupo_bajo, grupo_alto).pvalue
+            with ProcessPoolExecutor(max_workers=procesos) as pool:
+                futuros = {col: pool.submit(_test_columna, col, datos, max_muestra)
+                           for col, datos in tareas.items()}
+                return {col: f.result() for col, f in futuros.items()}
         except Exception:
-            p_levene = None
+            pass  # sin procesos disponibles: secuencial
+    return {col: _test_columna(col, datos, max_muestra) for col, datos in tareas.items()}
 
-        # T-Test o Mann-Whitney
-        if normal_bajo and normal_alto:
-            p = ttest_ind(grupo_bajo, grupo_alto, equal_var=True).pvalue
-            test = "T-Test"
-        else:
-            p = mannwhitneyu(grupo_bajo, grupo_alto,
-                             alternative="two-sided").pvalue
-            test = "Mann-Whitney U"
 
-        if p < 0.05:
-            resultados.append(
-                f"Diferencia significativa en **{col}** ({test}, p = {p:.4f}, Levene p = {p_levene:.4f} {'✅' if p_levene and p_levene > 0.05 else '⚠️'})"
-            )
+def realizar_tests_inferenciales(df: pd.DataFrame, clave: Optional[str] = None,
+                                 max_muestra: int = MAX_MUESTRA_EXACTA) -> pd.DataFrame:
+    """
+    Realiza pruebas inferenciales para comparar métricas entre grupos altos y bajos.
+    - Aplica Shapiro-Wilk para verificar normalidad.
+    - Usa T-Test si ambas muestras son normales, de lo contrario Mann-Whitney U
+      (aproximación normal si algún grupo supera max_muestra).
+    - Aplica Test de Levene para verificar homogeneidad de varianzas.
+
+    Devuelve un DataFrame (una fila por columna testeada) con estadístico, p,
+    tamaño de efecto y tamaños de grupo. Con clave (huella de filtros) cada
+    columna se memoiza por (clave, columna) y solo se recalculan las nuevas.
+    """
+    columnas_numericas = df.select_dtypes(include=["number"]).columns
+    memo = st.session_state.setdefault("memo_tests", {}) if clave is not None else {}
+
+    pendientes = {col: df[col].to_numpy(dtype="float64")
+                  for col in columnas_numericas if (clave, col) not in memo}
+    for col, fila in _ejecutar_tests(pendientes, max_muestra).items():
+        memo[(clave, col)] = fila
+    while len(memo) > MAX_MEMO * 16:
+        memo.pop(next(iter(memo)))
 
-    return resultados
+    filas = [memo[(clave, col)] for col in columnas_numericas
+             if memo.get((clave, col)) is not None]
+    return pd.DataFrame(filas, columns=COLUMNAS_TESTS)
 
 
 def categorizar_percentil_columna(col: pd.Series) -> pd.Series:
@@ -366,88 +709,113 @@ def categorizar_percentil_columna(col: pd.Series) -> pd.Series:
     )
 
 
-def generar_matriz_tiers(df: pd.DataFrame) -> pd.DataFrame:
+NIVELES = ["Bajo", "Medio", "Alto"]
+
+# (ASIN, Subnicho, Nicho) con niveles 0=Bajo / 2=Alto → clasificación
+CLASIFICACION_TIERS = {
+    (0, 0, 0): "Irrelevante total",
+    (0, 0, 2): "Oportunidad lejana (nicho)",
+    (0, 2, 0): "Oportunidad directa (subnicho)",
+    (0, 2, 2): "Oportunidad crítica (subnicho+nicho)",
+    (2, 0, 0): "Outlier útil (ASIN)",
+    (2, 0, 2): "Diferenciación (ASIN + nicho)",
+    (2, 2, 0): "Especialización (ASIN + subnicho)",
+    (2, 2, 2): "Core keyword",
+}
+
+# Orden = prioridad (1 = más importante)
+PRIORIDAD_TIERS = [
+    "Core keyword",
+    "Oportunidad crítica (subnicho+nicho)",
+    "Oportunidad directa (subnicho)",
+    "Especialización (ASIN + subnicho)",
+    "Diferenciación (ASIN + nicho)",
+    "Outlier útil (ASIN)",
+    "Oportunidad lejana (nicho)",
+    "Irrelevante total",
+]
+
+
+def _tabla_tiers() -> np.ndarray:
     """
-    Genera matriz estratégica basada en niveles categorizados por percentil.
-    - ASIN Click Share
-    - Comp Click Share
-    - Niche Click Share x Relevancy
-    df ya debe venir imputado y con -1 tratados como 0.
+    Código 0..26 (asin*9 + subnicho*3 + nicho) → índice en PRIORIDAD_TIERS.
+    Cualquier combinación con 'Medio' cae en 'Irrelevante total' (fallback conservador).
     """
-    df = df.copy()
+    tabla = np.full(27, PRIORIDAD_TIERS.index("Irrelevante total"), dtype="int8")
+    for (a, b, c), etiqueta in CLASIFICACION_TIERS.items():
+        tabla[a * 9 + b * 3 + c] = PRIORIDAD_TIERS.index(etiqueta)
+    return tabla
 
-    # Convertir -2 (irrelevante) a NaN y luego cualquier NaN lo tratamos como "Bajo"
-    def categorizar(col: pd.Series) -> pd.Series:
-        col = col.replace(-2, np.nan)
-        percentiles = col.rank(pct=True)
-        niveles = pd.cut(
-            percentiles,
-            bins=[0, 0.33, 0.66, 1.0],
-            labels=["Bajo", "Medio", "Alto"],
-            include_lowest=True
-        )
-        return niveles.fillna("Bajo")  # ✅ Si no hay dato, se considera Bajo
 
-    asin_tmp = df["ASIN Click Share"].replace(-2, np.nan)
-    comp_tmp = df["Comp Click Share"].replace(-2, np.nan)
-    niche_tmp = df["Niche Click Share"].replace(-2, np.nan)
-    rel_tmp = df["Relevancy"].replace(-2, np.nan)
+_TABLA_TIERS = _tabla_tiers()
 
-    df["ASIN Nivel"] = categorizar(asin_tmp)
-    df["Subnicho Nivel"] = categorizar(comp_tmp)
 
-    norm_niche = niche_tmp.rank(pct=True)
-    norm_rel = rel_tmp.rank(pct=True)
-    nicho_score = norm_niche.fillna(0) * norm_rel.fillna(0)
+def _percentil(valores: np.ndarray) -> np.ndarray:
+    """rank(pct=True) con empates promedio; NaN se mantiene NaN."""
+    pct = np.full(len(valores), np.nan)
+    validos = ~np.isnan(valores)
+    if validos.any():
+        pct[validos] = _rangos(valores[validos]) / validos.sum()
+    return pct
 
-    df["Nicho Nivel"] = pd.cut(
-        nicho_score,
-        bins=[0, 0.33, 0.66, 1.0],
-        labels=["Bajo", "Medio", "Alto"],
-        include_lowest=True
-    ).fillna("Bajo")  # ✅ Si no hay relevancia, también se considera Bajo
-
-    def clasificar(row):
-        clave = f"{row.get('ASIN Nivel')}_{row.get('Subnicho Nivel')}_{row.get('Nicho Nivel')}"
-        mapa = {
-            "Bajo_Bajo_Bajo": "Irrelevante total",
-            "Bajo_Bajo_Alto": "Oportunidad lejana (nicho)",
-            "Bajo_Alto_Bajo": "Oportunidad directa (subnicho)",
-            "Bajo_Alto_Alto": "Oportunidad crítica (subnicho+nicho)",
-            "Alto_Bajo_Bajo": "Outlier útil (ASIN)",
-            "Alto_Bajo_Alto": "Diferenciación (ASIN + nicho)",
-            "Alto_Alto_Bajo": "Especialización (ASIN + subnicho)",
-            "Alto_Alto_Alto": "Core keyword",
-        }
-        return mapa.get(clave, "Irrelevante total")  # 🔒 fallback conservador
-
-    df["Clasificación Estrategia"] = df.apply(clasificar, axis=1)
-
-    prioridad = {
-        "Core keyword": 1,
-        "Oportunidad crítica (subnicho+nicho)": 2,
-        "Oportunidad directa (subnicho)": 3,
-        "Especialización (ASIN + subnicho)": 4,
-        "Diferenciación (ASIN + nicho)": 5,
-        "Outlier útil (ASIN)": 6,
-        "Oportunidad lejana (nicho)": 7,
-        "Irrelevante total": 8
-    }
 
-    df["Prioridad Estrategia"] = df["Clasificación Estrategia"].map(prioridad)
+def _nivel(score: np.ndarray) -> np.ndarray:
+    """
+    Cortes [0, 0.33], (0.33, 0.66], (0.66, 1] → 0/1/2 (como pd.cut con
+    include_lowest). Sin dato → 0 (Bajo).
+    """
+    nivel = np.zeros(len(score), dtype="int8")
+    nivel[score > 0.33] = 1
+    nivel[score > 0.66] = 2
+    return nivel
 
-    columnas_resultado = [
-        "Search Terms",
-        "Search Volume",
-        "ASIN Click Share", "ASIN Nivel",
-        "Comp Click Share", "Subnicho Nivel",
-        "Niche Click Share", "Relevancy", "Nicho Nivel",
-        "Clasificación Estrategia"
-    ]
 
-    df_ordenado = df[columnas_resultado + ["Prioridad Estrategia"]].sort_values(
-        by=["Prioridad Estrategia", "Search Volume"],
-        ascending=[True, False]
-    ).drop(columns=["Prioridad Estrategia"]).reset_index(drop=True)
+def generar_matriz_tiers(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Genera matriz estratégica basada en niveles categorizados por percentil.
+    - ASIN Click Share
+    - Comp Click Share
+    - Niche Click Share x Relevancy
+    df ya debe venir imputado y con -1 tratados como 0.
 
-    return df_ordenado
+    Los niveles se codifican como enteros 0/1/2; la estrategia sale de un
+    código 0..26 por aritmética y una tabla de búsqueda (sin apply por fila).
+    """
+    def sin_irrelevantes(col: str) -> np.ndarray:
+        # -2 (irrelevante) → NaN; sin dato se considera "Bajo"
+        valores = df[col].to_numpy(dtype="float64")
+        return np.where(valores == -2, np.nan, valores)
+
+    asin_nivel = _nivel(_percentil(sin_irrelevantes("ASIN Click Share")))
+    subnicho_nivel = _nivel(_percentil(sin_irrelevantes("Comp Click Share")))
+
+    norm_niche = np.nan_to_num(_percentil(sin_irrelevantes("Niche Click Share")))
+    norm_rel = np.nan_to_num(_percentil(sin_irrelevantes("Relevancy")))
+    nicho_nivel = _nivel(norm_niche * norm_rel)
+
+    codigo = asin_nivel * 9 + subnicho_nivel * 3 + nicho_nivel
+    clase = _TABLA_TIERS[codigo]
+
+    # Prioridad ascendente y, dentro de cada una, Search Volume descendente
+    volumen = df["Search Volume"].to_numpy()
+    orden = np.lexsort((-volumen, clase))
+
+    def columna(col: str):
+        return df[col].to_numpy()[orden]
+
+    def niveles(codigos: np.ndarray) -> pd.Categorical:
+        return pd.Categorical.from_codes(codigos[orden], categories=NIVELES)
+
+    return pd.DataFrame({
+        "Search Terms": columna("Search Terms"),
+        "Search Volume": columna("Search Volume"),
+        "ASIN Click Share": columna("ASIN Click Share"),
+        "ASIN Nivel": niveles(asin_nivel),
+        "Comp Click Share": columna("Comp Click Share"),
+        "Subnicho Nivel": niveles(subnicho_nivel),
+        "Niche Click Share": columna("Niche Click Share"),
+        "Relevancy": columna("Relevancy"),
+        "Nicho Nivel": niveles(nicho_nivel),
+        "Clasificación Estrategia": pd.Categorical.from_codes(
+            clase[orden], categories=PRIORIDAD_TIERS),
+    })
@@ -3,7 +3,11 @@
 import streamlit as st
 import pandas as pd
 from typing import Optional
-from keywords.funcional_keywords_deduplicado import build_master_deduplicated
+from keywords.funcional_keywords_deduplicado import (
+    build_master_deduplicated,
+    VERSION_MAPEO,
+)
+from datos.loader_datos_excel import huella_excel
 
 
 def cargar_deduplicados(excel_data: Optional[pd.ExcelFile]) -> None:
@@ -13,11 +17,18 @@ def cargar_deduplicados(excel_data: Optional[pd.ExcelFile]) -> None:
     Esta tabla se considera la versión limpia y central, y no debe modificarse
     directamente desde otros módulos (como Estadística). 
     Se debe usar st.session_state.master_deduped como referencia única.
+
+    La tabla se reconstruye solo si cambia el contenido del Excel o la versión
+    del mapeo (st.session_state.master_deduped_huella). El cálculo en sí queda
+    cacheado en disco y se comparte entre sesiones.
     """
     if excel_data is None:
         st.warning("Primero debes subir un archivo Excel en la sección Datos.")
         return
 
-    if "master_deduped" not in st.session_state:
+    huella = f"{huella_excel(excel_data)}:v{VERSION_MAPEO}"
+    if ("master_deduped" not in st.session_state
+            or st.session_state.get("master_deduped_huella") != huella):
         df_dedup = build_master_deduplicated(excel_data)
         st.session_state.master_deduped = df_dedup
+        st.session_state.master_deduped_huella = huella
@@ -0,0 +1,132 @@
+# keywords/loader_keywords_fuentes.py
+# Registro declarativo de columnas para las hojas de keywords (CustKW / CompKW / MiningKW).
+# - Una sola definición de "qué columna del Excel es qué métrica" para la maestra
+#   y para las tablas de origen (referencial / competidores / mining).
+# - Se leen solo las columnas necesarias (usecols) desde el almacén de hojas.
+# - Las métricas que una fuente no tiene se rellenan con NaN por broadcast.
+# - El texto con % / comas / "NAF" se convierte a número aquí, una sola vez
+#   (los módulos de estadística ya reciben columnas numéricas).
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple
+
+from datos.loader_datos_excel import leer_hoja
+
+# Subir cuando cambie el mapeo de columnas o la lógica de deduplicado:
+# invalida las cachés persistidas en disco.
+VERSION_MAPEO = 3
+
+# Filas de título antes del encabezado en las hojas de keywords
+SKIPROWS_KEYWORDS = 2
+
+# Columnas de la maestra (en orden)
+COLUMNAS_MAESTRA = [
+    "Search Terms",
+    "Search Volume",
+    "ASIN Click Share",
+    "Comp Click Share",
+    "Niche Click Share",
+    "Comp Depth",
+    "Niche Depth",
+    "Relevancy",
+    "ABA Rank",
+]
+
+# {hoja: {columna: (posición 0-based en el Excel, dtype)}}
+ESQUEMAS_FUENTES: Dict[str, Dict[str, Tuple[int, str]]] = {
+    "CustKW": {
+        "Search Terms": (0, "object"),
+        "Search Volume": (15, "float64"),
+        "ASIN Click Share": (1, "float64"),
+        "ABA Rank": (14, "float64"),
+    },
+    "CompKW": {
+        "Search Terms": (0, "object"),
+        "Search Volume": (8, "float64"),
+        "Comp Click Share": (2, "float64"),
+        "Comp Depth": (5, "float64"),
+    },
+    "MiningKW": {
+        "Search Terms": (0, "object"),
+        "Search Volume": (5, "float64"),
+        "Niche Click Share": (15, "float64"),
+        "Niche Depth": (12, "float64"),
+        "Relevancy": (2, "float64"),
+    },
+}
+
+# Columnas que solo muestran las tablas de origen (no entran a la maestra)
+COLUMNAS_SOLO_VISTA: Dict[str, Dict[str, Tuple[int, str]]] = {
+    "CompKW": {
+        "ABA Rank": (7, "float64"),
+    },
+}
+
+
+def esquema_fuente(hoja: str, vista: bool = False) -> Dict[str, Tuple[int, str]]:
+    """Columnas declaradas para la hoja (con las extras de vista si vista=True)."""
+    if hoja not in ESQUEMAS_FUENTES:
+        raise ValueError(f"Hoja de keywords sin esquema registrado: '{hoja}'")
+    esquema = dict(ESQUEMAS_FUENTES[hoja])
+    if vista:
+        esquema.update(COLUMNAS_SOLO_VISTA.get(hoja, {}))
+    return esquema
+
+
+def convertir_metrica(serie: pd.Series, dtype: str = "float64") -> pd.Series:
+    """
+    Convierte una métrica a número. Solo las celdas de texto pasan por el
+    parseo de strings ("12.5%" → 0.125, "1,234" → 1234, "NAF"/"None" → NaN);
+    las celdas numéricas se conservan tal cual.
+    """
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        return serie.astype(dtype, copy=False)
+
+    valores = serie.to_numpy(dtype=object)
+    es_texto = np.fromiter((isinstance(v, str) for v in valores),
+                           dtype=bool, count=len(valores))
+    numeros = pd.to_numeric(pd.Series(np.where(es_texto, np.nan, valores),
+                                      index=serie.index),
+                            errors="coerce").to_numpy(dtype="float64")
+
+    if es_texto.any():
+        texto = pd.Series(valores[es_texto]).str.strip()
+        porcentaje = texto.str.endswith("%").to_numpy()
+        limpio = (texto.str.replace("%", "", regex=False)
+                       .str.replace(",", "", regex=False))
+        parseado = pd.to_numeric(limpio, errors="coerce").to_numpy(dtype="float64")
+        numeros[es_texto] = np.where(porcentaje, parseado / 100, parseado)
+
+    return pd.Series(numeros, index=serie.index, name=serie.name).astype(dtype)
+
+
+def cargar_fuente(excel_data, hoja: str, vista: bool = False) -> pd.DataFrame:
+    """
+    Lee SOLO las columnas declaradas de la hoja, con nombres canónicos y dtypes
+    explícitos (métricas ya numéricas). Las posiciones que no existen en el
+    Excel salen como NaN.
+    """
+    esquema = esquema_fuente(hoja, vista=vista)
+    nombres: List[str] = list(esquema.keys())
+    posiciones = [esquema[c][0] for c in nombres]
+
+    df = leer_hoja(excel_data, hoja, skiprows=SKIPROWS_KEYWORDS,
+                   usecols=posiciones)
+    df.columns = nombres
+
+    for col in nombres:
+        dtype = esquema[col][1]
+        if dtype != "object":
+            df[col] = convertir_metrica(df[col], dtype)
+    return df
+
+
+def cargar_fuente_maestra(excel_data, hoja: str) -> pd.DataFrame:
+    """
+    Fuente alineada a COLUMNAS_MAESTRA + 'Fuente'. Las métricas que no aplican
+    se agregan como NaN (reindex, sin construir listas Python).
+    """
+    df = cargar_fuente(excel_data, hoja).reindex(columns=COLUMNAS_MAESTRA)
+    df["Fuente"] = hoja
+    return df
@@ -0,0 +1,12 @@
+# listing/__init__.py
+# Parte de los módulos de listing viven en la carpeta hermana "Listing/".
+# En sistemas de archivos sensibles a mayúsculas (Linux) se agrega al __path__
+# del paquete, así `listing.<módulo>` resuelve igual que en macOS / Windows.
+
+import os
+
+_HERMANA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Listing")
+
+if os.path.isdir(_HERMANA) and not any(
+        os.path.isdir(p) and os.path.samefile(p, _HERMANA) for p in __path__):
+    __path__.append(_HERMANA)
@@ -36,10 +36,16 @@ def mostrar_analisis_mercado(excel_data: Optional[object] = None):
         else:
             from mercado.loader_data_cliente import cargar_data_cliente
             from mercado.funcional_mercado_reviews import analizar_reviews
+            from utils.cache_llm_utils import sin_cache
+            from utils.telemetria_llm_utils import contexto_llm
+            from contextlib import nullcontext
 
             datos = cargar_data_cliente(excel_data)
 
             # Botón IA (opcional)
+            regenerar = st.checkbox(
+                "Regenerar (ignorar caché IA)", value=False,
+                help="Vuelve a llamar al modelo aunque haya respuestas guardadas.")
             if st.button("Generar insights con IA"):
                 try:
                     import os
@@ -50,9 +56,28 @@ def mostrar_analisis_mercado(excel_data: Optional[object] = None):
                     pass
 
                 st.info("Analizando reviews con IA...")
+                preguntas = datos.get("preguntas_rufus", [])
+                total = 10 + (1 if preguntas else 0)
+                barra = st.progress(0.0, text="Esperando respuestas...")
+                zona_parciales = st.empty()
+                parciales = zona_parciales.container()
+                listos = []
+
+                # Cada sección se muestra apenas termina su prompt
+                def _al_terminar(clave: str, contenido: str):
+                    listos.append(clave)
+                    barra.progress(min(len(listos) / total, 1.0),
+                                   text=f"{len(listos)}/{total} secciones listas")
+                    with parciales.expander(f"✓ {clave}", expanded=False):
+                        st.markdown(contenido)
+
                 try:
-                    resultados = analizar_reviews(
-                        excel_data, datos.get("preguntas_rufus", []))
+                    with (sin_cache() if regenerar else nullcontext()), contexto_llm(
+                            listing=st.session_state.get("excel_hash"), etapa="reviews"):
+                        resultados = analizar_reviews(
+                            excel_data, preguntas, al_terminar=_al_terminar)
+                    barra.empty()
+                    zona_parciales.empty()
                     st.session_state["resultados_mercado"] = resultados
                     st.success("Análisis completado.")
                 except Exception as e:
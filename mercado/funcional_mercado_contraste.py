@@ -4,6 +4,8 @@ import pandas as pd
 import streamlit as st
 import re
 
+from datos.loader_datos_excel import leer_hoja
+
 
 def _is_value_col(name: str) -> int:
     """
@@ -79,8 +81,19 @@ def comparar_atributos_mercado_cliente(excel_data: pd.ExcelFile, atributos_ia: l
         return df_persist
 
     # 2) Construir base desde Excel (solo primera vez o si no hay persistido)
+    df_editable = tabla_contraste_desde_excel(excel_data, atributos_ia)
+    if not df_editable.empty:
+        st.session_state["df_contraste_edit"] = df_editable.copy()
+    return df_editable
+
+
+def tabla_contraste_desde_excel(excel_data: pd.ExcelFile, atributos_ia: list[str]) -> pd.DataFrame:
+    """
+    Tabla base de contraste (atributos IA vs CustData, 'Tipo' ya calculado),
+    sin leer ni escribir la sesión (la usan la vista y el batch).
+    """
     try:
-        df = excel_data.parse("CustData", skiprows=12, header=None)
+        df = leer_hoja(excel_data, "CustData", skiprows=12, header=None)
     except Exception as e:
         st.error(f"Error al leer atributos del cliente desde CustData: {e}")
         return pd.DataFrame()
@@ -122,7 +135,5 @@ def comparar_atributos_mercado_cliente(excel_data: pd.ExcelFile, atributos_ia: l
 
     df_editable = pd.DataFrame(data)
 
-    # 3) Calcular 'Tipo' inicial y PERSISTIR como base
-    df_editable = _recompute_tipo(df_editable)
-    st.session_state["df_contraste_edit"] = df_editable.copy()
-    return df_editable
+    # 3) Calcular 'Tipo' inicial
+    return _recompute_tipo(df_editable)
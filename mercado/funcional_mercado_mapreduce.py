@@ -0,0 +1,139 @@
+# mercado/funcional_mercado_mapreduce.py
+# Map-reduce de reviews para corpus grandes (miles de reviews por ASIN).
+# - MAP: las reviews se agrupan en chunks por presupuesto de tokens y cada chunk
+#   pasa por un prompt barato de extracción (JSON) en paralelo.
+# - Los cortes de chunk dependen del contenido (hash de la review) y no de la
+#   posición: agregar reviews (al inicio o al final) solo cambia los chunks
+#   vecinos; el resto reutiliza la respuesta guardada en la caché LLM.
+# - REDUCE: las listas parciales se cuentan por menciones y se arma un digest
+#   compacto que reemplaza al texto truncado en los prompts finales.
+
+import hashlib
+import re
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+from mercado.prompts_mercado_reviews import prompt_extraer_chunk
+
+# Presupuesto por chunk (tokens estimados) y tamaño mínimo antes de aceptar
+# un corte por contenido
+MAP_TOKENS_CHUNK = 3000
+MAP_TOKENS_MIN = 1200
+# Un corte por contenido cada ~DIVISOR_CORTE reviews (hash % DIVISOR_CORTE == 0)
+DIVISOR_CORTE = 8
+# Ítems por sección y citas textuales que llegan al digest
+MAX_ITEMS_REDUCE = 15
+MAX_CITAS_REDUCE = 10
+
+SECCIONES_MAP = {
+    "beneficios": "BENEFITS",
+    "pros": "PROS",
+    "cons": "CONS",
+    "emociones_positivas": "POSITIVE EMOTIONS",
+    "emociones_negativas": "NEGATIVE EMOTIONS",
+    "tokens_positivos": "POSITIVE TOKENS",
+    "tokens_negativos": "NEGATIVE TOKENS",
+    "atributos": "VALUED ATTRIBUTES",
+    "perfil_comprador": "BUYER PROFILE CUES",
+    "frases": "FREQUENT PHRASES",
+}
+
+try:
+    import tiktoken
+    _ENCODER = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENCODER = None
+
+
+def contar_tokens(texto: str) -> int:
+    """Tokens de 'texto' (tiktoken si está instalado; si no, ~4 chars por token)."""
+    if _ENCODER is not None:
+        return len(_ENCODER.encode(texto or "", disallowed_special=()))
+    return (len(texto or "") + 3) // 4
+
+
+def _es_corte(review: str) -> bool:
+    h = hashlib.blake2b(review.encode("utf-8", errors="ignore"), digest_size=8)
+    return int.from_bytes(h.digest(), "big") % DIVISOR_CORTE == 0
+
+
+def dividir_en_chunks(reviews: List[str],
+                      max_tokens: int = MAP_TOKENS_CHUNK,
+                      min_tokens: int = MAP_TOKENS_MIN) -> List[str]:
+    """
+    Agrupa reviews (en orden) en chunks de hasta max_tokens. Se corta después de
+    una review "de corte" (hash) si el chunk ya pasa min_tokens, o antes de
+    exceder max_tokens. Una review más larga que max_tokens va sola.
+    """
+    chunks, actual, tokens = [], [], 0
+    for review in reviews:
+        n = contar_tokens(review) + 1
+        if actual and tokens + n > max_tokens:
+            chunks.append("\n".join(actual))
+            actual, tokens = [], 0
+        actual.append(review)
+        tokens += n
+        if tokens >= min_tokens and _es_corte(review):
+            chunks.append("\n".join(actual))
+            actual, tokens = [], 0
+    if actual:
+        chunks.append("\n".join(actual))
+    return chunks
+
+
+def _normalizar(item: str) -> str:
+    return re.sub(r"[^\w\s]", "", str(item).lower()).strip()
+
+
+def reducir_parciales(parciales: List[dict]) -> Dict[str, List[tuple]]:
+    """
+    Une las extracciones por chunk: por sección, [(texto, n_chunks)] ordenado
+    por menciones (se conserva la primera redacción vista de cada ítem).
+    """
+    reducido = {}
+    for seccion in list(SECCIONES_MAP) + ["citas"]:
+        conteo, redaccion = Counter(), {}
+        for parcial in parciales:
+            vistos = set()
+            for item in parcial.get(seccion) or []:
+                clave = _normalizar(item)
+                if not clave or clave in vistos:
+                    continue
+                vistos.add(clave)
+                conteo[clave] += 1
+                redaccion.setdefault(clave, str(item).strip())
+        reducido[seccion] = [(redaccion[c], n) for c, n in conteo.most_common()]
+    return reducido
+
+
+def digest_reviews(reducido: Dict[str, List[tuple]], n_reviews: int, n_chunks: int) -> str:
+    """Texto compacto con las secciones reducidas (sustituye al corpus crudo)."""
+    lineas = [f"AGGREGATED INSIGHTS FROM {n_reviews} REVIEWS "
+              f"({n_chunks} chunks; number in parentheses = chunks mentioning it)."]
+    for seccion, titulo in SECCIONES_MAP.items():
+        items = reducido.get(seccion, [])[:MAX_ITEMS_REDUCE]
+        if items:
+            lineas.append(f"\n{titulo}:")
+            lineas += [f"- {texto} ({n})" for texto, n in items]
+    citas = reducido.get("citas", [])[:MAX_CITAS_REDUCE]
+    if citas:
+        lineas.append("\nREPRESENTATIVE QUOTES:")
+        lineas += ['- "' + texto.strip('"“” ') + '"' for texto, _ in citas]
+    return "\n".join(lineas)
+
+
+def resumir_map_reduce(reviews: List[str],
+                       ejecutar: Callable[[Dict[str, tuple]], dict],
+                       max_tokens: int = MAP_TOKENS_CHUNK) -> Optional[str]:
+    """
+    Map (ejecutar = pool de prompts de funcional_mercado_reviews) + reduce.
+    Devuelve el digest o None si ningún chunk devolvió una extracción válida.
+    """
+    chunks = dividir_en_chunks(reviews, max_tokens=max_tokens)
+    if not chunks:
+        return None
+    tareas = {f"chunk_{i}": (prompt_extraer_chunk, chunk) for i, chunk in enumerate(chunks)}
+    parciales = [p for p in ejecutar(tareas).values() if isinstance(p, dict)]
+    if not parciales:
+        return None
+    return digest_reviews(reducir_parciales(parciales), len(reviews), len(chunks))
@@ -0,0 +1,198 @@
+# mercado/funcional_mercado_muestreo.py
+# Muestreo representativo de reviews antes de los prompts.
+# 1) Dedup exacto (hash del texto normalizado) y casi-duplicados con MinHash + LSH.
+# 2) Embedding local de cada review: promedio de los vectores spaCy de sus
+#    palabras (misma tabla vocab.vectors que usa la tokenización de Listing).
+# 3) KMeans sobre esos embeddings (motor cacheado de listing).
+# 4) Selección round-robin entre clusters; dentro de cada cluster primero las
+#    reviews con más votos de utilidad y rating más extremo, hasta llenar el
+#    presupuesto de caracteres.
+# Sin modelo de vectores (o si KMeans falla) se omite el clustering: un solo
+# grupo, con el dedup y el orden por peso intactos.
+
+import re
+import zlib
+import hashlib
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Sequence
+
+# MinHash: 64 permutaciones en 16 bandas de 4 filas (LSH); un par candidato es
+# casi-duplicado si su Jaccard estimado >= UMBRAL_CASI_DUPLICADO
+N_PERMUTACIONES = 64
+N_BANDAS = 16
+UMBRAL_CASI_DUPLICADO = 0.8
+TAM_SHINGLE = 3
+
+MAX_CLUSTERS_REVIEWS = 12
+
+# Encabezados (normalizados) reconocidos para rating y votos de utilidad
+ENCABEZADOS_RATING = ("rating", "stars", "star rating", "estrellas", "calificacion", "score")
+ENCABEZADOS_UTILIDAD = ("helpful", "helpful votes", "helpfulness", "votes",
+                        "util", "votos", "votos utiles")
+
+_PRIMO = (1 << 32) + 15
+_rng = np.random.default_rng(42)
+_A = _rng.integers(1, 1 << 31, N_PERMUTACIONES, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 31, N_PERMUTACIONES, dtype=np.uint64)
+
+
+def normalizar_review(texto: str) -> str:
+    texto = re.sub(r"[^\w\s]", " ", str(texto or "").lower())
+    return re.sub(r"\s+", " ", texto).strip()
+
+
+def _normalizar_encabezado(valor) -> str:
+    return re.sub(r"[^a-z ]", "", str(valor or "").lower()
+                  .replace("á", "a").replace("é", "e").replace("í", "i")
+                  .replace("ó", "o").replace("ú", "u")).strip()
+
+
+def detectar_columna(encabezados: Sequence, candidatos: Sequence[str]) -> Optional[int]:
+    """Posición de la primera columna cuyo encabezado coincide (o empieza) con un candidato."""
+    normalizados = [_normalizar_encabezado(h) for h in encabezados]
+    for candidato in candidatos:
+        for i, h in enumerate(normalizados):
+            if h == candidato:
+                return i
+    for candidato in candidatos:
+        for i, h in enumerate(normalizados):
+            if h.startswith(candidato):
+                return i
+    return None
+
+
+def numero_en_texto(serie: pd.Series) -> pd.Series:
+    """'4.0 out of 5 stars' → 4.0, '12 people found this helpful' → 12, 'One' → 1."""
+    texto = serie.astype(str).str.lower().str.replace(",", "", regex=False)
+    texto = texto.str.replace(r"^\s*one\b", "1", regex=True)
+    return pd.to_numeric(texto.str.extract(r"(\d+(?:\.\d+)?)")[0], errors="coerce")
+
+
+def pesos_reviews(rating: Optional[pd.Series], utilidad: Optional[pd.Series], n: int) -> np.ndarray:
+    """
+    Peso de cada review: (1 + log1p(votos útiles)) · (1 + |rating − 3| / 4).
+    Las reviews votadas y las de opinión marcada (1★ / 5★) pasan primero.
+    """
+    peso = np.ones(n)
+    if utilidad is not None:
+        peso *= 1 + np.log1p(np.nan_to_num(utilidad.to_numpy(dtype="float64"), nan=0.0).clip(0))
+    if rating is not None:
+        r = rating.to_numpy(dtype="float64")
+        peso *= 1 + np.where(np.isnan(r), 0.0, np.abs(r - 3) / 4)
+    return peso
+
+
+# ----------------------------
+# Dedup exacto + MinHash
+# ----------------------------
+
+
+def _firma_minhash(texto_norm: str) -> np.ndarray:
+    palabras = texto_norm.split()
+    if len(palabras) > TAM_SHINGLE:
+        shingles = {" ".join(palabras[i:i + TAM_SHINGLE])
+                    for i in range(len(palabras) - TAM_SHINGLE + 1)}
+    else:
+        shingles = {texto_norm}
+    h = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles),
+                    dtype=np.uint64, count=len(shingles))
+    return ((_A[:, None] * h[None, :] + _B[:, None]) % _PRIMO).min(axis=1)
+
+
+def deduplicar(textos: Sequence[str], orden: Optional[Sequence[int]] = None) -> List[int]:
+    """
+    Índices de las reviews que sobreviven al dedup, recorriendo en 'orden'
+    (la primera vista de cada grupo de duplicados es la que se conserva).
+    """
+    orden = range(len(textos)) if orden is None else orden
+    filas = N_PERMUTACIONES // N_BANDAS
+    vistos_exactos, buckets, firmas, conservados = set(), {}, {}, []
+
+    for i in orden:
+        norm = normalizar_review(textos[i])
+        if not norm:
+            continue
+        huella = hashlib.sha1(norm.encode("utf-8")).digest()
+        if huella in vistos_exactos:
+            continue
+        vistos_exactos.add(huella)
+
+        firma = _firma_minhash(norm)
+        claves = [(b, firma[b * filas:(b + 1) * filas].tobytes()) for b in range(N_BANDAS)]
+        candidatos = {j for clave in claves for j in buckets.get(clave, ())}
+        if any(np.mean(firmas[j] == firma) >= UMBRAL_CASI_DUPLICADO for j in candidatos):
+            continue
+
+        firmas[i] = firma
+        for clave in claves:
+            buckets.setdefault(clave, []).append(i)
+        conservados.append(i)
+    return conservados
+
+
+# ----------------------------
+# Embeddings + clusters
+# ----------------------------
+
+
+def embeddings_reviews(textos: Sequence[str], modelo: Optional[str] = None) -> Optional[np.ndarray]:
+    """
+    Promedio de vectores de palabra por review (n × dim, filas L2-normalizadas).
+    None si el modelo de vectores no está disponible.
+    """
+    from scipy import sparse
+
+    tokens = [normalizar_review(t).split() for t in textos]
+    vocab: Dict[str, int] = {}
+    columnas = [vocab.setdefault(w, len(vocab)) for doc in tokens for w in doc]
+    if not vocab:
+        return None
+    try:
+        from listing.loader_listing_embeddings import MODELO_EMBEDDINGS, matriz_embeddings
+
+        # Vocabulario propio de cada corpus: no se cachea en disco (no se reutiliza)
+        E = matriz_embeddings(list(vocab), modelo or MODELO_EMBEDDINGS, persistir=False)
+    except (ImportError, OSError, ValueError):
+        return None  # sin modelo de vectores: se omite el clustering
+
+    indptr = np.cumsum([0] + [len(doc) for doc in tokens])
+    conteos = sparse.csr_matrix((np.ones(len(columnas), dtype="float32"), columnas, indptr),
+                                shape=(len(tokens), len(vocab)))
+    X = np.asarray(conteos @ np.asarray(E, dtype="float32"))
+    if not np.any(X):
+        return None  # ninguna palabra con vector: no hay nada que agrupar
+    normas = np.linalg.norm(X, axis=1, keepdims=True)
+    return np.divide(X, normas, out=np.zeros_like(X), where=normas > 0)
+
+
+def asignar_clusters(X: Optional[np.ndarray], n: int) -> np.ndarray:
+    """Cluster de cada review (k ≈ √(n/2), tope MAX_CLUSTERS_REVIEWS); todo 0 sin embeddings."""
+    if X is None or n < 4:
+        return np.zeros(n, dtype=int)
+    k = int(min(MAX_CLUSTERS_REVIEWS, max(2, np.sqrt(n / 2))))
+    try:
+        from listing.funcional_listing_clusters import clusters_kmeans
+
+        return np.asarray(clusters_kmeans(X, k)["etiquetas"])
+    except (ImportError, OSError, ValueError):
+        return np.zeros(n, dtype=int)  # un solo grupo: dedup y pesos siguen aplicando
+
+
+def round_robin(clusters: np.ndarray, pesos: np.ndarray) -> List[int]:
+    """
+    Orden de selección: una review por cluster en cada ronda (clusters con más
+    peso total primero; dentro de cada uno, de mayor a menor peso).
+    """
+    colas = {}
+    for c in np.unique(clusters):
+        miembros = np.flatnonzero(clusters == c)
+        colas[c] = list(miembros[np.argsort(-pesos[miembros], kind="stable")])
+    turnos = sorted(colas, key=lambda c: -pesos[clusters == c].sum())
+    orden = []
+    while turnos:
+        for c in list(turnos):
+            orden.append(int(colas[c].pop(0)))
+            if not colas[c]:
+                turnos.remove(c)
+    return orden
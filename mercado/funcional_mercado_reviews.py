@@ -1,9 +1,24 @@
 # mercado/funcional_mercado_reviews.py
 
 from mercado.prompts_mercado_reviews import prompt_comparar_atributos_mercado_vs_cliente
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+from datos.loader_datos_excel import leer_hoja
+
+from mercado.funcional_mercado_mapreduce import resumir_map_reduce
+from mercado.funcional_mercado_muestreo import (
+    ENCABEZADOS_RATING,
+    ENCABEZADOS_UTILIDAD,
+    asignar_clusters,
+    deduplicar,
+    detectar_columna,
+    embeddings_reviews,
+    numero_en_texto,
+    pesos_reviews,
+    round_robin,
+)
 from mercado.prompts_mercado_reviews import (
     prompt_nombre_producto,
     prompt_descripcion_producto,
@@ -15,15 +30,25 @@ from mercado.prompts_mercado_reviews import (
     prompt_visual_suggestions,
     prompt_tokens_diferenciadores,
     prompt_validar_preguntas_rufus,
-    prompt_atributos_valorados
+    prompt_atributos_valorados,
+    prompt_analisis_bundle,
 )
 
 # ============================================
 # >>> RD_FIX: utilidades ADITIVAS para bajar costo (compatibles 3.9)
 # ============================================
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Union
 import os
 import hashlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from utils.cache_llm_utils import cache_ignorada
+from utils.recursos_utils import cliente_openai
+from utils.telemetria_llm_utils import contexto_llm
+
+# Prompts de reviews en paralelo (se puede bajar por secrets/env LLM_CONCURRENCIA)
+LLM_CONCURRENCIA = 4
 
 
 def _flag_true(val: Union[str, bool, None]) -> bool:
@@ -68,6 +93,59 @@ def _select_top_pairs(titulos: pd.Series, contenidos: pd.Series, limit: int, eac
     return pares
 
 
+def _reviews_alineadas(df: pd.DataFrame, each_chars: int) -> pd.DataFrame:
+    """
+    Una fila por review (título B + contenido C, recortados) con rating y votos
+    útiles si la hoja trae esas columnas (detectadas por encabezado en la fila 1).
+    """
+    cuerpo = df.iloc[1:]
+    titulos = cuerpo.iloc[:, 1].fillna("").astype(str).str.strip()
+    contenidos = cuerpo.iloc[:, 2].fillna("").astype(str).str.strip()
+    out = pd.DataFrame({
+        "texto": [f"{_truncate(t, each_chars)}. {_truncate(c, each_chars)}"
+                  for t, c in zip(titulos, contenidos)],
+        "vacia": ((titulos == "") & (contenidos == "")).to_numpy(),
+    })
+    encabezados = df.iloc[0].tolist()
+    for nombre, candidatos in (("rating", ENCABEZADOS_RATING),
+                               ("utilidad", ENCABEZADOS_UTILIDAD)):
+        col = detectar_columna(encabezados, candidatos)
+        out[nombre] = (numero_en_texto(cuerpo.iloc[:, col]).to_numpy()
+                       if col is not None else np.nan)
+    return out[~out["vacia"]].drop(columns="vacia").reset_index(drop=True)
+
+
+def _select_representative_pairs(df: pd.DataFrame, limit: int, each_chars: int,
+                                 max_total_chars: int) -> List[str]:
+    """
+    Muestreo representativo (ver funcional_mercado_muestreo.py): dedup exacto y
+    MinHash, clusters de embeddings spaCy y round-robin por cluster ponderado
+    por rating / votos útiles, hasta 'limit' reviews o 'max_total_chars'.
+    """
+    reviews = _reviews_alineadas(df, each_chars)
+    if reviews.empty:
+        return []
+    pesos = pesos_reviews(
+        reviews["rating"] if reviews["rating"].notna().any() else None,
+        reviews["utilidad"] if reviews["utilidad"].notna().any() else None,
+        len(reviews))
+    textos = reviews["texto"].tolist()
+    unicas = deduplicar(textos, orden=np.argsort(-pesos, kind="stable"))
+    textos_unicos = [textos[i] for i in unicas]
+    clusters = asignar_clusters(embeddings_reviews(textos_unicos), len(unicas))
+
+    pares, total = [], 0
+    for j in round_robin(clusters, pesos[unicas]):
+        review = textos_unicos[j]
+        if total + len(review) + 1 > max_total_chars and pares:
+            continue
+        pares.append(review)
+        total += len(review) + 1
+        if len(pares) >= limit:
+            break
+    return pares
+
+
 def _hash_key(*parts) -> str:
     h = hashlib.sha256()
     for p in parts:
@@ -90,19 +168,133 @@ def _cache_get(cache_key: str) -> Optional[dict]:
 
 
 def _cache_put(cache_key: str, data: dict):
+    if claves_con_error(data):
+        return  # un prompt fallido no se cachea: el próximo análisis lo reintenta
     st.session_state[f"cache_res_analisis_{cache_key}"] = data
+
+
+def _concurrencia() -> int:
+    try:
+        return max(1, int(_get_secret("LLM_CONCURRENCIA", str(LLM_CONCURRENCIA))))
+    except ValueError:
+        return LLM_CONCURRENCIA
+
+
+def _en_etapa(etapa: str, fn, *args):
+    with contexto_llm(etapa=etapa):
+        return fn(*args)
+
+
+def _ejecutar_prompts(tareas: Dict[str, tuple],
+                      concurrencia: int,
+                      al_terminar: Optional[Callable[[str, str], None]] = None,
+                      etapa: Optional[str] = None) -> dict:
+    """
+    Ejecuta {clave: (funcion, *args)} en un pool de hilos con 'concurrencia'
+    llamadas simultáneas. al_terminar(clave, resultado) se invoca desde el hilo
+    principal (el de Streamlit) a medida que termina cada prompt.
+    Cada llamada queda en la telemetría con etapa = 'etapa' (o su clave).
+    Devuelve los resultados en el orden de 'tareas'.
+    """
+    # El cliente se crea antes del pool: los hilos no tocan st.cache_resource
+    try:
+        cliente_openai()
+    except Exception:
+        pass  # cada _call devolverá su propio [ERROR API]
+
+    resultados = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrencia, len(tareas))),
+                            thread_name_prefix="prompts_reviews") as pool:
+        # copy_context: los hilos heredan sin_cache() y demás ContextVars
+        futuros = {pool.submit(contextvars.copy_context().run, _en_etapa, etapa or clave, fn, *args): clave
+                   for clave, (fn, *args) in tareas.items()}
+        for futuro in as_completed(futuros):
+            clave = futuros[futuro]
+            try:
+                resultados[clave] = futuro.result()
+            except Exception as e:
+                resultados[clave] = f"[ERROR PROMPT] {e}"
+            if al_terminar is not None:
+                al_terminar(clave, resultados[clave])
+    return {clave: resultados[clave] for clave in tareas}
 # ============================================
 # <<< RD_FIX
 # ============================================
 
+# Modo del análisis: "bundle" (una llamada JSON Schema) o "prompts" (uno por sección)
+REVIEWS_MODO = "bundle"
+
+# Claves que siempre trae un análisis completo (bundle o prompts individuales)
+CLAVES_RESULTADOS = (
+    "nombre_producto", "descripcion", "beneficios", "buyer_persona", "pros_cons",
+    "emociones", "lexico_editorial", "visuales", "tokens_diferenciadores",
+    "atributos_valorados",
+)
+
 
-def analizar_reviews(excel_data: pd.ExcelFile, preguntas_rufus: List[str] = []) -> dict:
+def claves_con_error(resultados: dict) -> List[str]:
+    """Claves faltantes o cuyo texto es un error de prompt ("[ERROR PROMPT] …", "[ERROR API] …")."""
+    if not isinstance(resultados, dict):
+        return list(CLAVES_RESULTADOS)
+    faltantes = [c for c in CLAVES_RESULTADOS if c not in resultados]
+    return faltantes + [c for c, v in resultados.items()
+                        if isinstance(v, str) and v.lstrip().startswith("[ERROR")]
+
+
+def _guiones(items: List[str]) -> str:
+    return "\n".join(f"- {str(i).strip()}" for i in items or [] if str(i).strip())
+
+
+def _textos_desde_bundle(bundle: dict, con_rufus: bool) -> dict:
+    """
+    Convierte el bundle tipado al mismo dict de textos que producen los prompts
+    individuales (lo consumen la UI, el contraste y loader_listing_mercado).
+    El bundle original queda en resultados["estructurado"].
+    """
+    lexico = bundle.get("lexico_editorial") or {}
+    visuales = bundle.get("visuales") or {}
+    resultados = {
+        "nombre_producto": str(bundle.get("nombre_producto", "")).strip(),
+        "descripcion": str(bundle.get("descripcion", "")).strip(),
+        "beneficios": _guiones(bundle.get("beneficios")),
+        "buyer_persona": str(bundle.get("buyer_persona", "")).strip(),
+        "pros_cons": f"PROS:\n{_guiones(bundle.get('pros'))}\nCONS:\n{_guiones(bundle.get('cons'))}",
+        "emociones": (f"POSITIVE EMOTIONS:\n{_guiones(bundle.get('emociones_positivas'))}\n"
+                      f"NEGATIVE EMOTIONS:\n{_guiones(bundle.get('emociones_negativas'))}"),
+        "lexico_editorial": f"{lexico.get('estilo', '')}\n\n{_guiones(lexico.get('frases'))}".strip(),
+        "visuales": "\n\n".join(
+            f"**{titulo}:** {visuales.get(clave, '')}"
+            for clave, titulo in (("paleta", "Color palette"), ("tipografia", "Typography"),
+                                  ("tono_visual", "Visual tone"), ("imagenes", "Imagery"),
+                                  ("evitar", "Avoid"))),
+        "tokens_diferenciadores": (f"POSITIVE TOKENS:\n{_guiones(bundle.get('tokens_positivos'))}\n\n"
+                                   f"NEGATIVE TOKENS:\n{_guiones(bundle.get('tokens_negativos'))}"),
+        "atributos_valorados": _guiones(bundle.get("atributos_valorados")),
+    }
+    if con_rufus:
+        resultados["validacion_rufus"] = "\n".join(
+            f"- {v.get('pregunta', '')}: {'Yes' if v.get('respondible') else 'No'} — "
+            f"{v.get('justificacion', '')}"
+            for v in bundle.get("validacion_rufus") or [])
+    resultados["estructurado"] = bundle
+    return resultados
+
+
+def analizar_reviews(excel_data: pd.ExcelFile, preguntas_rufus: List[str] = [],
+                     al_terminar: Optional[Callable[[str, str], None]] = None,
+                     concurrencia: Optional[int] = None,
+                     modo: Optional[str] = None) -> dict:
     """
     Ejecuta análisis completo de reviews y devuelve un diccionario estructurado.
+    modo "bundle" (defecto, secrets/env REVIEWS_MODO): una sola llamada con
+    salida JSON Schema; el dict tipado queda en resultados["estructurado"].
+    Si falla, o con modo "prompts", corre un prompt por sección en paralelo
+    (concurrencia, por defecto LLM_CONCURRENCIA).
+    al_terminar(clave, resultado) recibe cada sección apenas está lista.
     """
 
     try:
-        df = excel_data.parse("Reviews", header=None)
+        df = leer_hoja(excel_data, "Reviews", header=None)
     except Exception as e:
         st.error(f"Error loading 'Reviews' sheet: {e}")
         return {}
@@ -134,45 +326,94 @@ def analizar_reviews(excel_data: pd.ExcelFile, preguntas_rufus: List[str] = [])
         max_reviews = int(_get_secret("REVIEWS_LIMIT", "20"))          # ej. 20
         max_total_chars = int(_get_secret("REVIEWS_TOTAL_CHARS", "6000"))
         max_each_review_chars = int(_get_secret("REVIEW_EACH_CHARS", "600"))
-    # Seleccionar y recortar por review cuando aplique
-    reviews_consolidados = _select_top_pairs(
-        titulos, contenidos, limit=max_reviews, each_chars=max_each_review_chars)
+    # Seleccionar y recortar por review cuando aplique: muestreo representativo
+    # (REVIEWS_MUESTREO=on, defecto) o las primeras N en orden del archivo (off)
+    muestreo = _flag_true(_get_secret("REVIEWS_MUESTREO", "on"))
+    reviews_consolidados = []
+    if muestreo:
+        reviews_consolidados = _select_representative_pairs(
+            df, limit=max_reviews, each_chars=max_each_review_chars,
+            max_total_chars=max_total_chars)
+    if not reviews_consolidados:
+        reviews_consolidados = _select_top_pairs(
+            titulos, contenidos, limit=max_reviews, each_chars=max_each_review_chars)
 
     # Unir y recortar total
     texto_reviews = "\n".join(reviews_consolidados)
     texto_reviews = _truncate(texto_reviews, max_total_chars)
 
+    # Map-reduce sobre TODAS las reviews cuando el corpus no entra en el recorte
+    # (REVIEWS_MAP_REDUCE: auto | on | off; auto no aplica en COST_SAVER)
+    modo_mr = str(_get_secret("REVIEWS_MAP_REDUCE", "auto")).strip().lower()
+    todas = []
+    if modo_mr != "off" and not (modo_mr == "auto" and COST_SAVER):
+        todas = _select_top_pairs(
+            titulos, contenidos, limit=len(titulos), each_chars=max_each_review_chars)
+        if muestreo:
+            # Sin duplicados, en orden del archivo (cortes de chunk estables)
+            todas = [todas[i] for i in sorted(deduplicar(todas))]
+        if modo_mr == "auto" and len("\n".join(todas)) <= max_total_chars:
+            todas = []
+    usar_map_reduce = bool(todas)
+
     # clave de caché por contenido (y por si cambias parámetros)
     cache_key = _hash_key(texto_reviews, COST_SAVER, max_reviews,
-                          max_total_chars, max_each_review_chars, tuple(preguntas_rufus or []))
+                          max_total_chars, max_each_review_chars, tuple(preguntas_rufus or []),
+                          _hash_key(*todas) if usar_map_reduce else "")
     cached = _cache_get(cache_key)
-    if COST_SAVER and cached:
+    if COST_SAVER and cached and not cache_ignorada() and not claves_con_error(cached):
         return cached
 
     # setear API key si está en secrets (no molesta si ya la tienes en env)
     _maybe_set_openai_key()
+
+    if usar_map_reduce:
+        digest = resumir_map_reduce(
+            todas, ejecutar=lambda tareas: _ejecutar_prompts(
+                tareas, concurrencia or _concurrencia(), etapa="map"))
+        if digest:
+            texto_reviews = digest
     # ============================================
     # <<< RD_FIX
     # ============================================
 
-    # Ejecutar todos los prompts (tu lógica intacta)
-    resultados = {
-        "nombre_producto": prompt_nombre_producto(texto_reviews),
-        "descripcion": prompt_descripcion_producto(texto_reviews),
-        "beneficios": prompt_beneficios_desde_reviews(texto_reviews),
-        "buyer_persona": prompt_buyer_persona(texto_reviews, autores.tolist()),
-        "pros_cons": prompt_pros_cons(texto_reviews),
-        "emociones": prompt_emociones(texto_reviews),
-        "lexico_editorial": prompt_lexico_editorial(texto_reviews),
-        "visuales": prompt_visual_suggestions(texto_reviews),
-        "tokens_diferenciadores": prompt_tokens_diferenciadores(texto_reviews),
-        "atributos_valorados": prompt_atributos_valorados(texto_reviews),
+    modo = (modo or _get_secret("REVIEWS_MODO", REVIEWS_MODO) or "").strip().lower()
+    bundle = None
+    if modo == "bundle":
+        with contexto_llm(etapa="bundle"):
+            bundle = prompt_analisis_bundle(
+                texto_reviews, autores.tolist(), preguntas_rufus or [])
+
+    if bundle is not None:
+        resultados = _textos_desde_bundle(bundle, bool(preguntas_rufus))
+        if al_terminar is not None:
+            for clave, valor in resultados.items():
+                if clave != "estructurado":
+                    al_terminar(clave, valor)
+        if COST_SAVER:
+            _cache_put(cache_key, resultados)
+        return resultados
+
+    # Fallback: todos los prompts en paralelo (mismos prompts, mismo orden de claves)
+    tareas = {
+        "nombre_producto": (prompt_nombre_producto, texto_reviews),
+        "descripcion": (prompt_descripcion_producto, texto_reviews),
+        "beneficios": (prompt_beneficios_desde_reviews, texto_reviews),
+        "buyer_persona": (prompt_buyer_persona, texto_reviews, autores.tolist()),
+        "pros_cons": (prompt_pros_cons, texto_reviews),
+        "emociones": (prompt_emociones, texto_reviews),
+        "lexico_editorial": (prompt_lexico_editorial, texto_reviews),
+        "visuales": (prompt_visual_suggestions, texto_reviews),
+        "tokens_diferenciadores": (prompt_tokens_diferenciadores, texto_reviews),
+        "atributos_valorados": (prompt_atributos_valorados, texto_reviews),
     }
 
     if preguntas_rufus:
-        resultados["validacion_rufus"] = prompt_validar_preguntas_rufus(
-            texto_reviews, preguntas_rufus
-        )
+        tareas["validacion_rufus"] = (
+            prompt_validar_preguntas_rufus, texto_reviews, preguntas_rufus)
+
+    resultados = _ejecutar_prompts(
+        tareas, concurrencia or _concurrencia(), al_terminar)
 
     # ============================================
     # >>> RD_FIX: guarda cache si estás en modo ahorro
@@ -202,7 +443,7 @@ def comparar_atributos_con_cliente(excel_data: pd.ExcelFile) -> str:
     visuales = resultados.get("visuales", "")
 
     try:
-        df = excel_data.parse("CustData", header=None)
+        df = leer_hoja(excel_data, "CustData", header=None)
     except Exception as e:
         st.error(f"Error al cargar hoja 'CustData': {e}")
         return ""
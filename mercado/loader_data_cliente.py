@@ -3,6 +3,8 @@
 import pandas as pd
 import streamlit as st
 
+from datos.loader_datos_excel import leer_hoja
+
 
 def cargar_data_cliente(excel_data: pd.ExcelFile) -> dict:
     """
@@ -17,7 +19,7 @@ def cargar_data_cliente(excel_data: pd.ExcelFile) -> dict:
         }
     """
     try:
-        df = excel_data.parse("CustData", header=None)
+        df = leer_hoja(excel_data, "CustData", header=None)
     except Exception as e:
         st.error(f"Error al cargar hoja CustData: {e}")
         return {}
@@ -1,10 +1,11 @@
-# mercado/loader_inputs_listing.py — v3.10
+# mercado/loader_inputs_listing.py — v3.11
 # Base: v3.9-fix (traer Marca de CustData!E12 con ExcelFile/dict/DF)
 # Cambios:
 # - Tipos: Beneficio valorado, Ventaja, SEO semántico
 # - Emoción: etiqueta Positive/Negative (headers y [+]/[-])
 # - Fuentes: solo Mercado / Keywords
 # - Atributo/Variación -> Fuente: Mercado
+# v3.11: si resultados trae "estructurado" (bundle JSON), se usan sus listas sin regex
 
 import streamlit as st
 import pandas as pd
@@ -12,7 +13,9 @@ import re
 import unicodedata
 from typing import Dict, List, Optional, Any
 
-VERSION_TAG = "loader_inputs_listing v3.10"
+from datos.loader_datos_excel import leer_hoja
+
+VERSION_TAG = "loader_inputs_listing v3.11"
 
 # ----------------------------
 # Helpers
@@ -83,24 +86,92 @@ def _split_tokens_pos_neg(text: str):
             neg.append(re.sub(r"^\s*\[\-\]\s*", "", l).strip())
     return pos, neg
 
+
+def _split_emociones(text: str):
+    """Emociones del texto libre → [(emoción, 'Positive'|'Negative'|'')], sin headers."""
+    out = []
+    current_label = ""  # "Positive" o "Negative"
+
+    pat_pos = re.compile(
+        r'^\s*POSITIVE\s+EMOTION(S)?\s*:?\s*$', flags=re.I)
+    pat_neg = re.compile(
+        r'^\s*NEGATIVE\s+EMOTION(S)?\s*:?\s*$', flags=re.I)
+
+    for raw in str(text or "").split("\n"):
+        l = raw.strip().strip("-• ").strip()
+        if not l:
+            continue
+
+        # Detecta headers "POSITIVE EMOTION(S)" / "NEGATIVE EMOTION(S)" y NO los agrega
+        if pat_pos.match(l):
+            current_label = "Positive"
+            continue
+        if pat_neg.match(l):
+            current_label = "Negative"
+            continue
+
+        # También soporta formato con prefijos [+] / [-]
+        if l.startswith("[+]"):
+            current_label = "Positive"
+            l = l[3:].strip()
+        elif l.startswith("[-]"):
+            current_label = "Negative"
+            l = l[3:].strip()
+
+        out.append((l, current_label))
+    return out
+
+
+def _secciones_desde_texto(resultados: dict) -> dict:
+    """Modo prompts: re-parsea las respuestas en texto libre."""
+    pros, cons = _split_pros_cons(str(resultados.get("pros_cons", "")))
+    pos_toks, neg_toks = _split_tokens_pos_neg(resultados.get("tokens", ""))
+    return {
+        "beneficios": _iter_lines(resultados.get("beneficios", "")),
+        "pros": pros,
+        "cons": cons,
+        "emociones": _split_emociones(resultados.get("emociones", "")),
+        "tokens_pos": pos_toks,
+        "tokens_neg": neg_toks,
+    }
+
+
+def _secciones_desde_bundle(bundle: dict) -> dict:
+    """Modo bundle: las listas ya vienen tipadas (JSON Schema), sin regex."""
+    def _limpias(items) -> List[str]:
+        return [str(i).strip() for i in items or [] if str(i).strip()]
+
+    return {
+        "beneficios": _limpias(bundle.get("beneficios")),
+        "pros": _limpias(bundle.get("pros")),
+        "cons": _limpias(bundle.get("cons")),
+        "emociones": ([(e, "Positive") for e in _limpias(bundle.get("emociones_positivas"))]
+                      + [(e, "Negative") for e in _limpias(bundle.get("emociones_negativas"))]),
+        "tokens_pos": _limpias(bundle.get("tokens_positivos")),
+        "tokens_neg": _limpias(bundle.get("tokens_negativos")),
+    }
+
+
 # ----------------------------
 # Marca: CustData!E12  (FIX: soporta ExcelFile / dict / DataFrame)
 # ----------------------------
 
 
-def _get_brand_e12() -> str:
+def _get_brand_e12(excel: object = None) -> str:
     """
-    Lee exactamente CustData!E12 (fila 11, col 4 0-based) desde:
-    - st.session_state["excel_data"] como pd.ExcelFile (parse)
+    Lee exactamente CustData!E12 (fila 11, col 4 0-based) desde 'excel'
+    (o, si no se pasa, st.session_state["excel_data"]):
+    - pd.ExcelFile (almacén de hojas)
     - o como dict {sheet_name: DataFrame}
     - o como DataFrame ya correspondiente a CustData
     Devuelve el valor tal cual (string).
     """
-    excel = st.session_state.get("excel_data")
+    if excel is None:
+        excel = st.session_state.get("excel_data")
 
-    # Caso 1: ExcelFile -> parse hoja CustData (header=None para no depender de encabezados)
+    # Caso 1: ExcelFile -> hoja CustData desde el almacén (header=None para no depender de encabezados)
     if isinstance(excel, pd.ExcelFile):
-        df = excel.parse("CustData", header=None)
+        df = leer_hoja(excel, "CustData", header=None)
         return str(df.iloc[11, 4])
 
     # Caso 2: dict de hojas -> DataFrame
@@ -136,12 +207,19 @@ def cargar_lemas_clusters() -> pd.DataFrame:
 
 def construir_inputs_listing(resultados: dict,
                              df_edit: pd.DataFrame,
-                             excel_data: object = None) -> pd.DataFrame:
-    st.session_state["loader_inputs_listing_version"] = VERSION_TAG
+                             excel_data: object = None,
+                             df_semantic: Optional[pd.DataFrame] = None,
+                             en_sesion: bool = True) -> pd.DataFrame:
+    """
+    df_semantic: lemas + clusters (por defecto df_lemas_cluster de la sesión).
+    en_sesion=False (batch): no lee ni escribe st.session_state.
+    """
+    if en_sesion:
+        st.session_state["loader_inputs_listing_version"] = VERSION_TAG
     data: List[Dict[str, str]] = []
 
     # Marca (Mercado)
-    marca = _get_brand_e12()
+    marca = _get_brand_e12(excel_data)
     if marca:
         data.append({"Tipo": "Marca", "Contenido": marca,
                     "Etiqueta": "", "Fuente": "Mercado"})
@@ -156,55 +234,32 @@ def construir_inputs_listing(resultados: dict,
             data.append({"Tipo": "Buyer persona", "Contenido": str(persona).strip(),
                          "Etiqueta": "", "Fuente": "Mercado"})
 
+        # Secciones: tipadas si vienen del bundle JSON, si no se parsea el texto
+        estructurado = resultados.get("estructurado")
+        if isinstance(estructurado, dict):
+            secciones = _secciones_desde_bundle(estructurado)
+        else:
+            secciones = _secciones_desde_texto(resultados)
+
         # Beneficios valorados (Mercado)
-        for linea in _iter_lines(resultados.get("beneficios", "")):
+        for linea in secciones["beneficios"]:
             data.append({"Tipo": "Beneficio valorado", "Contenido": linea,
                          "Etiqueta": "Positivo", "Fuente": "Mercado"})
 
         # PROS / CONS (Mercado) -> Ventaja / Obstáculo
-        pros, cons = _split_pros_cons(str(resultados.get("pros_cons", "")))
-        for linea in pros:
+        for linea in secciones["pros"]:
             data.append({"Tipo": "Ventaja", "Contenido": linea,
                          "Etiqueta": "PRO", "Fuente": "Mercado"})
-        for linea in cons:
+        for linea in secciones["cons"]:
             data.append({"Tipo": "Obstáculo", "Contenido": linea,
                          "Etiqueta": "CON", "Fuente": "Mercado"})
 
-        # --- Emociones (Mercado) con etiqueta Positive/Negative, ignorando headers) ---
-        emociones_texto = str(resultados.get("emociones", ""))
-        current_label = ""  # "Positive" o "Negative"
-
-        pat_pos = re.compile(
-            r'^\s*POSITIVE\s+EMOTION(S)?\s*:?\s*$', flags=re.I)
-        pat_neg = re.compile(
-            r'^\s*NEGATIVE\s+EMOTION(S)?\s*:?\s*$', flags=re.I)
-
-        for raw in emociones_texto.split("\n"):
-            l = raw.strip().strip("-• ").strip()
-            if not l:
-                continue
-
-            # Detecta headers "POSITIVE EMOTION(S)" / "NEGATIVE EMOTION(S)" y NO los agrega
-            if pat_pos.match(l):
-                current_label = "Positive"
-                continue
-            if pat_neg.match(l):
-                current_label = "Negative"
-                continue
-
-            # También soporta formato con prefijos [+] / [-]
-            if l.startswith("[+]"):
-                current_label = "Positive"
-                l = l[3:].strip()
-            elif l.startswith("[-]"):
-                current_label = "Negative"
-                l = l[3:].strip()
-
-            # Agrega la emoción con la etiqueta vigente
+        # Emociones (Mercado) con etiqueta Positive/Negative
+        for emocion, etiqueta in secciones["emociones"]:
             data.append({
                 "Tipo": "Emoción",
-                "Contenido": l,
-                "Etiqueta": current_label,
+                "Contenido": emocion,
+                "Etiqueta": etiqueta,
                 "Fuente": "Mercado",
             })
 
@@ -214,13 +269,11 @@ def construir_inputs_listing(resultados: dict,
                          "Etiqueta": "", "Fuente": "Keywords"})
 
         # Tokens diferenciadores (+/-) (Keywords)
-        tokens_raw = resultados.get("tokens", "")
-        pos_toks, neg_toks = _split_tokens_pos_neg(tokens_raw)
-        for t in pos_toks:
+        for t in secciones["tokens_pos"]:
             if t:
                 data.append({"Tipo": "Token", "Contenido": t,
                              "Etiqueta": "Positive", "Fuente": "Keywords"})
-        for t in neg_toks:
+        for t in secciones["tokens_neg"]:
             if t:
                 data.append({"Tipo": "Token", "Contenido": t,
                              "Etiqueta": "Negative", "Fuente": "Keywords"})
@@ -271,7 +324,8 @@ def construir_inputs_listing(resultados: dict,
                                  "Etiqueta": etiqueta_cliente, "Fuente": "Mercado"})
 
     # SEO semántico (Keywords)
-    df_semantic = cargar_lemas_clusters()
+    if df_semantic is None:
+        df_semantic = cargar_lemas_clusters() if en_sesion else pd.DataFrame()
     if isinstance(df_semantic, pd.DataFrame) and not df_semantic.empty:
         token_col = "token_lema" if "token_lema" in df_semantic.columns else df_semantic.columns[
             0]
@@ -318,7 +372,8 @@ def construir_inputs_listing(resultados: dict,
         df = df[df["Contenido"].astype(str).str.strip() != ""]
         df.reset_index(drop=True, inplace=True)
 
-    st.session_state["inputs_para_listing"] = df.copy()
+    if en_sesion:
+        st.session_state["inputs_para_listing"] = df.copy()
 
     return df
 
@@ -1,36 +1,107 @@
 # mercado/prompts_mercado_reviews.py
 
 import os
+import json
+import random
+import time
 from typing import Optional
 from dotenv import load_dotenv
 
+from utils.cache_llm_utils import respuesta_cacheada
+from utils.recursos_utils import cliente_openai
+from utils.limite_llm_utils import esperar_turno
+from utils.telemetria_llm_utils import registrar_llamada
+
 load_dotenv()
 
-try:
-    from openai import OpenAI
-    client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-    _OPENAI_OK = True
-except Exception as e:
-    _OPENAI_OK = False
-    _OPENAI_ERR = str(e)
+
+def _num_env(nombre: str, defecto: float) -> float:
+    try:
+        return float(os.environ.get(nombre, defecto))
+    except (TypeError, ValueError):
+        return defecto
+
+
+MODELO_REVIEWS = "gpt-4"
+
+# Timeout por llamada (s), reintentos extra y base del backoff (s) con jitter.
+# Se leen en cada llamada: se pueden ajustar por env / .env sin reiniciar.
+LLM_TIMEOUT = 60.0
+LLM_REINTENTOS = 2
+LLM_BACKOFF = 1.5
+
+
+def _espera_reintento(intento: int) -> float:
+    """Backoff exponencial con jitter completo: U(0, base · 2^intento)."""
+    base = _num_env("LLM_BACKOFF", LLM_BACKOFF)
+    return random.uniform(0, base * (2 ** intento))
+
+
+def _es_transitorio(error: Exception) -> bool:
+    """429, timeout, conexión o 5xx. Auth, 400 o modelo inválido no se reintentan."""
+    try:
+        import openai
+    except ImportError:
+        return False
+    if isinstance(error, (openai.RateLimitError, openai.APITimeoutError,
+                          openai.APIConnectionError, openai.InternalServerError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def _completar(client, messages: list, temp: float,
+               modelo: str = MODELO_REVIEWS, **opciones) -> str:
+    timeout = _num_env("LLM_TIMEOUT", LLM_TIMEOUT)
+    reintentos = int(_num_env("LLM_REINTENTOS", LLM_REINTENTOS))
+    # Sin los reintentos internos del SDK: los únicos son estos (con jitter y en el ledger)
+    client = client.with_options(max_retries=0)
+    # Latencia = solo el create(); limitador y backoff se suman aparte en 'espera'
+    error, espera, latencia = None, 0.0, 0.0
+    for intento in range(reintentos + 1):
+        if intento:
+            pausa = _espera_reintento(intento - 1)
+            time.sleep(pausa)
+            espera += pausa
+        espera += esperar_turno()
+        inicio = time.perf_counter()
+        try:
+            completion = client.chat.completions.create(
+                model=modelo,
+                messages=messages,
+                temperature=temp,
+                timeout=timeout,
+                **opciones,
+            )
+            latencia = time.perf_counter() - inicio
+            registrar_llamada(modelo, getattr(completion, "usage", None), latencia,
+                              reintentos=intento, espera_s=espera)
+            return completion.choices[0].message.content.strip()
+        except Exception as e:
+            error, latencia = e, time.perf_counter() - inicio
+            if not _es_transitorio(e):
+                break
+    registrar_llamada(modelo, None, latencia, reintentos=intento, ok=False, espera_s=espera)
+    return f"[ERROR PROMPT] {str(error)}"
 
 
 def _call(prompt: str, role: str = "product expert", temp: float = 0.7) -> str:
-    if not _OPENAI_OK:
-        return f"[ERROR API] { _OPENAI_ERR }"
+    # Cliente OpenAI perezoso: el SDK se importa en la primera llamada
     try:
-        completion = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system",
-                    "content": f"You are a {role} specialized in Amazon listings."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=temp
-        )
-        return completion.choices[0].message.content.strip()
+        client = cliente_openai()
     except Exception as e:
-        return f"[ERROR PROMPT] {str(e)}"
+        return f"[ERROR API] {e}"
+
+    system = f"You are a {role} specialized in Amazon listings."
+    messages = [
+        {"role": "system", "content": system},
+        {"role": "user", "content": prompt}
+    ]
+    # Caché en disco (utils/cache_llm_utils.py); los errores no se guardan
+    return respuesta_cacheada(
+        MODELO_REVIEWS, temp, system, prompt,
+        generar=lambda: _completar(client, messages, temp),
+        valida=lambda r: not r.startswith("[ERROR"),
+    )
 
 
 def prompt_nombre_producto(texto: str) -> str:
@@ -203,3 +274,187 @@ Only include physical or functional product attributes (e.g., color, size, mater
 REVIEWS:
 {texto}
 """, temp=0.3)
+
+
+# ============================================
+# Bundle: todas las secciones en UNA llamada con salida JSON Schema
+# (el corpus de reviews viaja una sola vez). Si falla o la respuesta no
+# cumple el esquema, devuelve None y se usan los prompts individuales.
+# ============================================
+
+# Structured outputs requiere un modelo que soporte response_format=json_schema
+MODELO_BUNDLE = os.getenv("REVIEWS_BUNDLE_MODEL", "gpt-4o")
+VERSION_BUNDLE = 1
+
+
+def _lista() -> dict:
+    return {"type": "array", "items": {"type": "string"}}
+
+
+def _objeto(propiedades: dict) -> dict:
+    return {"type": "object", "properties": propiedades,
+            "required": list(propiedades), "additionalProperties": False}
+
+
+ESQUEMA_BUNDLE = _objeto({
+    "nombre_producto": {"type": "string"},
+    "descripcion": {"type": "string"},
+    "beneficios": _lista(),
+    "buyer_persona": {"type": "string"},
+    "pros": _lista(),
+    "cons": _lista(),
+    "emociones_positivas": _lista(),
+    "emociones_negativas": _lista(),
+    "lexico_editorial": _objeto({"estilo": {"type": "string"}, "frases": _lista()}),
+    "visuales": _objeto({
+        "paleta": {"type": "string"},
+        "tipografia": {"type": "string"},
+        "tono_visual": {"type": "string"},
+        "imagenes": {"type": "string"},
+        "evitar": {"type": "string"},
+    }),
+    "tokens_positivos": _lista(),
+    "tokens_negativos": _lista(),
+    "atributos_valorados": _lista(),
+    "validacion_rufus": {"type": "array", "items": _objeto({
+        "pregunta": {"type": "string"},
+        "respondible": {"type": "boolean"},
+        "justificacion": {"type": "string"},
+    })},
+})
+
+
+def _prompt_bundle(texto: str, nombres_autores: list[str], preguntas: list[str]) -> str:
+    autores_str = ", ".join(nombres_autores[:10])
+    joined = "\n".join([f"- {p}" for p in preguntas]) or "(none)"
+    return f"""Analyze the following Amazon product reviews and fill EVERY field of the JSON schema. English only.
+
+- nombre_producto: concise and appealing product name (name only).
+- descripcion: product summary in no more than 2 short lines (functionality and differentiation).
+- beneficios: key benefits users value most.
+- buyer_persona: age range, user type, interests, emotions, buying behavior (you may infer gender, culture or age group from the usernames).
+- pros / cons: max 5 each.
+- emociones_positivas / emociones_negativas: main emotions expressed in the reviews.
+- lexico_editorial.estilo: writing style and tone of the reviews; lexico_editorial.frases: frequently used or persuasive phrases for Amazon copywriting.
+- visuales: visual identity brief aligned with the buyer persona (color palette, typography style, visual tone and design direction, imagery themes, elements to avoid).
+- tokens_positivos: tokens or short key phrases users mention as valuable, unique or desirable; tokens_negativos: issues, flaws or disappointments commonly noted.
+- atributos_valorados: physical or functional product attributes customers care about (e.g. color, size, material, weight, accessories, durability), one short attribute per item.
+- validacion_rufus: for each question below, whether it can be answered from the reviews and a short justification (empty list if there are no questions).
+
+QUESTIONS:
+{joined}
+
+USERNAMES:
+{autores_str}
+
+REVIEWS:
+{texto}
+"""
+
+
+def _bundle_valido(bundle) -> bool:
+    return isinstance(bundle, dict) and all(k in bundle for k in ESQUEMA_BUNDLE["required"])
+
+
+def prompt_analisis_bundle(texto: str, nombres_autores: list[str],
+                           preguntas: Optional[list[str]] = None) -> Optional[dict]:
+    """
+    Todas las secciones del análisis de reviews en una sola llamada tipada.
+    Devuelve el dict del esquema o None si la llamada/validación falla.
+    """
+    try:
+        client = cliente_openai()
+    except Exception:
+        return None
+
+    system = "You are a product expert specialized in Amazon listings."
+    prompt = _prompt_bundle(texto, nombres_autores, preguntas or [])
+    messages = [
+        {"role": "system", "content": system},
+        {"role": "user", "content": prompt}
+    ]
+    formato = {"type": "json_schema", "json_schema": {
+        "name": "analisis_reviews", "strict": True, "schema": ESQUEMA_BUNDLE}}
+
+    def _valida(respuesta: str) -> bool:
+        try:
+            return _bundle_valido(json.loads(respuesta))
+        except ValueError:
+            return False
+
+    respuesta = respuesta_cacheada(
+        MODELO_BUNDLE, 0.5, system, prompt,
+        generar=lambda: _completar(client, messages, 0.5,
+                                   modelo=MODELO_BUNDLE, response_format=formato),
+        valida=_valida,
+        esquema=VERSION_BUNDLE,
+    )
+    try:
+        bundle = json.loads(respuesta)
+    except ValueError:
+        return None
+    return bundle if _bundle_valido(bundle) else None
+
+
+# ============================================
+# Map-reduce: extracción barata por chunk de reviews (ver funcional_mercado_mapreduce)
+# ============================================
+
+MODELO_MAP = os.getenv("REVIEWS_MAP_MODEL", "gpt-4o-mini")
+VERSION_MAP = 1
+
+ESQUEMA_CHUNK = _objeto({
+    "beneficios": _lista(),
+    "pros": _lista(),
+    "cons": _lista(),
+    "emociones_positivas": _lista(),
+    "emociones_negativas": _lista(),
+    "tokens_positivos": _lista(),
+    "tokens_negativos": _lista(),
+    "atributos": _lista(),
+    "perfil_comprador": _lista(),
+    "frases": _lista(),
+    "citas": _lista(),
+})
+
+
+def prompt_extraer_chunk(texto: str) -> Optional[dict]:
+    """Extracción parcial (listas cortas) de un chunk de reviews; None si falla."""
+    try:
+        client = cliente_openai()
+    except Exception:
+        return None
+
+    system = "You extract structured insights from Amazon product reviews."
+    prompt = f"""Extract from these reviews short items (2-6 words each, English, max 8 per list):
+benefits, pros, cons, positive/negative emotions, positive/negative differentiator tokens,
+physical or functional attributes customers care about, buyer profile cues (who buys, for what use),
+frequent persuasive phrases, and up to 2 short verbatim quotes (max 25 words each).
+Only include what is actually said in the reviews.
+
+REVIEWS:
+{texto}
+"""
+    messages = [
+        {"role": "system", "content": system},
+        {"role": "user", "content": prompt}
+    ]
+    formato = {"type": "json_schema", "json_schema": {
+        "name": "extraccion_chunk", "strict": True, "schema": ESQUEMA_CHUNK}}
+
+    def _parse(respuesta: str) -> Optional[dict]:
+        try:
+            datos = json.loads(respuesta)
+        except ValueError:
+            return None
+        ok = isinstance(datos, dict) and all(k in datos for k in ESQUEMA_CHUNK["required"])
+        return datos if ok else None
+
+    respuesta = respuesta_cacheada(
+        MODELO_MAP, 0.2, system, prompt,
+        generar=lambda: _completar(client, messages, 0.2,
+                                   modelo=MODELO_MAP, response_format=formato),
+        valida=lambda r: _parse(r) is not None,
+        esquema=VERSION_MAP,
+    )
+    return _parse(respuesta)
@@ -0,0 +1,45 @@
+# tests/test_import_budget.py
+# Presupuesto de arranque: `import app` (página Datos) no debe cargar spaCy,
+# OpenAI ni librerías de gráficos, y debe quedar bajo IMPORT_APP_MAX_S segundos.
+# Se mide en un subproceso limpio (sin módulos ya importados por pytest).
+
+import os
+import json
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Umbral por defecto holgado para máquinas lentas / CI; ajustable por env
+IMPORT_APP_MAX_S = float(os.environ.get("IMPORT_APP_MAX_S", "2.0"))
+
+MODULOS_PESADOS = ("spacy", "openai", "sklearn", "matplotlib", "seaborn")
+
+_SCRIPT = f"""
+import json, sys, time
+inicio = time.perf_counter()
+import app
+segundos = time.perf_counter() - inicio
+pesados = sorted(m for m in {MODULOS_PESADOS!r} if m in sys.modules)
+print(json.dumps({{"segundos": segundos, "pesados": pesados}}))
+"""
+
+
+def _medir_import_app() -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-c", _SCRIPT], cwd=RAIZ, capture_output=True, text=True,
+        timeout=120)
+    assert proc.returncode == 0, proc.stderr
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def test_import_app_sin_modulos_pesados():
+    medicion = _medir_import_app()
+    assert medicion["pesados"] == [], f"`import app` cargó {medicion['pesados']}"
+
+
+def test_import_app_bajo_presupuesto():
+    # Mejor de 3 corridas: descarta el ruido del primer arranque (caché de disco / .pyc)
+    segundos = min(_medir_import_app()["segundos"] for _ in range(3))
+    assert segundos <= IMPORT_APP_MAX_S, (
+        f"`import app` tardó {segundos:.2f}s (presupuesto {IMPORT_APP_MAX_S:.2f}s)")
@@ -0,0 +1,178 @@
+# utils/cache_llm_utils.py
+# Caché persistente de respuestas LLM (compartida entre sesiones y procesos).
+# - SQLite en data/cache/llm.sqlite; clave = sha256(modelo, temperatura, system, user, extra).
+# - TTL: una respuesta más vieja que LLM_CACHE_TTL segundos no se devuelve.
+# - LRU por bytes: si el total supera LLM_CACHE_MAX_BYTES se borran las menos usadas.
+# - Contadores de aciertos / fallos del proceso (estadisticas_cache()); cada
+#   acierto queda además en el libro de telemetría (utils/telemetria_llm_utils.py).
+# - sin_cache(): bloque en el que se ignora la lectura (regeneración deliberada);
+#   la respuesta nueva sí se guarda y reemplaza a la anterior. Es un ContextVar:
+#   los pools de hilos deben copiar el contexto (contextvars.copy_context()).
+
+import os
+import time
+import json
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+from utils.telemetria_llm_utils import registrar_llamada
+
+CACHE_DIR = os.path.join("data", "cache")
+CACHE_LLM = os.path.join(CACHE_DIR, "llm.sqlite")
+
+LLM_CACHE_TTL = 30 * 24 * 3600          # 30 días
+LLM_CACHE_MAX_BYTES = 200 * 1024 * 1024  # 200 MB
+
+_SIN_CACHE: ContextVar[bool] = ContextVar("sin_cache_llm", default=False)
+
+_LOCK = threading.Lock()
+_LOCAL = threading.local()
+_CONTADORES: Dict[str, int] = {"aciertos": 0, "fallos": 0, "omitidos": 0,
+                               "escrituras": 0, "expulsados": 0}
+
+
+def _num_env(nombre: str, defecto: float) -> float:
+    try:
+        return float(os.environ.get(nombre, defecto))
+    except (TypeError, ValueError):
+        return defecto
+
+
+def _contar(clave: str, n: int = 1) -> None:
+    with _LOCK:
+        _CONTADORES[clave] += n
+
+
+def _conexion() -> sqlite3.Connection:
+    """Conexión por hilo (se reutiliza: abrir SQLite cuesta más que la consulta)."""
+    con = getattr(_LOCAL, "con", None)
+    if con is not None and getattr(_LOCAL, "ruta", None) == CACHE_LLM:
+        return con
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    con = sqlite3.connect(CACHE_LLM, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS respuestas ("
+        " clave TEXT PRIMARY KEY, modelo TEXT NOT NULL, respuesta TEXT NOT NULL,"
+        " bytes INTEGER NOT NULL, creado REAL NOT NULL, usado REAL NOT NULL)")
+    con.execute("CREATE INDEX IF NOT EXISTS ix_respuestas_usado ON respuestas (usado)")
+    _LOCAL.con, _LOCAL.ruta = con, CACHE_LLM
+    return con
+
+
+def clave_llm(modelo: str, temperatura: float, system: str, user: str, **extra) -> str:
+    """Huella de la llamada: mismos parámetros → misma respuesta cacheada."""
+    partes = {"modelo": modelo, "temperatura": float(temperatura),
+              "system": system or "", "user": user or "", **extra}
+    return hashlib.sha256(
+        json.dumps(partes, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+@contextmanager
+def sin_cache():
+    """Dentro del bloque las llamadas LLM ignoran la caché (pero la actualizan)."""
+    token = _SIN_CACHE.set(True)
+    try:
+        yield
+    finally:
+        _SIN_CACHE.reset(token)
+
+
+def cache_ignorada() -> bool:
+    return _SIN_CACHE.get()
+
+
+def _leer(clave: str) -> Optional[str]:
+    ahora = time.time()
+    limite = ahora - _num_env("LLM_CACHE_TTL", LLM_CACHE_TTL)
+    try:
+        with _conexion() as con:
+            fila = con.execute(
+                "SELECT respuesta FROM respuestas WHERE clave = ? AND creado >= ?",
+                (clave, limite)).fetchone()
+            if fila is not None:
+                con.execute("UPDATE respuestas SET usado = ? WHERE clave = ?",
+                            (ahora, clave))
+    except sqlite3.Error:
+        return None  # sin caché en disco: se llama al modelo
+    return fila[0] if fila else None
+
+
+def _expulsar(con: sqlite3.Connection) -> None:
+    """TTL vencido fuera; luego LRU hasta quedar bajo LLM_CACHE_MAX_BYTES."""
+    ahora = time.time()
+    vencidos = con.execute(
+        "DELETE FROM respuestas WHERE creado < ?",
+        (ahora - _num_env("LLM_CACHE_TTL", LLM_CACHE_TTL),)).rowcount
+    maximo = _num_env("LLM_CACHE_MAX_BYTES", LLM_CACHE_MAX_BYTES)
+    total = con.execute("SELECT COALESCE(SUM(bytes), 0) FROM respuestas").fetchone()[0]
+    borrar = []
+    if total > maximo:
+        for clave, n in con.execute("SELECT clave, bytes FROM respuestas ORDER BY usado"):
+            if total <= maximo:
+                break
+            borrar.append((clave,))
+            total -= n
+        con.executemany("DELETE FROM respuestas WHERE clave = ?", borrar)
+    if vencidos > 0 or borrar:
+        _contar("expulsados", max(vencidos, 0) + len(borrar))
+
+
+def _guardar(clave: str, modelo: str, respuesta: str) -> None:
+    ahora = time.time()
+    try:
+        with _conexion() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO respuestas"
+                " (clave, modelo, respuesta, bytes, creado, usado) VALUES (?, ?, ?, ?, ?, ?)",
+                (clave, modelo, respuesta, len(respuesta.encode("utf-8")), ahora, ahora))
+            _expulsar(con)
+        _contar("escrituras")
+    except sqlite3.Error:
+        pass  # solo se pierde la persistencia
+
+
+def respuesta_cacheada(modelo: str, temperatura: float, system: str, user: str,
+                       generar: Callable[[], str],
+                       valida: Optional[Callable[[str], bool]] = None,
+                       **extra) -> str:
+    """
+    Devuelve la respuesta cacheada para (modelo, temperatura, system, user, extra)
+    o la genera con generar() y la guarda si valida(respuesta) (por defecto: no vacía).
+    """
+    clave = clave_llm(modelo, temperatura, system, user, **extra)
+    if cache_ignorada():
+        _contar("omitidos")
+    else:
+        inicio = time.perf_counter()
+        guardada = _leer(clave)
+        if guardada is not None:
+            _contar("aciertos")
+            registrar_llamada(modelo, None, time.perf_counter() - inicio, cache_hit=True)
+            return guardada
+        _contar("fallos")
+
+    respuesta = generar()
+    if isinstance(respuesta, str) and (valida(respuesta) if valida else bool(respuesta)):
+        _guardar(clave, modelo, respuesta)
+    return respuesta
+
+
+def estadisticas_cache() -> Dict[str, float]:
+    """Contadores del proceso + tamaño actual de la caché en disco."""
+    with _LOCK:
+        stats = dict(_CONTADORES)
+    consultas = stats["aciertos"] + stats["fallos"]
+    stats["tasa_aciertos"] = stats["aciertos"] / consultas if consultas else 0.0
+    try:
+        stats["entradas"], stats["bytes"] = _conexion().execute(
+            "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM respuestas").fetchone()
+    except sqlite3.Error:
+        stats["entradas"], stats["bytes"] = 0, 0
+    return stats
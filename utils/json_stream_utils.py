@@ -0,0 +1,79 @@
+# utils/json_stream_utils.py
+# Parser JSON incremental para respuestas LLM en streaming.
+# - eventos_json(fragmentos) consume los deltas de texto (stream=True) y emite
+#   (ruta, valor) en cuanto cada valor se completa: primero las hojas
+#   (("title", "parent", "desktop"), "...") y luego cada contenedor al cerrarse.
+# - Lo anterior al primer '{' / '[' se ignora (prosa, ```json); el parseo
+#   termina al cerrar el objeto raíz (el último evento es ((), objeto_completo)).
+# - Un JSON cortado no emite los valores incompletos; el texto completo sigue
+#   pasando por _parse_json como siempre.
+
+import json
+from typing import Any, Iterable, Iterator, Tuple
+
+_DELIMITADORES = ",]}: \t\r\n"
+
+
+def eventos_json(fragmentos: Iterable[str]) -> Iterator[Tuple[tuple, Any]]:
+    # Pila de contenedores abiertos: {"valor", "ruta", "clave", "espera_clave"}
+    pila = []
+    en_string = escape = False
+    texto, token = [], []
+
+    def _ubicar(valor):
+        """Coloca 'valor' en el contenedor abierto y devuelve su ruta."""
+        tope = pila[-1]
+        if isinstance(tope["valor"], list):
+            clave = len(tope["valor"])
+            tope["valor"].append(valor)
+        else:
+            clave = tope["clave"]
+            tope["valor"][clave] = valor
+        return tope["ruta"] + (clave,)
+
+    for fragmento in fragmentos:
+        for ch in fragmento or "":
+            if en_string:
+                if escape:
+                    escape = False
+                elif ch == "\\":
+                    escape = True
+                elif ch == '"':
+                    en_string = False
+                    valor = json.loads('"' + "".join(texto) + '"', strict=False)
+                    tope = pila[-1]
+                    if isinstance(tope["valor"], dict) and tope["espera_clave"]:
+                        tope["clave"] = valor
+                    else:
+                        yield _ubicar(valor), valor
+                    continue
+                texto.append(ch)
+                continue
+
+            if not pila and ch not in "{[":
+                continue  # prosa / fences antes del JSON
+
+            if token and ch in _DELIMITADORES:
+                valor = json.loads("".join(token))
+                token = []
+                yield _ubicar(valor), valor
+
+            if ch == '"':
+                en_string, texto = True, []
+            elif ch in "{[":
+                nuevo = {} if ch == "{" else []
+                ruta = _ubicar(nuevo) if pila else ()
+                pila.append({"valor": nuevo, "ruta": ruta, "clave": None,
+                             "espera_clave": ch == "{"})
+            elif ch in "}]":
+                cerrado = pila.pop()
+                yield cerrado["ruta"], cerrado["valor"]
+                if not pila:
+                    return
+            elif ch == ":":
+                pila[-1]["espera_clave"] = False
+            elif ch == ",":
+                if isinstance(pila[-1]["valor"], dict):
+                    pila[-1]["espera_clave"] = True
+            elif not ch.isspace():
+                token.append(ch)
@@ -0,0 +1,54 @@
+# utils/limite_llm_utils.py
+# Límite global de llamadas LLM por minuto (compartido por todos los hilos del proceso).
+# - GCRA (token bucket sin hilo de recarga): cada llamada reserva su turno bajo un
+#   lock y duerme FUERA del lock hasta que le toca; se permiten ráfagas de
+#   LLM_RAFAGA llamadas seguidas.
+# - Sin límite configurado (LLM_RPM vacío o 0) esperar_turno() no hace nada: la UI
+#   interactiva no cambia. El batch lo fija con configurar_limite().
+# - Un 429 igual puede ocurrir (cuota por tokens): lo absorben los reintentos
+#   con backoff de _completar.
+
+import os
+import time
+import threading
+from typing import Optional
+
+_LOCK = threading.Lock()
+_ESTADO = {"rpm": None, "rafaga": 1, "tat": 0.0}
+
+
+def _desde_env() -> None:
+    try:
+        rpm = float(os.getenv("LLM_RPM", "") or 0)
+        rafaga = int(os.getenv("LLM_RAFAGA", "") or 1)
+    except ValueError:
+        return
+    if rpm > 0:
+        configurar_limite(rpm, rafaga)
+
+
+def configurar_limite(rpm: Optional[float], rafaga: int = 1) -> None:
+    """rpm=None o 0 desactiva el límite."""
+    with _LOCK:
+        _ESTADO["rpm"] = rpm if rpm and rpm > 0 else None
+        _ESTADO["rafaga"] = max(1, int(rafaga))
+        _ESTADO["tat"] = 0.0
+
+
+def esperar_turno() -> float:
+    """Bloquea hasta que la próxima llamada cabe en el límite. Devuelve los segundos esperados."""
+    rpm = _ESTADO["rpm"]
+    if rpm is None:
+        return 0.0
+    intervalo = 60.0 / rpm
+    with _LOCK:
+        ahora = time.monotonic()
+        tat = max(_ESTADO["tat"], ahora)
+        espera = max(0.0, tat - ahora - (_ESTADO["rafaga"] - 1) * intervalo)
+        _ESTADO["tat"] = tat + intervalo
+    if espera:
+        time.sleep(espera)
+    return espera
+
+
+_desde_env()
@@ -0,0 +1,55 @@
+# utils/recursos_utils.py
+# Registro perezoso de recursos pesados (modelos spaCy, clientes OpenAI, ...).
+# - Nada se carga al importar: cada recurso se crea en su primer uso.
+# - Una sola instancia por proceso (compartida entre sesiones vía st.cache_resource).
+# - Thread-safe: un lock por recurso, así cargar spaCy no bloquea al cliente OpenAI.
+# - Si la fábrica falla, no se guarda nada y el siguiente uso reintenta.
+
+import os
+import threading
+from typing import Any, Callable, Dict
+
+import streamlit as st
+
+_FABRICAS: Dict[str, Callable[[], Any]] = {}
+_INSTANCIAS: Dict[str, Any] = {}
+_LOCKS: Dict[str, threading.Lock] = {}
+_LOCK_REGISTRO = threading.Lock()
+
+
+@st.cache_resource(show_spinner=False)
+def _crear_recurso(nombre: str) -> Any:
+    return _FABRICAS[nombre]()
+
+
+def obtener_recurso(nombre: str, fabrica: Callable[[], Any]) -> Any:
+    """
+    Devuelve el recurso 'nombre', creándolo con fabrica() la primera vez.
+    Las excepciones de la fábrica se propagan al llamador.
+    """
+    if nombre in _INSTANCIAS:
+        return _INSTANCIAS[nombre]
+
+    with _LOCK_REGISTRO:
+        _FABRICAS.setdefault(nombre, fabrica)
+        lock = _LOCKS.setdefault(nombre, threading.Lock())
+
+    with lock:
+        if nombre not in _INSTANCIAS:
+            _INSTANCIAS[nombre] = _crear_recurso(nombre)
+    return _INSTANCIAS[nombre]
+
+
+# ----------------------------
+# Recursos comunes
+# ----------------------------
+
+
+def _crear_cliente_openai():
+    from openai import OpenAI
+    return OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+
+
+def cliente_openai():
+    """Cliente OpenAI compartido (se importa el SDK en el primer uso)."""
+    return obtener_recurso("openai", _crear_cliente_openai)
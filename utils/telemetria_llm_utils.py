@@ -0,0 +1,134 @@
+# utils/telemetria_llm_utils.py
+# Libro de llamadas LLM (SQLite en data/logs/llm_ledger.sqlite).
+# - Una fila por llamada: modelo, tokens de prompt/completion, latencia, acierto de
+#   caché, reintentos, ok y costo estimado en USD.
+# - latencia_ms es solo el create() que respondió (o el último intento fallido);
+#   las esperas del limitador y del backoff entre reintentos van en espera_ms.
+# - El listing (huella del Excel) y la etapa vienen de contexto_llm(), un ContextVar:
+#   se fija en el hilo de Streamlit y los pools lo heredan con copy_context().
+# - resumen_costos(listing) agrega por etapa (llamadas, tokens, USD, p50/p95).
+
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+import pandas as pd
+
+LEDGER_DIR = os.path.join("data", "logs")
+LEDGER_LLM = os.path.join(LEDGER_DIR, "llm_ledger.sqlite")
+
+# USD por 1M tokens (prompt, completion); modelos sin precio → costo 0
+PRECIOS_USD_1M = {
+    "gpt-4": (30.0, 60.0),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+}
+
+_CONTEXTO: ContextVar[dict] = ContextVar("contexto_llm", default={})
+_LOCAL = threading.local()
+
+
+@contextmanager
+def contexto_llm(**campos):
+    """
+    Etiqueta las llamadas LLM del bloque (listing=..., etapa=..., intento=...).
+    Una etapa anidada se concatena a la exterior: "reviews/beneficios".
+    """
+    actual = dict(_CONTEXTO.get())
+    if campos.get("etapa") and actual.get("etapa"):
+        campos["etapa"] = f"{actual['etapa']}/{campos['etapa']}"
+    token = _CONTEXTO.set({**actual, **campos})
+    try:
+        yield
+    finally:
+        _CONTEXTO.reset(token)
+
+
+def _conexion() -> sqlite3.Connection:
+    con = getattr(_LOCAL, "con", None)
+    if con is not None and getattr(_LOCAL, "ruta", None) == LEDGER_LLM:
+        return con
+    os.makedirs(LEDGER_DIR, exist_ok=True)
+    con = sqlite3.connect(LEDGER_LLM, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS llamadas ("
+        " ts REAL NOT NULL, listing TEXT, etapa TEXT, intento INTEGER, modelo TEXT,"
+        " prompt_tokens INTEGER, completion_tokens INTEGER, latencia_ms REAL,"
+        " cache_hit INTEGER, reintentos INTEGER, ok INTEGER, costo_usd REAL)")
+    columnas = {fila[1] for fila in con.execute("PRAGMA table_info(llamadas)")}
+    if "espera_ms" not in columnas:  # libros creados antes de separar las esperas
+        con.execute("ALTER TABLE llamadas ADD COLUMN espera_ms REAL DEFAULT 0")
+    con.execute("CREATE INDEX IF NOT EXISTS ix_llamadas_listing ON llamadas (listing, ts)")
+    _LOCAL.con, _LOCAL.ruta = con, LEDGER_LLM
+    return con
+
+
+def costo_usd(modelo: str, prompt_tokens: int, completion_tokens: int) -> float:
+    precio = PRECIOS_USD_1M.get(modelo)
+    if precio is None:
+        # versiones con fecha (gpt-4o-2024-08-06) → precio del modelo base
+        base = max((m for m in PRECIOS_USD_1M if modelo.startswith(m)), key=len, default=None)
+        precio = PRECIOS_USD_1M.get(base, (0.0, 0.0))
+    return (prompt_tokens * precio[0] + completion_tokens * precio[1]) / 1_000_000
+
+
+def registrar_llamada(modelo: str, uso=None, latencia_s: float = 0.0,
+                      cache_hit: bool = False, reintentos: int = 0, ok: bool = True,
+                      espera_s: float = 0.0) -> None:
+    """
+    Agrega una fila al libro. 'uso' es resp.usage del SDK (o None); 'espera_s'
+    suma las esperas de limitador y backoff, fuera de 'latencia_s'.
+    """
+    pt = int(getattr(uso, "prompt_tokens", 0) or 0)
+    ct = int(getattr(uso, "completion_tokens", 0) or 0)
+    ctx = _CONTEXTO.get()
+    try:
+        with _conexion() as con:
+            con.execute(
+                "INSERT INTO llamadas (ts, listing, etapa, intento, modelo, prompt_tokens,"
+                " completion_tokens, latencia_ms, cache_hit, reintentos, ok, costo_usd,"
+                " espera_ms) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), ctx.get("listing"), ctx.get("etapa"), ctx.get("intento"),
+                 modelo, pt, ct, latencia_s * 1000, int(cache_hit), int(reintentos),
+                 int(ok), costo_usd(modelo, pt, ct), espera_s * 1000))
+    except sqlite3.Error:
+        pass  # la telemetría nunca rompe una generación
+
+
+def leer_llamadas(listing: Optional[str] = None) -> pd.DataFrame:
+    consulta, params = "SELECT * FROM llamadas", ()
+    if listing is not None:
+        consulta, params = consulta + " WHERE listing = ?", (listing,)
+    try:
+        return pd.read_sql_query(consulta + " ORDER BY ts", _conexion(), params=params)
+    except (sqlite3.Error, pd.errors.DatabaseError):
+        return pd.DataFrame()
+
+
+def resumen_costos(listing: Optional[str] = None) -> pd.DataFrame:
+    """Por etapa: llamadas, aciertos de caché, tokens, USD, reintentos, espera total y latencia p50/p95."""
+    df = leer_llamadas(listing)
+    if df.empty:
+        return df
+    df["etapa"] = df["etapa"].fillna("(sin etapa)")
+    api = df[df["cache_hit"] == 0]
+    resumen = df.groupby("etapa").agg(
+        llamadas=("ts", "size"),
+        aciertos_cache=("cache_hit", "sum"),
+        prompt_tokens=("prompt_tokens", "sum"),
+        completion_tokens=("completion_tokens", "sum"),
+        costo_usd=("costo_usd", "sum"),
+        reintentos=("reintentos", "sum"),
+        espera_ms=("espera_ms", "sum"),
+        errores=("ok", lambda s: int((s == 0).sum())),
+    )
+    latencias = api.groupby("etapa")["latencia_ms"]
+    resumen["p50_ms"] = latencias.quantile(0.5)
+    resumen["p95_ms"] = latencias.quantile(0.95)
+    return resumen.sort_values("costo_usd", ascending=False).reset_index()